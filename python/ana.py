@@ -1,11 +1,19 @@
+import hashlib
 import itertools
+import json
+import matplotlib.figure
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
+import os
 import pandas as pd
+import re
 import scipy.stats
+import weakref
 
 import aux
 import cfg
+import prf
 
 # this module implements functions for the analysis of entrainment results
 
@@ -13,6 +21,17 @@ import cfg
 
 identity = lambda x:x
 
+# cached count cubes per dataframe (see get_cnt_cube), keyed by id; entries
+# are removed when the dataframe is garbage collected
+_cnt_cubes = {}
+
+def _assert_not_boot(df):
+    ''' asserts df is no result of ap.boot_test (cells with ci, no p-values) '''
+    assert 'boot_ci' not in df.columns, \
+        'bootstrap results hold confidence bounds, not p-values ' \
+        '(see get_ent_pct_ci)'
+
+
 def _get_data(series, stat_idx, func=identity):
     ''' extracts data from tuples and applies func if needed '''
     data = series
@@ -21,41 +40,7 @@ def _get_data(series, stat_idx, func=identity):
     return data
 
 
-def _compare_binary(df, col, lvl0, lvl1):
-    ''' runs t-tests for number, length, and speed of ipus for levels of col
-
-    used to compare speakers based on gender and native language '''
-    def _run_test(x, y, title, col, lvl0, lvl1):
-        ''' prints statistics of given series and runs the actual t-test '''
-        print('%s (%s == %s): %.2f (%.2f)' % 
-              (title, col, lvl0, x.mean(), x.std()))
-        print('%s (%s == %s): %.2f (%.2f)' % 
-              (title, col, lvl1, y.mean(), y.std()))
-        print(aux.ttest_ind(x, y))
-    # split the data by the given two levels of the relevant column
-    df0 = df[df[col] == lvl0]
-    df1 = df[df[col] == lvl1]
-    # number of unique turn-final and turn-initial ipus per speaker
-    x = df0.groupby('spk_id').count()['cnt']
-    y = df1.groupby('spk_id').count()['cnt']
-    _run_test(x, y, 'number of relevant IPUs per speaker', col, lvl0, lvl1)
-    # mean speech rate per speaker
-    x = df0.groupby('spk_id')['rate_syl'].mean()
-    y = df1.groupby('spk_id')['rate_syl'].mean()
-    _run_test(x, y, 'speech rate of relevant IPUs per speaker', col, lvl0, lvl1)
-    # mean ipu duration per speaker
-    x = df0.groupby('spk_id')['duration'].mean()
-    y = df1.groupby('spk_id')['duration'].mean()
-    _run_test(x, y, 'duration of relevant IPUs per speaker', col, lvl0, lvl1)
-    # mean number of syllables per ipu per speaker; number of syllables can be 
-    # recovered from speech rate and duration if speech rate is unnormalized
-    get_syl_cnt = lambda x: x['rate_syl'] * x['duration']
-    x = df0.groupby('spk_id').apply(get_syl_cnt).groupby('spk_id').mean()
-    y = df1.groupby('spk_id').apply(get_syl_cnt).groupby('spk_id').mean()
-    _run_test(x, y, 'syllables per relevant IPU per speaker', col, lvl0, lvl1)
-    print('\n')
-
-
+@prf.timed
 def annotate_local_measure(df):
     ''' add columns to df summarizing significant results across features
 
@@ -66,11 +51,12 @@ def annotate_local_measure(df):
     returns:
         input dataframe with four new columns
     '''
+    _assert_not_boot(df)
     func = lambda x: len(
-        [1 for f in cfg.FEATURES if x[f][1] <= 0.05 and x[f][0] > 0])
+        [1 for f in cfg.FEATURES if x[f][1] <= cfg.SIG_ALPHA and x[f][0] > 0])
     df['+'] = df.apply(func, axis=1)
     func = lambda x: len(
-        [1 for f in cfg.FEATURES if x[f][1] <= 0.05 and x[f][0] < 0])
+        [1 for f in cfg.FEATURES if x[f][1] <= cfg.SIG_ALPHA and x[f][0] < 0])
     df['-'] = df.apply(func, axis=1)
     func = lambda x: x['+'] + x['-']
     df['+/-'] = df.apply(func, axis=1)
@@ -80,9 +66,64 @@ def annotate_local_measure(df):
         else '-' if x['+'] == 0 and x['-'] > 0 \
         else '+/-'
     df['pm_type'] = df.apply(func, axis=1)
+    # annotation changed in place, any cached count cube is outdated
+    _cnt_cubes.pop(id(df), None)
     return df
 
 
+@prf.timed
+def get_cnt_cube(df, refresh=False):
+    ''' returns (cached) number of speakers per speaker type and annotation
+
+    the cube is computed in one grouping pass over all columns from 
+    cfg.CNT_CUBE_COLS that df contains and cached per dataframe object; 
+    dataframes derived from df (e.g., by filtering) get their own cube
+
+    args:
+        df: pandas dataframe as returned by annotate_local_measure (possibly
+            with speaker info and filtered)
+        refresh: whether to recompute a cached cube (needed after changing 
+            any of the cube's columns in place)
+    returns:
+        pandas series with number of speakers indexed by the cube's columns
+        (only combinations that occur, including missing values)
+    '''
+    key = id(df)
+    cols = [col for col in cfg.CNT_CUBE_COLS if col in df.columns]
+    ref, fpr, cube = _cnt_cubes.get(key, (None, None, None))
+    if refresh or ref is None or ref() is not df or fpr != (len(df), cols):
+        cube = df.groupby(cols, dropna=False).size()
+        ref = weakref.ref(df, lambda _: _cnt_cubes.pop(key, None))
+        _cnt_cubes[key] = (ref, (len(df), cols), cube)
+    return cube
+
+
+def _get_cnts(df, levels):
+    ''' number of speakers per given level(s) of the count cube 
+
+    like df.groupby(levels), combinations with missing values are dropped '''
+    return get_cnt_cube(df).groupby(level=levels).sum()
+
+
+def _get_sig_cnts(df):
+    ''' number of speakers with/without significant entrainment '''
+    cnts = _get_cnts(df, 'pm_type')
+    return [cnts.sum() - cnts.get('0', 0), cnts.get('0', 0)]
+
+
+def _get_sig_fea_cnts(df):
+    ''' number of speakers with 1, 2, 3+ significant features '''
+    cnts = _get_cnts(df, '+/-')
+    return [cnts.get(1, 0), cnts.get(2, 0), cnts[cnts.index > 2].sum()]
+
+
+def _get_valence_cnts(df):
+    ''' number of speakers with positive, negative, and mixed valence '''
+    cnts = _get_cnts(df, 'pm_type')
+    return [cnts.get('+', 0), cnts.get('-', 0), cnts.get('+/-', 0)]
+
+
+@prf.timed
 def add_speaker_info(df, df_bt):
     ''' adds speaker meta data to df with entrainment measure results
     
@@ -92,19 +133,46 @@ def add_speaker_info(df, df_bt):
     returns:
         df with additional columns for speaker/partner gender/language 
         plus speaker identifier (A/B), role, and years of english experience
+        (and the sampling fractions of df_bt in attrs, if it is a sample of
+        sessions; see ap.load_data)
     '''
-    loc_cols = [
-        'gender', 'native_lang', 'gender_paired', 'native_lang_paired', 
-        'speaker_a_or_b', 'speaker_role', 'eng_yrs'
-    ]
-    return df.join(
-        df_bt.groupby(['ses_id', 'tsk_id', 'spk_id']).first().loc[:, loc_cols])
+    df = df.join(df_bt.groupby(['ses_id', 'tsk_id', 'spk_id']).first().loc[
+        :, cfg.SPK_INFO_COLS])
+    for key in ['sample_frac', 'sample_strata']:
+        if key in df_bt.attrs:
+            df.attrs[key] = df_bt.attrs[key]
+    return df
+
+
+def _get_excl_fc(df):
+    ''' speakers "B" of pairs matching in gender and native language '''
+    return (df['gender'] == df['gender_paired']).to_numpy() \
+         & (df['native_lang'] == df['native_lang_paired']).to_numpy() \
+         & (df['speaker_a_or_b'] == 'B').to_numpy()
+
+
+# (tsk_id, spk_id) pairs to exclude for xcdc, hashed once for all lookups
+_tsk_spk_excl_dc = pd.MultiIndex.from_tuples(
+    cfg.TSK_SPK_EXCL_DC, names=['tsk_id', 'spk_id'])
+
+
+def _get_excl_dc(df):
+    ''' specific selection of tasks & speakers (see cfg.TSK_SPK_EXCL_DC) '''
+    return df.index.droplevel('ses_id').isin(_tsk_spk_excl_dc)
+
+
+# balancing rules per corpus, each returns a boolean mask of rows to remove
+_excl_rules = {
+    cfg.CORPUS_ID_FC: _get_excl_fc,
+    cfg.CORPUS_ID_DC: _get_excl_dc
+}
 
 
 def filter_half_of_matches(corpus_id, df):
     ''' filters out half of rows with matching speaker/partner gender&language
 
     for fisher, removes speaker "B" for those rows; for xcdc, removes selection
+    (rules in _excl_rules, applied as one vectorized mask on the given index)
 
     args:
         corpus_id: one of the constants defined in cfg, identifying the corpus
@@ -114,85 +182,141 @@ def filter_half_of_matches(corpus_id, df):
         input dataframe with some rows filtered out
     '''
     cfg.check_corpus_id(corpus_id)
-    if corpus_id == cfg.CORPUS_ID_FC:
-        f1 = df['gender']==df['gender_paired']
-        f2 = df['native_lang']==df['native_lang_paired']
-        f3 = df['speaker_a_or_b']=='B'
-        df_res = df[~(f1&f2&f3)]
-    else: # corpus_id == cfg.CORPUS_ID_DC
-        # remove specific selection of tasks & speakers
-        df_res = df.reset_index()
-        func = lambda x: (x['tsk_id'], x['spk_id']) not in cfg.TSK_SPK_EXCL_DC
-        df_res['include'] = df_res.apply(func, axis=1)
-        df_res = df_res[df_res['include']]
-        df_res.set_index(['ses_id', 'tsk_id', 'spk_id'], inplace=True)
-        df_res.drop(['include'], axis=1, inplace=True)
-    return df_res
+    return df[~_excl_rules[corpus_id](df)]
+
+
+def _get_sample_se(df, num, den):
+    ''' standard error of a ratio of speaker counts in a sample of sessions
+
+    linearized ratio estimator for a stratified sample of sessions (clusters 
+    of speakers), with finite population correction per stratum (see 
+    ap.load_data with sample_frac); strata with a single session in df do not
+    contribute
+
+    args:
+        df: pandas dataframe with speaker info (see add_speaker_info) and attrs
+            "sample_strata"
+        num: boolean numpy array, whether each row counts for the numerator
+        den: boolean numpy array, whether each row counts for the denominator
+    returns:
+        standard error of num.sum() / den.sum()
+    '''
+    num = num.astype(float)
+    den = den.astype(float)
+    r = num.sum() / den.sum()
+    df_z = pd.DataFrame({
+        'stratum': aux.get_pair_type(
+            aux.get_spk_type(df['gender'], df['native_lang']),
+            aux.get_spk_type(df['gender_paired'], df['native_lang_paired'])
+        ).to_numpy(),
+        'ses_id': df.index.get_level_values('ses_id'),
+        'z': num - r * den})
+    # residual totals per session, deviations from their mean per stratum
+    z = df_z.groupby(['stratum', 'ses_id'])['z'].sum()
+    z_grp = z.groupby(level='stratum')
+    n = z_grp.transform('size')
+    fpc = 1 - z.index.get_level_values('stratum').map(df.attrs['sample_strata'])
+    dev2 = (z - z_grp.transform('mean')) ** 2
+    var = (fpc.to_numpy() * dev2 * n / (n - 1))[n > 1].sum()
+    return np.sqrt(var) / den.sum()
 
 
 def get_stats(df, title):
-    ''' print entraining speaker stats based on given measure dataframe '''
+    ''' print entraining speaker stats based on given measure dataframe 
+
+    for results based on a sample of sessions (see ap.load_data), the 
+    sampling fraction is printed and the sampling error (standard error, 
+    percentage points) next to each percentage
+    '''
+    _assert_not_boot(df)
     print(title)
-    df1 = df.groupby(['pm_type']).count()[['+']].reset_index().rename(
-        columns={'pm_type': 'id', '+': 'cnt'})
-    func1 = lambda x: round(x['cnt'] / sum(df1['cnt']), 3)
-    df1['pct_ttl'] = df1.apply(func1, axis=1)
     get_pct = lambda x: round(100 * x, 1)
-    print('Entraining speakers: %.1f%%' % 
-          get_pct(1 - df1[df1['id']=='0']['pct_ttl']))
+    sampled = 'sample_strata' in df.attrs
+    if sampled:
+        print('Sample: %.1f%% of sessions' % (100 * df.attrs['sample_frac']))
+    # sampling error of a percentage (empty string if not sampled)
+    get_se = lambda num, den: ' (+/-%.1f)' % get_pct(
+        _get_sample_se(df, num, den)) if sampled else ''
+    pm_type = df['pm_type'].to_numpy()
+    n_sig = df['+/-'].to_numpy()
+    is_ent = pm_type != '0'
+    cnts = _get_cnts(df, 'pm_type')
+    pct_ttl = (cnts / cnts.sum()).round(3)
+    print('Entraining speakers: %.1f%%' % get_pct(1 - pct_ttl.get('0', 0))
+          + get_se(is_ent, np.ones(len(df), dtype=bool)))
     
-    func2 = lambda x: round(x['cnt'] / sum(df1[df1['id']!='0']['cnt']), 3)
-    df1['pct_ent'] = df1.apply(func2, axis=1)
+    cnt_ent = cnts.drop('0', errors='ignore').sum()
+    pct_ent = (cnts / cnt_ent).round(3)
     print('Valence')
-    print('\tpositive: %.1f' % get_pct(df1[df1['id']=='+']['pct_ent']))
-    print('\tnegative: %.1f' % get_pct(df1[df1['id']=='-']['pct_ent']))
-    print('\tmixed:    %.1f' % get_pct(df1[df1['id']=='+/-']['pct_ent']))
+    print('\tpositive: %.1f' % get_pct(pct_ent.get('+', 0))
+          + get_se(pm_type == '+', is_ent))
+    print('\tnegative: %.1f' % get_pct(pct_ent.get('-', 0))
+          + get_se(pm_type == '-', is_ent))
+    print('\tmixed:    %.1f' % get_pct(pct_ent.get('+/-', 0))
+          + get_se(pm_type == '+/-', is_ent))
     
-    df2 = df.groupby(['+/-']).count()[['+']].reset_index().rename(
-        columns={'+/-': 'id', '+': 'cnt'}).astype({'id': str})
-    df2['pct_ent'] = df2.apply(func2, axis=1)
+    pct_ent = (_get_cnts(df, '+/-') / cnt_ent).round(3)
     print('#Features')
-    print('\t1:   %.1f' % get_pct(df2[df2['id']=='1']['pct_ent']))
-    print('\t2:   %.1f' % get_pct(df2[df2['id']=='2']['pct_ent']))
-    print('\t3+:  %.1f' % get_pct(sum(df2['pct_ent'].iloc[3:])))
-    print('\tmax: %d' % max(df['+/-']))
+    print('\t1:   %.1f' % get_pct(pct_ent.get(1, 0))
+          + get_se(n_sig == 1, is_ent))
+    print('\t2:   %.1f' % get_pct(pct_ent.get(2, 0))
+          + get_se(n_sig == 2, is_ent))
+    print('\t3+:  %.1f' % get_pct(pct_ent[pct_ent.index > 2].sum())
+          + get_se(n_sig > 2, is_ent))
+    print('\tmax: %d' % max(pct_ent.index))
 
 
-def get_chart(corpus_id, df, title):
-    ''' produce stacked bar chart of valence percentages per speaker group '''
-    # 'x' is for missing speaker types in fisher
-    df_all = pd.DataFrame(index=['+', '-', '+/-', '0', 'x'])
-    grp_cols = ['gender', 'native_lang', 'gender_paired', 'native_lang_paired']
-    for (g, nl, g_p, nl_p), df_grp in df.groupby(grp_cols):
-        speaker_type = g.upper() + nl[0] + '-' + g_p.upper() + nl_p[0]
-        df_grp = df_grp.groupby(['pm_type']).count()[['+']]
-        func = lambda x, total: round(x['+'] / total, 3)
-        df_grp[speaker_type] = df_grp.apply(func, axis=1, total=sum(df_grp['+']))
-        df_grp = df_grp.reindex(['+', '-', '+/-', '0', 'x'], fill_value=0)
-        df_grp.drop(['+'], axis=1, inplace=True)
-        df_all = df_all.join(df_grp)
-        if corpus_id == cfg.CORPUS_ID_FC:
-            df_all['FC-FC'] = [0.0, 0.0, 0.0, 0.0, 1.0]
-            df_all['FC-MC'] = [0.0, 0.0, 0.0, 0.0, 1.0]
-            df_all['MC-FC'] = [0.0, 0.0, 0.0, 0.0, 1.0]
-            df_all['MC-MC'] = [0.0, 0.0, 0.0, 0.0, 1.0]
-        df_all = df_all[sorted(df_all.columns)]
+def get_ent_pct_ci(df, title, alpha=cfg.BOOT_ALPHA):
+    ''' print % entraining speakers with bootstrap confidence interval
+
+    args:
+        df: pandas dataframe as returned by ap.boot_test (possibly filtered)
+        title: title to print before the results
+        alpha: confidence interval is at level 1 - alpha (percentile method)
+    '''
+    assert 'boot_ci' in df.columns, 'expecting results of ap.boot_test'
+    # speakers x resamples; percentage of entraining speakers per resample
+    pcts = 100 * np.stack(df['ent_boot'].to_numpy()).mean(axis=0)
+    lo, hi = np.percentile(pcts, [50 * alpha, 100 - 50 * alpha])
+    print(title)
+    print('Entraining speakers (bootstrap): %.1f%% [%.1f%%, %.1f%%]' % 
+          (pcts.mean(), lo, hi))
 
+
+def _get_chart_data(corpus_id, df):
+    ''' percentages per valence (rows) and speaker type (columns) for charts '''
+    # 'x' is for missing speaker types in fisher
+    cnts = _get_cnts(df, cfg.CNT_CUBE_COLS[:5])
+    pcts = (cnts / cnts.groupby(level=[0, 1, 2, 3]).transform('sum')).round(3)
+    df_all = pcts.unstack('pm_type').T.reindex(
+        ['+', '-', '+/-', '0', 'x']).fillna(0.0)
+    lvl = df_all.columns.get_level_values
+    df_all.columns = lvl(0).str.upper() + lvl(1).str[0] + '-' \
+                   + lvl(2).str.upper() + lvl(3).str[0]
+    if corpus_id == cfg.CORPUS_ID_FC and len(df_all.columns) > 0:
+        for speaker_type in ['FC-FC', 'FC-MC', 'MC-FC', 'MC-MC']:
+            df_all[speaker_type] = [0.0, 0.0, 0.0, 0.0, 1.0]
+    return df_all[sorted(df_all.columns)]
+
+
+def _draw_chart(fig, ax, df_all, title):
+    ''' draws stacked bar chart for given chart data on given figure/axes 
+
+    uses only the object-oriented matplotlib api (no global pyplot state), so 
+    figures can also be rendered without any interactive backend '''
     pcts_m = df_all.iloc[1,:]
     pcts_p = df_all.iloc[0,:]
     pcts_pm = df_all.iloc[2,:]
     pcts_0 = df_all.iloc[3,:]
     pcts_x = df_all.iloc[4,:]
-    pcts_pm_sum = [pcts_m[i] + pcts_p[i] for i in range(len(pcts_m))]
-    pcts_pmpm_sum = [pcts_p[i] + pcts_m[i] + pcts_pm[i] 
-                     for i in range(len(pcts_p))]
+    pcts_pm_sum = pcts_m + pcts_p
+    pcts_pmpm_sum = pcts_p + pcts_m + pcts_pm
 
     x = range(len(pcts_m))
-    fig, ax = plt.subplots()
     fig.set_size_inches(18, 9)
-    plt.tick_params(axis='both', which='major', 
-                    labelsize=30, width=3, length=7)
-    plt.title(title, fontsize=35)
+    ax.tick_params(axis='both', which='major', 
+                   labelsize=30, width=3, length=7)
+    ax.set_title(title, fontsize=35)
 
     p_m = ax.bar(x, pcts_m, color='#EEEEEE', hatch='-', label='-')
     p_p = ax.bar(x, pcts_p, bottom=pcts_m, color='#BBBBBB', 
@@ -206,16 +330,83 @@ def get_chart(corpus_id, df, title):
     box = ax.get_position()
     ax.set_position([box.x0, box.y0 + box.height * 0.1,
                      box.width, box.height * 0.9])
-    ax.legend()
-    plt.xticks(x, df_all.columns, rotation=90)
-    plt.yticks(np.arange(0, 1.01, 0.1))
+    ax.set_xticks(x, df_all.columns, rotation=90)
+    ax.set_yticks(np.arange(0, 1.01, 0.1))
     ax.legend((p_0[0], p_pm[0], p_p[0], p_m[0]), ('0', '+/-', '+', '-'),
                prop={'size': 25}, loc='upper center', 
                bbox_to_anchor=(0.5, -0.242),
                fancybox=True, shadow=True, ncol=4)
+
+
+@prf.timed
+def _chart_worker(df_all, title, fname):
+    ''' renders one chart to file, on a figure detached from pyplot '''
+    fig = matplotlib.figure.Figure()
+    _draw_chart(fig, fig.subplots(), df_all, title)
+    fig.savefig(fname, bbox_inches='tight')
+
+
+def get_chart(corpus_id, df, title):
+    ''' produce stacked bar chart of valence percentages per speaker group '''
+    fig, ax = plt.subplots()
+    _draw_chart(fig, ax, _get_chart_data(corpus_id, df), title)
     plt.show()
 
 
+@prf.timed
+def render_charts(specs, path, fmt='png', n_jobs=None, use_cache=True):
+    ''' renders charts as by get_chart to files, in parallel and headless
+
+    chart data is prepared for all charts upfront (from the cached count 
+    cubes), rendering runs in a process pool on figures without pyplot; file 
+    names are derived from the titles; with use_cache, charts are skipped if 
+    their file exists and data, title, and format are unchanged (hashes are 
+    kept in charts.json in the output directory)
+
+    args:
+        specs: list of (corpus_id, df, title) tuples, arguments of get_chart
+        path: output directory
+        fmt: file format, one of 'png', 'svg', 'pdf'
+        n_jobs: number of processes (None: os.cpu_count(), 1: no pool)
+        use_cache: whether to skip charts whose inputs are unchanged
+    returns:
+        list of file names (with path) in order of specs
+    '''
+    assert fmt in ['png', 'svg', 'pdf'], 'fmt must be png, svg, or pdf'
+    os.makedirs(path, exist_ok=True)
+    cache_fname = os.path.join(path, 'charts.json')
+    cache = {}
+    if use_cache and os.path.exists(cache_fname):
+        with open(cache_fname) as cache_file:
+            cache = json.load(cache_file)
+    fnames = []
+    jobs = []
+    for corpus_id, df, title in specs:
+        df_all = _get_chart_data(corpus_id, df)
+        fname = os.path.join(path, '%s.%s' % (
+            re.sub('[^0-9a-z]+', '_', title.lower()).strip('_'), fmt))
+        assert fname not in fnames, 'chart titles must be unique'
+        fnames.append(fname)
+        h = hashlib.sha1(json.dumps([title, fmt]).encode())
+        h.update(df_all.to_csv().encode())
+        h = h.hexdigest()[:16]
+        key = os.path.basename(fname)
+        if cache.get(key) != h or not os.path.exists(fname):
+            jobs.append((df_all, title, fname))
+            cache[key] = h
+    n_jobs = min(len(jobs), n_jobs or os.cpu_count())
+    if n_jobs <= 1:
+        for job in jobs:
+            _chart_worker(*job)
+    else:
+        with multiprocessing.Pool(n_jobs) as pool:
+            pool.starmap(_chart_worker, jobs)
+    if use_cache:
+        with open(cache_fname, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=4, sort_keys=True)
+    return fnames
+
+
 def prep_for_anova(df_in, func=aux.r2z):
     ''' convert dataframe to right format for anova analysis '''
     df_out = pd.DataFrame()
@@ -229,6 +420,152 @@ def prep_for_anova(df_in, func=aux.r2z):
     return df_out
 
 
+def _get_anova_design(df):
+    ''' returns factors and design blocks for the model g + l + g:l
+
+    factor levels are sorted (like R's as.factor); blocks use treatment coding
+    and follow R's model.matrix (intercept, g, l, g:l with g varying fastest)
+    '''
+    g = pd.Categorical(df['g'])
+    l = pd.Categorical(df['l'])
+    x_g = np.eye(len(g.categories))[g.codes][:, 1:]
+    x_l = np.eye(len(l.categories))[l.codes][:, 1:]
+    x_gl = (x_l[:, :, None] * x_g[:, None, :]).reshape(len(df), -1)
+    return g, l, [np.ones((len(df), 1)), x_g, x_l, x_gl]
+
+
+def _fit_anova(blocks, y):
+    ''' sequential (type I) least squares fit for all columns of y at once
+
+    each block of the design is orthogonalized against all previous ones; the
+    projection of y onto the resulting basis is the term's share of the fit
+    (aliased columns, e.g., for empty g:l cells, do not add to the basis)
+
+    args:
+        blocks: list of design matrix blocks, intercept first
+        y: numpy array, one column per dependent variable, no missing values
+    returns:
+        list of (dof, projection) per block, residual dof, residuals
+    '''
+    basis = np.empty((len(y), 0))
+    fits = []
+    for x in blocks:
+        tol = 1e-7 * max(1.0, np.abs(x).sum(axis=0).max())
+        x = x - basis @ (basis.T @ x)
+        u, s, _ = np.linalg.svd(x, full_matrices=False)
+        u = u[:, s > tol]
+        fits.append((u.shape[1], u @ (u.T @ y)))
+        basis = np.hstack([basis, u])
+    res = y - sum(prj for _, prj in fits)
+    return fits, len(y) - basis.shape[1], res
+
+
+def _tukey_hsd(means, cnts, mse, dof, names, conf_level):
+    ''' tukey honest significant differences (as R's TukeyHSD)
+
+    returns dataframe with one row per pair of levels, in R's order '''
+    k = len(means)
+    j, i = np.triu_indices(k, 1)
+    diff = means[i] - means[j]
+    se = np.sqrt(mse / 2 * (1 / cnts[i] + 1 / cnts[j]))
+    width = scipy.stats.studentized_range.ppf(conf_level, k, dof) * se
+    pval = scipy.stats.studentized_range.sf(np.abs(diff) / se, k, dof)
+    return pd.DataFrame({
+        'comparison': ['%s-%s' % (names[a], names[b]) for a, b in zip(i, j)],
+        'diff': diff, 'lwr': diff - width, 'upr': diff + width, 'p adj': pval
+    })
+
+
+@prf.timed
+def get_anovas(df, features=cfg.FEATURES, alpha=0.05, conf_level=0.95):
+    ''' two-way anova (g + l + g:l) for all features with tukey post-hoc tests
+
+    replaces R/anova.R; all features without missing values (in the same rows)
+    share one fit; sums of squares are sequential (type I) like R's aov
+
+    args:
+        df: pandas dataframe as returned by prep_for_anova
+        features: dependent variables (columns of df)
+        alpha: tukey hsd is run for each term with p < alpha
+        conf_level: family-wise confidence level for tukey hsd
+    returns:
+        anova table indexed by (feature, term) and tukey hsd results indexed
+        by (feature, term, comparison)
+    '''
+    terms = ['g', 'l', 'g:l']
+    g, l, blocks = _get_anova_design(df)
+    # cells of each term; interaction cells with g varying fastest
+    cells = {
+        'g': (g.codes, list(g.categories)),
+        'l': (l.codes, list(l.categories)),
+        'g:l': (l.codes * len(g.categories) + g.codes,
+                ['%s:%s' % (a, b) for b in l.categories for a in g.categories])
+    }
+    # projections forming the means of each term (R's model.tables), that is,
+    # the intercept and all terms marginal to it
+    marginal = {'g': [0, 1], 'l': [0, 2], 'g:l': [0, 1, 2, 3]}
+    y = df[features].to_numpy(dtype=float)
+    # group features by rows with missing values (each group is fit once)
+    grps = {}
+    for k, mask in enumerate(~np.isnan(y).T):
+        grps.setdefault(mask.tobytes(), (mask, []))[1].append(k)
+    aov_rows = {}
+    tuk_dfs = {}
+    for mask, cols in grps.values():
+        fits, dof_res, res = _fit_anova([x[mask] for x in blocks], 
+                                        y[mask][:, cols])
+        ss_res = (res ** 2).sum(axis=0)
+        for c, k in enumerate(cols):
+            f = features[k]
+            mse = ss_res[c] / dof_res
+            for t, (dof, prj) in zip(terms, fits[1:]):
+                ss = (prj[:, c] ** 2).sum()
+                fval = ss / dof / mse
+                pval = scipy.stats.f.sf(fval, dof, dof_res)
+                aov_rows[(f, t)] = [dof, ss, ss / dof, fval, pval]
+                if not pval < alpha:
+                    continue
+                codes, names = cells[t]
+                codes = codes[mask]
+                vals = sum(fits[b][1][:, c] for b in marginal[t])
+                cnts = np.bincount(codes, minlength=len(names))
+                keep = cnts > 0
+                means = np.bincount(codes, vals, len(names))[keep] / cnts[keep]
+                tuk_dfs[(f, t)] = _tukey_hsd(
+                    means, cnts[keep], mse, dof_res, 
+                    list(np.array(names)[keep]), conf_level)
+            aov_rows[(f, 'Residuals')] = [dof_res, ss_res[c], mse, 
+                                          np.nan, np.nan]
+    idx = pd.MultiIndex.from_product([features, terms + ['Residuals']],
+                                     names=['feature', 'term'])
+    df_aov = pd.DataFrame.from_dict(aov_rows, orient='index', columns=[
+        'Df', 'Sum Sq', 'Mean Sq', 'F value', 'Pr(>F)']).reindex(idx)
+    df_aov['Df'] = df_aov['Df'].astype(int)
+    tuk_cols = ['feature', 'term', 'comparison', 'diff', 'lwr', 'upr', 'p adj']
+    df_tuk = [tuk_dfs[(f, t)].assign(feature=f, term=t)
+              for f in features for t in terms if (f, t) in tuk_dfs]
+    df_tuk = pd.concat(df_tuk) if df_tuk else pd.DataFrame(columns=tuk_cols)
+    df_tuk = df_tuk[tuk_cols].set_index(['feature', 'term', 'comparison'])
+    return df_aov, df_tuk
+
+
+def run_anovas(df, features=cfg.FEATURES, alpha=0.05, conf_level=0.95):
+    ''' prints anova and tukey hsd results per feature (see get_anovas) '''
+    df_aov, df_tuk = get_anovas(df, features, alpha, conf_level)
+    for f in features:
+        print('%s ~ g + l + g:l' % f)
+        print(df_aov.loc[f].to_string(na_rep=''))
+        print()
+        if f in df_tuk.index.get_level_values('feature'):
+            for t, df_t in df_tuk.loc[f].groupby(level='term', sort=False):
+                print('Tukey HSD (%s), %d%% family-wise confidence level' % 
+                      (t, round(100 * conf_level)))
+                print(df_t.droplevel('term').to_string())
+                print()
+        print('\n\n')
+    return df_aov, df_tuk
+
+
 def correlate_eng_yrs(df, title, func=aux.r2z):
     ''' correlates given measure with speakers' years of english experience '''
     df = df[df['native_lang'] == 'Chinese']
@@ -254,117 +591,93 @@ def compare_spk_in_both_roles(df_ee, df_er, title):
     print()
 
 
+def compare_to_baseline(df, title):
+    ''' compares partner with non-partner values for global measures
+
+    args:
+        df: pandas dataframe as returned by ap.prx or ap.con, with partner 
+            value (index 0) and mean non-partner value (index 1) per cell
+        title: title to print before the results
+    '''
+    print(title)
+    for f in cfg.FEATURES:
+        x = np.array(_get_data(df[f], 0), dtype=float)
+        y = np.array(_get_data(df[f], 1), dtype=float)
+        # speakers without any matched non-partner have no baseline
+        valid = ~(np.isnan(x) | np.isnan(y))
+        t, p, dof = aux.ttest_rel(x[valid], y[valid])
+        d = aux.cohen_d(x[valid], y[valid])
+        print(f, round(t, 6), p, dof, round(d, 6))
+    print()
+
+
 def compare_valence_per_spk_type(df, title):
     ''' compares #speakers with only pos/neg valence across spk types '''
-    df = df.copy()
+    # count per speaker type and valence, in same row for both valences;
     # only consider those with entirely positive or negative valence
-    df = df[(df['pm_type']=='+')|(df['pm_type']=='-')]
-    # compute count per speaker type and valence
-    df['cnt'] = 1
-    grp_cols = ['gender', 'native_lang', 
-                'gender_paired', 'native_lang_paired',
-                'pm_type']
-    df = df.groupby(grp_cols).count()[['cnt']]
-    # self-join to get results for both valences in same row and run test
-    df = df.xs('+', level=4).join(df.xs('-', level=4), 
-        lsuffix='_+', 
-        rsuffix='_-',
-        how='outer'
-    ).fillna(0)
-    print(title, aux.ttest_rel(df['cnt_+'], df['cnt_-']))
+    cnts = _get_cnts(df, cfg.CNT_CUBE_COLS[:5]).unstack('pm_type')
+    cnts = cnts.reindex(columns=['+', '-']).fillna(0)
+    cnts = cnts[cnts.sum(axis=1) > 0]
+    print(title, aux.ttest_rel(cnts['+'], cnts['-']))
 
 
 def compare_sig_cnt_within_corpus(df_lcon, df_syn, title):
     ''' compares #sig. speakers across measures within corpus '''
-    obs = [[len(df_lcon[df_lcon['pm_type']!='0']),
-            len(df_lcon[df_lcon['pm_type']=='0'])], 
-           [len(df_syn[df_syn['pm_type']!='0']),
-            len(df_syn[df_syn['pm_type']=='0'])]]
+    obs = [_get_sig_cnts(df_lcon), _get_sig_cnts(df_syn)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_sig_cnt_across_corpora(df_ee, df_er, df_fc, title):
     ''' compares #sig. speakers within measure across corpora '''
-    obs = [[len(df_ee[df_ee['pm_type']!='0']),
-            len(df_ee[df_ee['pm_type']=='0'])], 
-           [len(df_er[df_er['pm_type']!='0']),
-            len(df_er[df_er['pm_type']=='0'])], 
-           [len(df_fc[df_fc['pm_type']!='0']),
-            len(df_fc[df_fc['pm_type']=='0'])]]
+    obs = [_get_sig_cnts(df_ee), _get_sig_cnts(df_er), _get_sig_cnts(df_fc)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_sig_fea_cnt_across_corpora(df_ee, df_er, df_fc, title):
     ''' compares #speakers per sig. feature cnt within measure across corpora'''
-    obs = [[len(df_ee[df_ee['+/-']==1]),
-            len(df_ee[df_ee['+/-']==2]),
-            len(df_ee[df_ee['+/-']>2])], 
-           [len(df_er[df_er['+/-']==1]),
-            len(df_er[df_er['+/-']==2]),
-            len(df_er[df_er['+/-']>2])], 
-           [len(df_fc[df_fc['+/-']==1]),
-            len(df_fc[df_fc['+/-']==2]),
-            len(df_fc[df_fc['+/-']>2])]]
+    obs = [_get_sig_fea_cnts(df_ee), 
+           _get_sig_fea_cnts(df_er), 
+           _get_sig_fea_cnts(df_fc)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_valence_across_corpora(df_ee, df_er, df_fc, title):
     ''' compares #speakers per (non-0) valence within measure across corpora '''
-    obs = [[len(df_ee[df_ee['pm_type']=='+']),
-            len(df_ee[df_ee['pm_type']=='-']),
-            len(df_ee[df_ee['pm_type']=='+/-'])], 
-           [len(df_er[df_er['pm_type']=='+']),
-            len(df_er[df_er['pm_type']=='-']),
-            len(df_er[df_er['pm_type']=='+/-'])], 
-           [len(df_fc[df_fc['pm_type']=='+']),
-            len(df_fc[df_fc['pm_type']=='-']),
-            len(df_fc[df_fc['pm_type']=='+/-'])]]
+    obs = [_get_valence_cnts(df_ee), 
+           _get_valence_cnts(df_er), 
+           _get_valence_cnts(df_fc)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_sig_cnt_across_dc(df_ee, df_er, title):
     ''' compares #sig. speakers within measure across deception corpus '''
-    obs = [[len(df_ee[df_ee['pm_type']!='0']),
-            len(df_ee[df_ee['pm_type']=='0'])], 
-           [len(df_er[df_er['pm_type']!='0']),
-            len(df_er[df_er['pm_type']=='0'])]]
+    obs = [_get_sig_cnts(df_ee), _get_sig_cnts(df_er)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_sig_fea_cnt_across_dc(df_ee, df_er, title):
     ''' compares #speakers per sig. feature cnt within measure across XCDC '''
-    obs = [[len(df_ee[df_ee['+/-']==1]),
-            len(df_ee[df_ee['+/-']==2]),
-            len(df_ee[df_ee['+/-']>2])], 
-           [len(df_er[df_er['+/-']==1]),
-            len(df_er[df_er['+/-']==2]),
-            len(df_er[df_er['+/-']>2])]]
+    obs = [_get_sig_fea_cnts(df_ee), _get_sig_fea_cnts(df_er)]
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
 
 
 def compare_sig_cnt_per_spk_type(df_lcon, df_syn, title):
     ''' compares #sig. speakers for lcon/syn across spk types '''
-    df1 = df_lcon.copy()
-    df2 = df_syn.copy()
-    # only consider those with entrainment on at least one feature
-    df1 = df1[df1['pm_type']!='0']
-    df2 = df2[df2['pm_type']!='0']
-    # compute count per speaker type
-    df1['cnt'] = 1
-    df2['cnt'] = 1
-    grp_cols = ['gender', 'native_lang', 
-                'gender_paired', 'native_lang_paired']
-    df1 = df1.groupby(grp_cols).count()[['cnt']]
-    df2 = df2.groupby(grp_cols).count()[['cnt']]
+    def __get_sig_cnts(df):
+        ''' count per speaker type, only entrainment on at least one feature'''
+        cnts = _get_cnts(df, cfg.CNT_CUBE_COLS[:5])
+        cnts = cnts.drop('0', level='pm_type', errors='ignore')
+        return cnts.groupby(level=[0, 1, 2, 3]).sum()
     # join to get results for both measures in same row and run test
-    df = df1.join(df2, lsuffix='_syn', rsuffix='_con', how='outer').fillna(0)
-    print(title, aux.ttest_rel(df['cnt_syn'], df['cnt_con']))
+    df = pd.concat([__get_sig_cnts(df_lcon), __get_sig_cnts(df_syn)], 
+                   axis=1, keys=['lcon', 'syn']).fillna(0)
+    print(title, aux.ttest_rel(df['lcon'], df['syn']))
 
 
 def compare_prtl_spk_types(df, col, levels, title, full_product=True):
@@ -373,22 +686,19 @@ def compare_prtl_spk_types(df, col, levels, title, full_product=True):
     partial speaker types only contain speaker & partner gender *or* native lang
     '''
     assert col in ['gender', 'native_lang'], 'col must be gender or native_lang'
-    df = df.copy()
     # compute count per (partial) speaker type and valence    
-    df['cnt'] = 1
-    grp_cols = [col, col + '_paired', 'pm_type']
-    df = df.groupby(grp_cols).count()[['cnt']]
-    # ensure dataframe index contains all combinations of spk type & valence
+    cnts = _get_cnts(df, [col, col + '_paired', 'pm_type'])
+    # ensure index contains all combinations of spk type & valence
     idx = itertools.product(levels, levels, ['+', '-', '+/-', '0'])
     if not full_product:
         # fisher corpus does not have chinese-chinese pairs; full_product flag
         # allows exclusion of those from calculation
         idx = list(idx)[4:]
-    df = df.reindex(idx, fill_value=0)
+    cnts = cnts.reindex(idx, fill_value=0)
     # group counts into 2d list of observations and run test
-    obs = [df['cnt'][:4], df['cnt'][4:8], df['cnt'][8:12]]
+    obs = [cnts.iloc[:4], cnts.iloc[4:8], cnts.iloc[8:12]]
     if full_product:
-        obs.append(df['cnt'][12:])
+        obs.append(cnts.iloc[12:])
     chi2, p, dof, exp = scipy.stats.contingency.chi2_contingency(obs)
     print(title, chi2, p, dof)
     return np.array(obs), exp
@@ -399,54 +709,141 @@ def get_ti_tf_ipus(df_bt):
     # limit to turn exchanges, i.e., paired chunks
     df = df_bt[df_bt['p_or_x'] == 'p']
     # get all turn initial and turn final chunks in separate rows
-    chu_ids_ti = list(df['chu_id'].values)
-    chu_ids_tf = [int(v) for v in df['chu_id_paired'].values]
-    df = df_bt[df_bt['chu_id'].isin(chu_ids_ti + chu_ids_tf)].copy()
+    chu_ids = np.concatenate([df['chu_id'].to_numpy(dtype='int64'),
+                              df['chu_id_paired'].to_numpy(dtype='int64')])
+    df = df_bt[df_bt['chu_id'].isin(chu_ids)].copy()
     # add auxiliary column
     df['cnt'] = 1
     return df
 
 
-def get_ipu_stats(df_rel, df_all, do_role_comp=False):
-    ''' print stats for relevant (turn-initial/turn-final) and all ipus '''
-    print('total number of relevant IPUs:', len(df_rel))
+# per speaker statistics of relevant ipus in ipu reports, with titles
+_ipu_spk_stats = [
+    ('cnt', 'number of relevant IPUs per speaker'),
+    ('rate_syl', 'speech rate of relevant IPUs per speaker'),
+    ('duration', 'duration of relevant IPUs per speaker'),
+    ('syl', 'syllables per relevant IPU per speaker')
+]
+
+
+def _get_spk_ipu_stats(df_grp, levels):
+    ''' per speaker statistics from sums and counts aggregated per group
+
+    args:
+        df_grp: pandas dataframe with sums and counts as in get_ipu_report
+        levels: index levels to group by (first is spk_id)
+    returns:
+        pandas dataframe with number of ipus and means for each group
+    '''
+    df_grp = df_grp.groupby(level=levels).sum()
+    df_spk = df_grp[['cnt']].copy()
+    for col in ['rate_syl', 'duration', 'syl']:
+        df_spk[col] = df_grp[col + '_sum'] / df_grp[col + '_cnt']
+    return df_spk
+
+
+def _compare_binary(df_grp, col, lvl0, lvl1):
+    ''' t-tests for number, speed, length, and syllables of ipus per speaker
+
+    used to compare speakers based on gender, native language, and role;
+    returns dataframe with one row per statistic '''
+    df_spk = _get_spk_ipu_stats(df_grp, ['spk_id', col])
+    df0 = df_spk.xs(lvl0, level=col)
+    df1 = df_spk.xs(lvl1, level=col)
+    rows = []
+    for stat, title in _ipu_spk_stats:
+        x, y = df0[stat].dropna(), df1[stat].dropna()
+        rows.append([col, stat, title, lvl0, x.mean(), x.std(), 
+                     lvl1, y.mean(), y.std()] + list(aux.ttest_ind(x, y)))
+    return pd.DataFrame(rows, columns=[
+        'col', 'stat', 'title', 'lvl0', 'mean0', 'std0', 
+        'lvl1', 'mean1', 'std1', 't', 'p', 'dof'])
+
+
+@prf.timed
+def get_ipu_report(df_rel, df_all, do_role_comp=False):
+    ''' computes stats for relevant (turn-initial/turn-final) and all ipus
+
+    all per speaker statistics (overall and per gender, native language, and
+    role) derive from one aggregation of sums and counts per (speaker, role);
+    the report can be printed with print_ipu_report
+
+    args:
+        df_rel: "big table" of relevant ipus as returned by get_ti_tf_ipus
+        df_all: "big table" of all ipus as returned by ap.load_data
+        do_role_comp: whether to compare speakers as interviewees/-ers
+    returns:
+        dict with 'rel' (series, stats across relevant ipus), 'tur' (series,
+        ipus per turn), 'spk' (dataframe, stats per speaker), and 'cmp' 
+        (dataframe, comparisons of speaker groups)
+    '''
+    df = df_rel.assign(syl=df_rel['rate_syl'] * df_rel['duration'])
+    keys = ['spk_id', 'gender', 'native_lang', 'speaker_role']
+    df_grp = df.groupby(keys, dropna=False).agg(
+        cnt=('duration', 'size'),
+        rate_syl_sum=('rate_syl', 'sum'), rate_syl_cnt=('rate_syl', 'count'),
+        duration_sum=('duration', 'sum'), duration_cnt=('duration', 'count'),
+        syl_sum=('syl', 'sum'), syl_cnt=('syl', 'count'))
+    rel = pd.Series({
+        'cnt': len(df),
+        'syl_mean': df['syl'].mean(),
+        'syl_std': df['syl'].std(),
+        'duration_mean': df['duration'].mean(),
+        'duration_std': df['duration'].std(),
+        'duration_ttl_h': df['duration'].sum() / 3600
+    })
+    tur_cnts = df_all['tur_id'].value_counts()
+    tur = pd.Series({'cnt_mean': tur_cnts.mean(), 'cnt_std': tur_cnts.std()})
+    cmps = [('gender', 'f', 'm'), ('native_lang', 'Chinese', 'English')]
+    if do_role_comp:
+        cmps.append(('speaker_role', 'f', 'd'))
+    return {
+        'rel': rel,
+        'tur': tur,
+        'spk': _get_spk_ipu_stats(df_grp, ['spk_id']),
+        'cmp': pd.concat([_compare_binary(df_grp, *c) for c in cmps],
+                         ignore_index=True)
+    }
+
+
+def print_ipu_report(report):
+    ''' prints ipu statistics as computed by get_ipu_report '''
+    rel = report['rel']
+    print('total number of relevant IPUs:', int(rel['cnt']))
     print('syllables per relevant IPU: %.2f (%.2f)' %
-          ((df_rel['rate_syl'] * df_rel['duration']).mean(),
-           (df_rel['rate_syl'] * df_rel['duration']).std()))
+          (rel['syl_mean'], rel['syl_std']))
     print('duration per relevant IPU (in s): %.2f (%.2f)' %
-          (df_rel['duration'].mean(), df_rel['duration'].std()))
-    print('total duration of relevant IPUs (in h): %.2f' %
-          (df_rel['duration'].sum() / 3600))
+          (rel['duration_mean'], rel['duration_std']))
+    print('total duration of relevant IPUs (in h): %.2f' % 
+          rel['duration_ttl_h'])
     print('number of total IPUs per turn: %.2f (%.2f)' %
-          (df_all.groupby('tur_id').count()['chu_id'].mean(),
-           df_all.groupby('tur_id').count()['chu_id'].std()))
+          (report['tur']['cnt_mean'], report['tur']['cnt_std']))
     # some counts are notably lower due to stricter handling of
     # null values than before (all features must now be not null)
+    cnts = report['spk']['cnt']
     print('number of relevant IPUs per speaker:\n'
           '\tmin:  %.2f\n'
           '\tmax:  %.2f\n'
           '\tmean: %.2f\n'
           '\tstd:  %.2f\n\n' %
-          (df_rel.groupby('spk_id').count()['cnt'].min(),
-           df_rel.groupby('spk_id').count()['cnt'].max(),
-           df_rel.groupby('spk_id').count()['cnt'].mean(),
-           df_rel.groupby('spk_id').count()['cnt'].std()))
-    print('speech rate of relevant IPUs per speaker: %.2f (%.2f)' %
-          (df_rel.groupby('spk_id')['rate_syl'].mean().mean(),
-           df_rel.groupby('spk_id')['rate_syl'].mean().std()))
-    print('duration of relevant IPUs per speaker: %.2f (%.2f)' %
-          (df_rel.groupby('spk_id')['duration'].mean().mean(),
-           df_rel.groupby('spk_id')['duration'].mean().std()))
-    get_syl_cnt = lambda x: x['rate_syl'] * x['duration']
-    df_tmp = df_rel.groupby('spk_id').apply(get_syl_cnt)
-    print('syllables per relevant IPU per speaker: %.2f (%.2f)\n\n' %
-          (df_tmp.groupby('spk_id').mean().mean(),
-           df_tmp.groupby('spk_id').mean().std()))
-    _compare_binary(df_rel, 'gender', 'f', 'm')
-    _compare_binary(df_rel, 'native_lang', 'Chinese', 'English')
-    if do_role_comp:
-        _compare_binary(df_rel, 'speaker_role', 'f', 'd')
-
+          (cnts.min(), cnts.max(), cnts.mean(), cnts.std()))
+    for stat, title in _ipu_spk_stats[1:]:
+        print('%s: %.2f (%.2f)%s' % (title, report['spk'][stat].mean(), 
+              report['spk'][stat].std(), '\n\n' if stat == 'syl' else ''))
+    for col, df_cmp in report['cmp'].groupby('col', sort=False):
+        for _, r in df_cmp.iterrows():
+            print('%s (%s == %s): %.2f (%.2f)' % 
+                  (r['title'], col, r['lvl0'], r['mean0'], r['std0']))
+            print('%s (%s == %s): %.2f (%.2f)' % 
+                  (r['title'], col, r['lvl1'], r['mean1'], r['std1']))
+            print((r['t'], r['p'], r['dof']))
+        print('\n')
 
 
+def get_ipu_stats(df_rel, df_all, do_role_comp=False):
+    ''' print stats for relevant (turn-initial/turn-final) and all ipus
 
+    returns the report as computed by get_ipu_report '''
+    report = get_ipu_report(df_rel, df_all, do_role_comp)
+    print_ipu_report(report)
+    return report
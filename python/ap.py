@@ -1,13 +1,18 @@
-import itertools
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.shared_memory
 import numpy as np
+import os
 import pandas as pd
 
 import aux
 import cfg
 import db
 import fio
+import prf
 
-# this module implements the two acoustic-prosodic entrainment measures we use
+# this module implements the acoustic-prosodic entrainment measures we use
 # note: in the result dataframes, an index of 0 for ses_id, tsk_id, or spk_id
 #       indicates "all"; e.g., tsk_id 0 means "for all tasks in this session"
 
@@ -18,101 +23,768 @@ import fio
 ################################################################################
 # auxiliary functions used only internally within this module
 
-def _normalize_features(df, nrm_type):
-    ''' normalizes features in given dataframe in specified way 
+def _get_stored_features():
+    ''' returns features to analyze that are only in the feature store '''
+    return [f for f in cfg.FEATURES if f not in cfg.FEATURES_ALL]
+
+
+def _join_stored_features(df, features):
+    ''' joins given feature store columns as "*_raw" columns to "big table" '''
+    df_cf = db.get_chunk_features(
+        features, int(df['chu_id'].min()), int(df['chu_id'].max()))
+    df_cf.columns = [f + '_raw' for f in features]
+    return df.join(df_cf, on='chu_id')
+
+
+def _read_big_table(chunksize=None, sampled=False):
+    ''' runs "big table" query (see cfg.SQL_BT_FNAME) 
+
+    features in cfg.FEATURES that are not columns of the chunks table (i.e., 
+    not in cfg.FEATURES_ALL) are joined from the feature store, so any column
+    of cfg.FEATURES_STORE can be analyzed without re-extraction
+
+    args:
+        chunksize: see db.pd_read_sql_query
+        sampled: whether to restrict the query to the sessions in ses_sample 
+            (see _sample_sessions)
+    returns:
+        pandas dataframe with "*_raw" column per feature (or iterator over
+        dataframes with up to chunksize rows each, if chunksize is given)
+    '''
+    features = _get_stored_features()
+    if sampled:
+        sql_stmt = '\n'.join(fio.readlines(cfg.SQL_PATH, cfg.SQL_BT_FNAME))
+        res = db.pd_read_sql_query(
+            'SELECT *\n'
+            'FROM   (\n%s\n)\n'
+            'WHERE  ses_id IN (SELECT ses_id FROM ses_sample);' 
+            % sql_stmt.strip().rstrip(';'), chunksize=chunksize)
+    else:
+        res = db.pd_read_sql_query(
+            sql_fname=cfg.SQL_BT_FNAME, chunksize=chunksize)
+    if len(features) == 0:
+        return res
+    if chunksize is None:
+        return _join_stored_features(res, features)
+    return (_join_stored_features(df, features) for df in res)
+
+
+def _sample_sessions(frac, seed):
+    ''' draws stratified sample of sessions, stores it in table ses_sample
+
+    strata are the pairs of speaker types (gender and native language, as in 
+    ana.get_chart; e.g., "FC-ME") of the two speakers of each session; the 
+    same fraction of sessions (at least one) is drawn from each stratum
+
+    args:
+        frac: fraction of sessions to draw
+        seed: seed for the random generator
+    returns:
+        number of sessions drawn, number of sessions in total, and dict with
+        the sampling fraction per stratum
+    '''
+    df = db.get_ses_speaker_types()
+    df['stratum'] = aux.get_pair_type(
+        aux.get_spk_type(df['gender_a'], df['native_lang_a']),
+        aux.get_spk_type(df['gender_b'], df['native_lang_b']))
+    rng = np.random.default_rng(seed)
+    ses_ids = []
+    fracs = {}
+    for stratum, df_grp in df.groupby('stratum', sort=True):
+        n = max(1, int(round(frac * len(df_grp))))
+        ses_ids.extend(rng.choice(
+            df_grp['ses_id'].to_numpy(), n, replace=False).tolist())
+        fracs[stratum] = n / len(df_grp)
+    db.ins_ses_sample(ses_ids)
+    return len(ses_ids), len(df), fracs
+
+
+def _normalize_features(df, nrm_type, extra_nrm_types=[], nrm_stats=None):
+    ''' normalizes features in given dataframe in specified way(s) 
+
+    all normalizations are computed from one contiguous block of raw feature
+    values with a single grouped aggregation per grouping column; the columns 
+    of the input dataframe are overwritten/added in place
 
     args:
         df: pandas dataframe with a "*_raw" column per feature
         nrm_type: how to normalize features (see cfg.NRM_TYPES)
+        extra_nrm_types: further normalization types to compute in the same 
+            pass, stored in columns with suffixes per cfg.NRM_SUFFIXES
+        nrm_stats: precomputed statistics per normalization type, as returned
+            by _get_nrm_stats, to use instead of statistics of df itself 
+            (e.g., when df is only one batch of sessions)
     returns:
         input dataframe, with new columns with normalized features,
-        "*_raw" columns removed
+        "*_raw" columns removed (unless cfg.NRM_RAW is among extra types)
     '''
-    assert nrm_type in cfg.NRM_TYPES, 'unknown normalization type'
+    nrm_types = [nrm_type] + [n for n in extra_nrm_types if n != nrm_type]
+    for n in nrm_types:
+        assert n in cfg.NRM_TYPES, 'unknown normalization type'
     if nrm_type == cfg.NRM_RAW:
         print('no normalization requested, only renaming "_raw" columns')
-        df.rename(columns={f + '_raw': f for f in cfg.FEATURES}, inplace=True)
-    else:    
-        # determine mean and standard deviation per speaker or gender
-        grp_col = 'spk_id' if nrm_type == cfg.NRM_SPK else 'gender'
-        df_raw = df.loc[:, [grp_col] + ['%s_raw' % f for f in cfg.FEATURES]]
-        df_means = df_raw.groupby([grp_col]).mean()
-        df_means.rename(
-            columns={c:c[:-4] + '_mean' for c in df_means.columns}, 
-            inplace=True)
-        df = df.join(df_means, on=grp_col)
-        df_stds = df_raw.groupby([grp_col]).std()
-        df_stds.rename(
-            columns={c:c[:-4] + '_std' for c in df_stds.columns}, inplace=True)
-        df = df.join(df_stds, on=grp_col)
+    # (chunks x features) block of raw values, shared by all normalizations
+    raw = df.loc[:, [f + '_raw' for f in cfg.FEATURES]].to_numpy(dtype=float)
+    for i, n in enumerate(nrm_types):
+        if n == cfg.NRM_RAW:
+            if i == 0:
+                df.rename(columns={f + '_raw': f for f in cfg.FEATURES}, 
+                          inplace=True)
+            # as extra normalization, "_raw" columns are simply kept
+            continue
+        if nrm_stats is None:
+            # determine mean and standard deviation per speaker or gender
+            codes, uniques = pd.factorize(df[cfg.NRM_GRP_COLS[n]])
+            df_stats = pd.DataFrame(raw).groupby(codes).agg(['mean', 'std'])
+            df_stats = df_stats.reindex(range(len(uniques)))
+            means = df_stats.xs('mean', axis=1, level=1).to_numpy()
+            stds = df_stats.xs('std', axis=1, level=1).to_numpy()
+        else:
+            uniques, means, stds = nrm_stats[n]
+            codes = uniques.get_indexer(df[cfg.NRM_GRP_COLS[n]])
+        # extra row of nan for rows without group (code -1)
+        nan_row = np.full((1, raw.shape[1]), np.nan)
+        means = np.vstack([means, nan_row])
+        stds = np.vstack([stds, nan_row])
         # z-score normalize based on means and standard deviations
-        for f in cfg.FEATURES:
-            df_zf = (df[f + '_raw'] - df[f + '_mean']) / df[f + '_std']
-            df_zf.name = f
-            df = df.join(df_zf)
-    # remove columns with raw features and feature stats
-    cols = [[f + '_raw', f + '_mean', f + '_std'] for f in cfg.FEATURES_ALL]
-    cols = list(itertools.chain(*cols))
+        vals = raw - means[codes]
+        vals /= stds[codes]
+        sfx = '' if i == 0 else cfg.NRM_SUFFIXES[n]
+        for j, f in enumerate(cfg.FEATURES):
+            df[f + sfx] = vals[:, j]
+    # remove columns with raw features (unless requested)
+    cols = [f + '_raw' for f in cfg.FEATURES_ALL + _get_stored_features()
+            if f not in cfg.FEATURES or cfg.NRM_RAW not in nrm_types[1:]]
     df.drop(cols, axis=1, inplace=True, errors='ignore')
     return df
 
 
-def _join_task_data(df):
-    ''' loads task meta-data and joins them to given dataframe
+def _get_nrm_stats(nrm_types, grps=None):
+    ''' streams "big table" once to compute normalization statistics
+
+    means and standard deviations of raw features per speaker or gender are
+    accumulated chunk by chunk, merging counts, means, and sums of squared 
+    deviations per chunk (parallel variant of welford's algorithm), so only
+    one chunk of rows is in memory at any time
 
     args:
-        df: pandas dataframe with a "tsk_id" column
+        nrm_types: normalization types for which to compute statistics
+        grps: dict with list of groups (spk_id or gender values) per 
+            normalization type to limit the computation to (all if None)
     returns:
-        input dataframe with new, added task meta-data columns
+        dict with pandas index of groups, numpy array of means, and numpy array
+        of standard deviations (groups x features) per normalization type
+    '''
+    def __merge(acc, df_cnt, df_mean, df_m2):
+        ''' merges statistics of one chunk into accumulated statistics '''
+        if acc is None:
+            return df_cnt, df_mean.fillna(0), df_m2.fillna(0)
+        idx = acc[0].index.union(df_cnt.index)
+        n_a, mu_a, m2_a = [df.reindex(idx, fill_value=0) for df in acc]
+        n_b, mu_b, m2_b = [df.reindex(idx).fillna(0) 
+                           for df in [df_cnt, df_mean, df_m2]]
+        n = n_a + n_b
+        share_b = (n_b / n).fillna(0)
+        delta = mu_b - mu_a
+        return n, mu_a + delta * share_b, m2_a + m2_b + delta**2 * n_a * share_b
+    cols = [f + '_raw' for f in cfg.FEATURES]
+    accs = {n: None for n in nrm_types if n != cfg.NRM_RAW}
+    for df in _read_big_table(cfg.SQL_CHUNKSIZE):
+        raw = pd.DataFrame(df[cols].to_numpy(dtype=float))
+        for n in accs:
+            keys = df[cfg.NRM_GRP_COLS[n]].to_numpy()
+            if grps is None:
+                grp = raw.groupby(keys)
+            else:
+                mask = np.isin(keys, grps[n])
+                grp = raw[mask].groupby(keys[mask])
+            df_cnt = grp.count()
+            accs[n] = __merge(
+                accs[n], df_cnt, grp.mean(), grp.var(ddof=0) * df_cnt)
+    nrm_stats = {}
+    for n, acc in accs.items():
+        if acc is None:
+            # no data for any requested group
+            acc = (pd.DataFrame(columns=range(len(cols)), dtype=float),) * 3
+        df_cnt, df_mean, df_m2 = acc
+        cnts = df_cnt.to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # sample standard deviation, as with pandas std 
+            means = np.where(cnts > 0, df_mean.to_numpy(), np.nan)
+            stds = np.where(
+                cnts > 1, np.sqrt(df_m2.to_numpy() / (cnts - 1)), np.nan)
+        nrm_stats[n] = (df_cnt.index, means, stds)
+    return nrm_stats
+
+
+def _iter_ses_batches(ses_batch, ses_ids=None):
+    ''' streams "big table" and yields it in batches of complete sessions
+
+    args:
+        ses_batch: (maximum) number of sessions per batch
+        ses_ids: sessions to include (all if None)
+    returns:
+        iterator over "big table" pandas dataframes (raw features) with all 
+        chunks of up to ses_batch sessions each
     '''
+    df_buf = None
+    for df in _read_big_table(cfg.SQL_CHUNKSIZE):
+        if ses_ids is not None:
+            df = df[df['ses_id'].isin(ses_ids)]
+        if len(df) == 0:
+            continue
+        df_buf = df if df_buf is None else pd.concat(
+            [df_buf, df], ignore_index=True)
+        # rows are ordered by session; the last session in the buffer may 
+        # continue in the next chunk, all others are complete
+        ses_ids = df_buf['ses_id'].to_numpy()
+        starts = np.flatnonzero(np.diff(ses_ids, prepend=ses_ids[0] - 1))
+        n_batches = (len(starts) - 1) // ses_batch
+        for b in range(n_batches):
+            yield df_buf.iloc[starts[b * ses_batch]:starts[(b+1) * ses_batch]]
+        df_buf = df_buf.iloc[starts[n_batches * ses_batch]:]
+    if df_buf is not None and len(df_buf) > 0:
+        # all remaining sessions are complete
+        ses_ids = df_buf['ses_id'].to_numpy()
+        starts = np.flatnonzero(np.diff(ses_ids, prepend=ses_ids[0] - 1))
+        for b in range(0, len(starts), ses_batch):
+            end = starts[b + ses_batch] if b + ses_batch < len(starts) else None
+            yield df_buf.iloc[starts[b]:end]
+
+
+def _load_task_data():
+    ''' loads task meta-data, indexed by tsk_id (see _join_task_data) '''
     df_tsk = db.pd_read_sql_query('SELECT * FROM tasks')
     df_tsk.drop(['ses_id', 'task_index', 'a_or_b'], axis=1, inplace=True)
     df_tsk.set_index('tsk_id', inplace=True)
+    return df_tsk
+
+
+def _join_task_data(df, df_tsk=None):
+    ''' loads task meta-data and joins them to given dataframe
+
+    args:
+        df: pandas dataframe with a "tsk_id" column
+        df_tsk: task meta-data as returned by _load_task_data (loaded from
+            the database if not given)
+    returns:
+        input dataframe with new, added task meta-data columns
+    '''
+    if df_tsk is None:
+        df_tsk = _load_task_data()
     return df.join(df_tsk, on='tsk_id')
 
 
-def _compute_sims(df):
+def _nrm_stats_to_rows(nrm_type, nrm_stats):
+    ''' yields rows for nrm_stats table from statistics of given type '''
+    uniques, means, stds = nrm_stats[nrm_type]
+    for i, grp in enumerate(uniques.tolist()):
+        for j, f in enumerate(cfg.FEATURES):
+            yield (nrm_type, grp, f, float(means[i, j]), float(stds[i, j]))
+
+
+def _nrm_stats_from_df(df):
+    ''' converts dataframe as returned by db.get_nrm_stats to statistics 
+
+    returns:
+        pandas index of groups, numpy array of means, and numpy array of 
+        standard deviations (groups x features), as per _get_nrm_stats
+    '''
+    df = df.pivot(index='grp', columns='feature', values=['mean', 'std'])
+    df = df.astype(float)
+    return (df.index, df['mean'].reindex(columns=cfg.FEATURES).to_numpy(), 
+            df['std'].reindex(columns=cfg.FEATURES).to_numpy())
+
+
+def _groups_to_rows(df, res_id):
+    ''' yields rows for result_groups table from given result dataframe 
+
+    speaker info and annotation columns are null where df does not have them
+    '''
+    df = df.reindex(columns=cfg.SPK_INFO_COLS + cfg.ANN_COLS).astype(object)
+    df = df.where(df.notna(), None)
+    for (ses_id, tsk_id, spk_id), vals in zip(df.index, df.to_numpy()):
+        yield (res_id, int(ses_id), int(tsk_id), int(spk_id)) + tuple(
+            v.item() if isinstance(v, np.generic) else v for v in vals)
+
+
+def _results_to_rows(df, res_id):
+    ''' yields rows for measure_results table from given result dataframe '''
+    for f in cfg.FEATURES:
+        if f not in df.columns:
+            continue
+        for (ses_id, tsk_id, spk_id), res in df[f].items():
+            # skip cells without result (feature missing in group)
+            if isinstance(res, tuple):
+                yield (res_id, int(ses_id), int(tsk_id), int(spk_id), f) + \
+                    tuple(float(v) for v in res)
+
+
+def _results_from_df(df_res, df_grp):
+    ''' converts dataframes from the results store to one result dataframe
+
+    args:
+        df_res: pandas dataframe as returned by db.get_measure_results
+        df_grp: pandas dataframe as returned by db.get_result_groups
+    returns:
+        pandas dataframe with result tuples per feature, indexed by ses_id, 
+        tsk_id, and spk_id (as returned by the measure functions), plus 
+        speaker info and annotation columns (if stored)
+    '''
+    grp_cols = ['ses_id', 'tsk_id', 'spk_id']
+    df_res = df_res.assign(
+        res=list(zip(df_res['stat0'], df_res['stat1'], df_res['stat2'])))
+    df = df_res.pivot(index=grp_cols, columns='feature', values='res')
+    df = df.reindex(columns=[f for f in cfg.FEATURES if f in df.columns])
+    df.columns.name = None
+    df_grp = df_grp.set_index(grp_cols)
+    # speaker info and annotation were either stored or not, as a whole
+    for cols in [cfg.ANN_COLS, cfg.SPK_INFO_COLS]:
+        if df_grp[cols].isna().all(axis=None):
+            df_grp = df_grp.drop(cols, axis=1)
+    return df.reindex(df_grp.index).join(df_grp)
+
+
+def _compute_sims(vals, vals_paired):
     ''' computes similarity betw. paired chunks/tasks/sessions for all features 
 
     args:
-        df: pandas dataframe with pairs of feature values, either individual 
-            values (for chunk pairs) or means (for speakers in tasks/sessions) 
+        vals: numpy array of feature values (features along the last axis), 
+            either individual values (for chunk pairs) or means (for speakers 
+            in tasks/sessions) 
+        vals_paired: numpy array of the same shape with the paired values
     returns:
-        input dataframe with new, added "*_sim" columns, one per feature
+        numpy array of the same shape with the similarities
     '''
-    for f in cfg.FEATURES:
-        sims_f = -abs(df[f] - df[f + '_paired'])
-        sims_f.name = f + '_sim'
-        df = df.join(sims_f)
-    return df
+    return -np.abs(vals - vals_paired)
+
+
+def _gather(values, pos):
+    ''' gathers values at given row positions, nan wherever position is -1 '''
+    mask = pos < 0
+    if len(values) == 0:
+        # nothing to gather from (e.g., no chunk pairs), all positions are -1
+        assert mask.all()
+        res = np.zeros((len(pos),) + values.shape[1:], dtype=values.dtype)
+    else:
+        res = values[pos]
+    if mask.any():
+        if res.dtype.kind in 'iub':
+            res = res.astype(float)
+        elif res.dtype.kind != 'f':
+            res = res.astype(object)
+        res[mask] = np.nan
+    return res
 
 
-def _load_pairs(df, extra_cols=[]):
-    ''' loads chunk pairs and joins with given data, features, and extra columns
+def _load_pairs(df, extra_cols=[], pairs_only=False, df_chp=None):
+    ''' loads chunk pairs and adds features and extra columns of paired chunks
+
+    pairs are resolved to row positions via a chu_id index, paired values are
+    gathered with numpy indexing and similarities computed for all features at
+    once, without joining the full dataframe
 
     args:
         df: pandas dataframe with normalized features per chunk
-        extra_paired_cols: extra columns, in addition to features, to include 
+        extra_cols: extra columns, in addition to features, to include 
             regarding paired chunks
+        pairs_only: whether to return only rows with a paired chunk and only
+            the columns in cfg.PAIR_COLS (plus features and extra columns)
+            instead of all columns of df for all chunks
+        df_chp: chunk pairs as returned by db.get_chunk_pairs (all chunk pairs
+            are loaded if not given)
     returns:
         pandas dataframe with chunk pairs (with features) per row 
     '''
-    # tmp1: pairs of chunk ids (adjacent and non-adjacent turn exchange chunks)
-    tmp1 = db.pd_read_sql_query(
-        'SELECT p_or_x, chu_id1, chu_id2, rid FROM chunk_pairs')
-    # tmp2: all chu_ids with respective feature values and extra columns
-    loc_cols = ['chu_id'] + cfg.FEATURES + extra_cols
-    tmp2 = df.loc[:, loc_cols].set_index('chu_id')
-    # tmp3: df joined with pairs -> df with second, turn-final, paired chu_id
-    tmp3 = df.join(tmp1.set_index('chu_id2'), on='chu_id')
-    # final step: full df data joined with features of paired, turn-final chu_id
-    df = tmp3.join(tmp2, rsuffix='_paired', on='chu_id1')
-    df.rename(columns={'chu_id1': 'chu_id_paired'}, inplace=True)
-    # reset to running index
-    df.reset_index(drop=True, inplace=True)
+    # pairs of chunk ids (adjacent and non-adjacent turn exchange chunks)
+    if df_chp is None:
+        df_chp = db.pd_read_sql_query(
+            'SELECT p_or_x, chu_id1, chu_id2, rid FROM chunk_pairs')
+    # row positions of turn-final (1) and turn-initial (2) chunks in df
+    chu_idx = pd.Index(df['chu_id'].to_numpy())
+    pos1 = chu_idx.get_indexer(df_chp['chu_id1'].to_numpy())
+    pos2 = chu_idx.get_indexer(df_chp['chu_id2'].to_numpy())
+    # (row, pair) combinations sorted by row, pairs in order of chunk_pairs
+    chp_idx = np.flatnonzero(pos2 >= 0)
+    row_idx = pos2[chp_idx]
+    if not pairs_only:
+        # rows of turn-initial chunks without any pair are kept once
+        unpaired = np.flatnonzero(np.bincount(row_idx, minlength=len(df)) == 0)
+        row_idx = np.concatenate([row_idx, unpaired])
+        chp_idx = np.concatenate([chp_idx, np.full(len(unpaired), -1)])
+    order = np.argsort(row_idx, kind='stable')
+    row_idx = row_idx[order]
+    chp_idx = chp_idx[order]
+    # positions of paired, turn-final chunks per row (-1 if none; pos1 is
+    # only indexed for rows with a pair, it is empty without chunk pairs)
+    pos_paired = np.full(len(chp_idx), -1)
+    has_pair = chp_idx >= 0
+    pos_paired[has_pair] = pos1[chp_idx[has_pair]]
+    # per-row data of turn-initial chunks, reset to running index
+    if pairs_only:
+        loc_cols = [c for c in cfg.PAIR_COLS + cfg.FEATURES + extra_cols 
+                    if c in df.columns]
+        df = df.loc[:, list(dict.fromkeys(loc_cols))]
+    df_res = df.take(row_idx)
+    df_res.reset_index(drop=True, inplace=True)
+    # gather pair info, features of paired chunks, and extra columns
+    df_chp_res = pd.DataFrame({
+        'p_or_x': _gather(df_chp['p_or_x'].to_numpy(), chp_idx),
+        'chu_id_paired': _gather(df_chp['chu_id1'].to_numpy(), chp_idx),
+        'rid': _gather(df_chp['rid'].to_numpy(dtype=float), chp_idx)
+    }, index=df_res.index)
+    vals = df_res[cfg.FEATURES].to_numpy(dtype=float)
+    vals_paired = _gather(df[cfg.FEATURES].to_numpy(dtype=float), pos_paired)
+    df_paired = pd.DataFrame(
+        vals_paired, columns=[f + '_paired' for f in cfg.FEATURES], 
+        index=df_res.index, copy=False)
+    df_extra = pd.DataFrame(
+        {c + '_paired': _gather(df[c].to_numpy(), pos_paired) 
+         for c in extra_cols}, 
+        index=df_res.index)
     # add columns for similarity between paired chunks for all features
-    df = _compute_sims(df)
-    return df
+    df_sims = pd.DataFrame(
+        _compute_sims(vals, vals_paired), 
+        columns=[f + '_sim' for f in cfg.FEATURES], 
+        index=df_res.index, copy=False)
+    return pd.concat(
+        [df_res, df_chp_res, df_paired, df_extra, df_sims], axis=1)
+
+
+
+def _get_spk_means(df_bt):
+    ''' computes dense array of feature means per speaker and task/session
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data (not in
+            pairs-only mode, means are computed over all chunks)
+    returns:
+        pandas multiindex with (ses_id, tsk_id, spk_id) per speaker and task/
+        session (tsk_id 0 means "all tasks in this session"), and numpy array
+        (index entries x 3 x features) with means over all chunks (index 0), 
+        the first half (1) and the second half (2) of the task/session
+    '''
+    assert 'tsk_half' in df_bt.columns, 'need full big table, not pairs only'
+    # big table repeats chunks with multiple pairs, use each only once
+    df = df_bt.drop_duplicates('chu_id')
+    grp_cols = ['ses_id', 'tsk_id', 'spk_id']
+    loc_cols = grp_cols + cfg.FEATURES
+    # rows per chunk for tasks and again for sessions, with respective half
+    df_tsk = df.loc[:, loc_cols + ['tsk_half']]
+    df_tsk = df_tsk.rename(columns={'tsk_half': 'half'})
+    df_ses = df.loc[:, loc_cols + ['ses_half']]
+    df_ses = df_ses.rename(columns={'ses_half': 'half'}).assign(tsk_id=0)
+    df = pd.concat([df_tsk, df_ses])
+    df_all = df.groupby(grp_cols)[cfg.FEATURES].mean()
+    df_hlf = df.groupby(grp_cols + ['half'])[cfg.FEATURES].mean()
+    idx = df_all.index
+    means = np.full((len(idx), 3, len(cfg.FEATURES)), np.nan)
+    means[:, 0] = df_all.to_numpy()
+    for h in [1, 2]:
+        means[:, h] = df_hlf.xs(h, level='half').reindex(idx).to_numpy()
+    return idx, means
+
+
+def _get_global_sims(df_bt):
+    ''' computes partner and mean non-partner similarities per speaker
+
+    speaker pairs are streamed from speaker_pairs.sql and resolved to positions
+    in the dense array of speaker means; similarities for the (very large) set
+    of non-partner pairs are thus computed with numpy indexing and summed per 
+    target speaker, without joins and without keeping all pairs in memory
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+    returns:
+        pandas multiindex with (ses_id, tsk_id, spk_id) per speaker and task/
+        session, and three numpy arrays (index entries x 3 x features) with 
+        similarity to the partner, mean similarity to all matched non-partners, 
+        and number of non-partners (for all chunks, first and second half)
+    '''
+    idx, means = _get_spk_means(df_bt)
+    sims_p = np.full(means.shape, np.nan)
+    sums_x = np.zeros(means.shape)
+    cnts_x = np.zeros(means.shape)
+    n_vals = means.shape[1] * means.shape[2]
+    for df_sp in db.pd_read_sql_query(
+            sql_fname=cfg.SQL_SP_FNAME, chunksize=cfg.SQL_CHUNKSIZE):
+        # positions of target and paired speakers in the dense array
+        pos = idx.get_indexer(pd.MultiIndex.from_arrays(
+            [df_sp['ses_id'], df_sp['tsk_id'], df_sp['spk_id']]))
+        pos_paired = idx.get_indexer(pd.MultiIndex.from_arrays(
+            [df_sp['ses_id_paired'], df_sp['tsk_id_paired'], 
+             df_sp['spk_id_paired']]))
+        # skip speakers without any chunks (e.g., sessions not analyzed)
+        valid = (pos >= 0) & (pos_paired >= 0)
+        is_p = (df_sp['p_or_x'].to_numpy() == 'p') & valid
+        is_x = (df_sp['p_or_x'].to_numpy() == 'x') & valid
+        sims_p[pos[is_p]] = _compute_sims(
+            means[pos[is_p]], means[pos_paired[is_p]])
+        # sum up non-partner similarities (and counts) per target speaker
+        sims_x = _compute_sims(means[pos[is_x]], means[pos_paired[is_x]])
+        sims_x = sims_x.reshape(-1, n_vals)
+        has_sim = ~np.isnan(sims_x)
+        sims_x[~has_sim] = 0
+        for j in range(n_vals):
+            h, k = divmod(j, means.shape[2])
+            sums_x[:, h, k] += np.bincount(
+                pos[is_x], weights=sims_x[:, j], minlength=len(idx))
+            cnts_x[:, h, k] += np.bincount(
+                pos[is_x], weights=has_sim[:, j], minlength=len(idx))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sims_x = sums_x / cnts_x
+    return idx, sims_p, sims_x, cnts_x
+
+
+def _get_global_df(idx, vals_p, vals_x, cnts_x):
+    ''' creates result dataframe for global measures from per-speaker arrays
+
+    args:
+        idx: pandas multiindex with (ses_id, tsk_id, spk_id) per array row
+        vals_p: numpy array (index entries x features) with partner values
+        vals_x: numpy array of the same shape with mean non-partner values
+        cnts_x: numpy array of the same shape with number of non-partners
+    returns:
+        pandas dataframe with results (partner value, mean non-partner value,
+        number of non-partners) for all speakers with a partner
+    '''
+    has_p = ~np.all(np.isnan(vals_p), axis=1)
+    keys = list(idx[has_p])
+    results = {f: dict(zip(keys, zip(vals_p[has_p, j], vals_x[has_p, j], 
+                                      cnts_x[has_p, j].astype(int))))
+               for j, f in enumerate(cfg.FEATURES)}
+    return aux.get_df(results, ['ses_id', 'tsk_id', 'spk_id'])
+
+
+
+def _get_local_data(df_bt, mea_id):
+    ''' extracts arrays for vectorized local measures from "big table"
+
+    rows are sorted such that all turn exchanges of each (ses_id, tsk_id, 
+    spk_id) group are contiguous
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+        mea_id: local measure for which to extract data (cfg.MEA_LCON/MEA_SYN)
+    returns:
+        pandas multiindex with (ses_id, tsk_id, spk_id) per group, and dict of
+        numpy arrays: "starts" (first row per group), "x" (turn-initial 
+        features), "y" (paired, turn-final features), "t" (start times of 
+        turn-initial chunks), "perm_grp" (code per row for permutations)
+    '''
+    assert mea_id in [cfg.MEA_LCON, cfg.MEA_SYN], 'unknown local measure'
+    grp_cols = ['ses_id', 'tsk_id', 'spk_id']
+    df = df_bt[df_bt['p_or_x'] == 'p'].sort_values(grp_cols, kind='stable')
+    codes, idx = pd.MultiIndex.from_frame(df[grp_cols]).factorize()
+    # turn-final chunks can be permuted within session, speaker, and role;
+    # each role is taken by one speaker per task, so (ses_id, spk_id, role) of
+    # turn-initial chunks identifies those of the turn-final chunks 
+    perm_grp, _ = pd.MultiIndex.from_frame(
+        df[['ses_id', 'spk_id', 'speaker_role']]).factorize()
+    data = {
+        'starts': np.flatnonzero(np.diff(codes, prepend=-1)),
+        'x': df[cfg.FEATURES].to_numpy(dtype=float),
+        'y': df[[f + '_paired' for f in cfg.FEATURES]].to_numpy(dtype=float),
+        't': df['start_time'].to_numpy(dtype=float),
+        'perm_grp': perm_grp
+    }
+    return pd.MultiIndex.from_tuples(idx, names=grp_cols), data
+
+
+def _grp_pearsonr(x, y, starts):
+    ''' computes pearson r per contiguous group of rows and per column
+
+    args:
+        x: numpy array (rows x columns), nan values are ignored pairwise
+        y: numpy array of the same shape (or broadcastable to it)
+        starts: numpy array with the first row of each group
+    returns:
+        numpy arrays (groups x columns) with r-values (nan where undefined, as
+        in lcon/syn: fewer than three values or constant x) and value counts
+    '''
+    x, y = np.broadcast_arrays(x, y)
+    w = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(w, x, 0.0)
+    y = np.where(w, y, 0.0)
+    n = np.add.reduceat(w.astype(float), starts)
+    sx = np.add.reduceat(x, starts)
+    sy = np.add.reduceat(y, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vx = np.add.reduceat(x * x, starts) - sx * sx / n
+        vy = np.add.reduceat(y * y, starts) - sy * sy / n
+        cov = np.add.reduceat(x * y, starts) - sx * sy / n
+        r = cov / np.sqrt(vx * vy)
+    r[(n < 3) | ~(vx > 1e-12) | ~(vy > 1e-12)] = np.nan
+    return np.clip(r, -1.0, 1.0), n
+
+
+def _local_r(mea_id, data, y):
+    ''' computes r-values of given local measure, for given paired values '''
+    if mea_id == cfg.MEA_LCON:
+        # correlation between similarity and turn-initial start time
+        sims = _compute_sims(data['x'], y)
+        return _grp_pearsonr(sims, data['t'][:, None], data['starts'])
+    # correlation between turn-final and turn-initial chunks
+    return _grp_pearsonr(data['x'], y, data['starts'])
+
+
+def _get_window_means(df_bt, window, step):
+    ''' computes feature means per speaker in sliding windows over time
+
+    streams once over the chunks sorted by session, task, speaker, and start 
+    time: window sums are differences of cumulative sums at the window edges 
+    (found by binary search), so no window is aggregated on its own
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+        window: window length (seconds, by chunk start time)
+        step: time between the starts of consecutive windows (seconds)
+    returns:
+        list of ((ses_id, tsk_id), [spk_id, spk_id], [means, means]) per task 
+        with exactly two speakers, means being numpy arrays (windows x 
+        features; nan for windows without any value of a speaker), windows 
+        spanning the task for both speakers alike
+    '''
+    grp_cols = ['ses_id', 'tsk_id', 'spk_id']
+    df = df_bt.drop_duplicates('chu_id')
+    df = df[pd.notna(df['start_time'])] \
+        .sort_values(grp_cols + ['start_time'], kind='stable')
+    vals = df[cfg.FEATURES].to_numpy(dtype=float)
+    w = ~np.isnan(vals)
+    # cumulative sums and counts of values, with a leading row of zeros
+    zeros = np.zeros((1, vals.shape[1]))
+    cs = np.concatenate([zeros, np.cumsum(np.where(w, vals, 0.0), axis=0)])
+    cc = np.concatenate([zeros, np.cumsum(w, axis=0)])
+    t = df['start_time'].to_numpy(dtype=float)
+    codes, idx = pd.MultiIndex.from_frame(df[grp_cols]).factorize()
+    bounds = np.append(np.flatnonzero(np.diff(codes, prepend=-1)), len(df))
+    results = []
+    g = 0
+    while g < len(idx):
+        ses_tsk = idx[g][:2]
+        if g + 1 >= len(idx) or idx[g + 1][:2] != ses_tsk:
+            # task with one speaker only, no synchrony possible
+            g += 1
+            continue
+        a, b, c = bounds[g], bounds[g + 1], bounds[g + 2]
+        t0, t1 = min(t[a], t[b]), max(t[b - 1], t[c - 1])
+        n_win = max(1, int(np.floor((t1 - t0 - window) / step)) + 1)
+        edges = t0 + step * np.arange(n_win)
+        means = []
+        for lo, hi in [(a, b), (b, c)]:
+            first = lo + np.searchsorted(t[lo:hi], edges, 'left')
+            end = lo + np.searchsorted(t[lo:hi], edges + window, 'left')
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means.append((cs[end] - cs[first]) / (cc[end] - cc[first]))
+        results.append((ses_tsk, [idx[g][2], idx[g + 1][2]], means))
+        g += 2
+    return results
+
+
+def _share_arrays(data):
+    ''' copies dict of numpy arrays into shared memory for pool workers
+
+    returns:
+        list of shared memory blocks (to close/unlink when done) and dict of 
+        specs (name, shape, dtype) per array to pass on to workers
+    '''
+    shms = []
+    specs = {}
+    for key, arr in data.items():
+        arr = np.ascontiguousarray(arr)
+        shm = multiprocessing.shared_memory.SharedMemory(
+            create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        shms.append(shm)
+        specs[key] = (shm.name, arr.shape, arr.dtype.str)
+    return shms, specs
+
+
+def _attach_arrays(specs):
+    ''' attaches to arrays in shared memory (see _share_arrays) '''
+    shms = []
+    data = {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+        shms.append(shm)
+        data[key] = np.ndarray(shape, dtype, buffer=shm.buf)
+    return shms, data
+
+
+def _run_in_pool(func, specs, jobs, n_jobs):
+    ''' runs func(specs, *job) for all jobs in a process pool, or inline '''
+    args = [(specs,) + tuple(job) for job in jobs]
+    if n_jobs == 1:
+        return [func(*a) for a in args]
+    with multiprocessing.Pool(n_jobs) as pool:
+        return pool.starmap(func, args)
+
+
+@prf.timed
+def _perm_worker(specs, mea_id, seed_seq, n_perm):
+    ''' counts permutations with |r| >= observed |r| per group and feature
+
+    turn-final partners are shuffled within their permutation group by sorting
+    rows on (group, random key), one vectorized lexsort per permutation
+    '''
+    shms, data = _attach_arrays(specs)
+    try:
+        rng = np.random.default_rng(seed_seq)
+        perm_grp = data['perm_grp']
+        order = np.argsort(perm_grp, kind='stable')
+        r_obs = np.abs(data['r_obs'])
+        cnts = np.zeros(r_obs.shape)
+        perm = np.empty_like(order)
+        for _ in range(n_perm):
+            perm[order] = np.lexsort((rng.random(len(perm_grp)), perm_grp))
+            r, _ = _local_r(mea_id, data, data['y'][perm])
+            # small tolerance for ties with the observed r-value
+            cnts += np.abs(r) >= r_obs - 1e-12
+        return cnts
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+@prf.timed
+def _boot_worker(specs, mea_id, seed, keys, grps, n_boot, alpha, sig_alpha):
+    ''' bootstraps r-values for given groups of turn exchanges
+
+    turn exchanges are resampled with replacement within each group, as one
+    vectorized gather per group (based on group offsets), with a random 
+    generator seeded by the given seed and the group's key
+
+    returns:
+        numpy arrays with lower and upper confidence bounds (groups x features)
+        and whether the speaker is entraining on any feature (groups x n_boot)
+    '''
+    shms, data = _attach_arrays(specs)
+    try:
+        n_rows = len(data['t'])
+        ends = np.append(data['starts'][1:], n_rows)
+        cis = np.full((len(grps), 2, data['x'].shape[1]), np.nan)
+        ents = np.zeros((len(grps), n_boot), dtype=bool)
+        for i, (key, g) in enumerate(zip(keys, grps)):
+            start, size = data['starts'][g], ends[g] - data['starts'][g]
+            rng = np.random.default_rng([seed] + [int(k) for k in key])
+            idx = (start + rng.integers(0, size, (n_boot, size))).ravel()
+            data_boot = {
+                'x': data['x'][idx], 
+                't': data['t'][idx], 
+                'starts': np.arange(0, n_boot * size, size)
+            }
+            r, n = _local_r(mea_id, data_boot, data['y'][idx])
+            # significance as in ana.annotate_local_measure
+            with np.errstate(invalid='ignore'):
+                ents[i] = np.any(aux.r2p(r, n - 2) <= sig_alpha, axis=1)
+            if np.any(~np.isnan(r)):
+                with np.errstate(invalid='ignore'):
+                    cis[i] = np.nanpercentile(
+                        r, [50 * alpha, 100 - 50 * alpha], axis=0)
+        return cis, ents
+    finally:
+        for shm in shms:
+            shm.close()
 
 
 
@@ -120,29 +792,361 @@ def _load_pairs(df, extra_cols=[]):
 #                                MAIN FUNCTIONS                                #
 ################################################################################
 
-def load_data(nrm_type, extra_paired_cols=[]):
+@prf.timed
+def load_data(nrm_type, extra_paired_cols=[], extra_nrm_types=[], 
+              pairs_only=False, sample_frac=None, seed=cfg.SEED):
     ''' loads data into one wide dataframe with redundant info 
     
     args: 
         nrm_type: how to normalize features (see cfg.NRM_TYPES)
         extra_paired_cols: extra columns to include regarding paired speakers
+        extra_nrm_types: further normalization types to include for comparison
+            (see cfg.NRM_SUFFIXES for the names of their feature columns)
+        pairs_only: whether to limit the result to rows with a paired chunk 
+            and to the columns in cfg.PAIR_COLS (see _load_pairs)
+        sample_frac: if given, only a reproducible, stratified sample of this
+            fraction of sessions is loaded, for fast exploratory runs (see 
+            _sample_sessions; the sample is taken in the database, other 
+            sessions are never loaded; normalization statistics are based on 
+            the sample as well); the dataframe then carries the sampling 
+            fractions in its attrs "sample_frac" (overall) and "sample_strata"
+            (per stratum), passed on to measure results by 
+            ana.add_speaker_info, for which ana.get_stats reports the sampling
+            error; such results cannot be saved (see save_results)
+        seed: seed for the random generator drawing the sample
     returns:
         pandas dataframe with data per chunk (or chunk pair, where applicable),
         with running index (not chu_id because non-adjacent chunk pairs lead to 
         multiple rows per chunk)
     '''
+    sampled = sample_frac is not None
+    if sampled:
+        assert 0 < sample_frac <= 1, 'sample_frac must be in (0, 1]'
+        with prf.timer('ap.load_data:sample'):
+            n_ses, n_ses_all, fracs = _sample_sessions(sample_frac, seed)
     # load raw data ("big table" dataframe with redundant info)
-    df_bt = db.pd_read_sql_query(sql_fname=cfg.SQL_BT_FNAME)
+    with prf.timer('ap.load_data:sql'):
+        df_bt = _read_big_table(sampled=sampled)
     # normalize features as needed
-    df_bt = _normalize_features(df_bt, nrm_type)
+    with prf.timer('ap.load_data:normalize'):
+        df_bt = _normalize_features(df_bt, nrm_type, extra_nrm_types)
     # join task meta-data (these differ by corpus, not loaded in script above)
-    df_bt = _join_task_data(df_bt)
+    with prf.timer('ap.load_data:join_tasks'):
+        df_bt = _join_task_data(df_bt)
     # add features of paired chunks (partner and non-partner) to each row and
     # compute similarity for each pair and all features
-    df_bt = _load_pairs(df_bt, extra_paired_cols)
+    with prf.timer('ap.load_data:pairs'):
+        df_chp = db.get_sample_chunk_pairs() if sampled else None
+        df_bt = _load_pairs(df_bt, extra_paired_cols, pairs_only, df_chp)
+    if sampled:
+        df_bt.attrs['sample_frac'] = n_ses / n_ses_all
+        df_bt.attrs['sample_strata'] = fracs
     return df_bt
 
 
+def iter_data(nrm_type, extra_paired_cols=[], extra_nrm_types=[], 
+              pairs_only=False, ses_batch=cfg.SES_BATCH, ses_ids=None, 
+              nrm_stats=None):
+    ''' loads data like load_data, but streamed in batches of sessions
+
+    a first pass over the database computes the normalization statistics, a
+    second pass yields one "big table" per batch of sessions; this is possible
+    because chunk pairs never span sessions, so peak memory depends on the 
+    batch size instead of the size of the corpus
+
+    args:
+        nrm_type, extra_paired_cols, extra_nrm_types, pairs_only: 
+            see load_data
+        ses_batch: (maximum) number of sessions per batch
+        ses_ids: sessions to include (all if None; normalization statistics 
+            are always based on all sessions)
+        nrm_stats: normalization statistics as returned by _get_nrm_stats for
+            all normalization types (computed in a first pass if None)
+    returns:
+        iterator over pandas dataframes as returned by load_data, with the 
+        rows of up to ses_batch sessions each
+    '''
+    if nrm_stats is None:
+        nrm_stats = _get_nrm_stats([nrm_type] + extra_nrm_types)
+    df_tsk = _load_task_data()
+    for df_bt in _iter_ses_batches(ses_batch, ses_ids):
+        df_bt = _normalize_features(
+            df_bt.copy(), nrm_type, extra_nrm_types, nrm_stats)
+        df_bt = _join_task_data(df_bt, df_tsk)
+        df_chp = db.get_chunk_pairs(
+            int(df_bt['ses_id'].iloc[0]), int(df_bt['ses_id'].iloc[-1]))
+        yield _load_pairs(df_bt, extra_paired_cols, pairs_only, df_chp)
+
+
+def stream_local(nrm_type, mea_ids=[cfg.MEA_LCON, cfg.MEA_SYN], 
+                 ses_batch=cfg.SES_BATCH, ses_ids=None, nrm_stats=None, 
+                 spk_info=False):
+    ''' computes local measures batch by batch of sessions (see iter_data)
+
+    local measures only depend on the chunk pairs of each session (and the
+    normalization statistics), so results per batch are simply appended
+
+    args:
+        nrm_type: how to normalize features (see cfg.NRM_TYPES)
+        mea_ids: local measures to compute (cfg.MEA_LCON and/or cfg.MEA_SYN)
+        ses_batch: (maximum) number of sessions per batch
+        ses_ids, nrm_stats: see iter_data
+        spk_info: whether to add speaker info columns to the results (see 
+            ana.add_speaker_info)
+    returns:
+        dict with pandas dataframe per measure, as returned by lcon/syn
+    '''
+    mea_funcs = {cfg.MEA_LCON: lcon, cfg.MEA_SYN: syn}
+    for mea_id in mea_ids:
+        assert mea_id in mea_funcs, 'unknown local measure'
+    results = {mea_id: [] for mea_id in mea_ids}
+    extra_paired_cols = ['gender', 'native_lang'] if spk_info else []
+    for df_bt in iter_data(nrm_type, extra_paired_cols, pairs_only=True, 
+                           ses_batch=ses_batch, ses_ids=ses_ids, 
+                           nrm_stats=nrm_stats):
+        for mea_id in mea_ids:
+            df = mea_funcs[mea_id](df_bt)
+            if spk_info:
+                # as in ana.add_speaker_info
+                df = df.join(df_bt.groupby(['ses_id', 'tsk_id', 'spk_id'])
+                    .first().loc[:, cfg.SPK_INFO_COLS])
+            results[mea_id].append(df)
+        del df_bt
+    # (no results at all if there are no sessions to process)
+    idx = pd.MultiIndex.from_tuples([], names=['ses_id', 'tsk_id', 'spk_id'])
+    df_empty = pd.DataFrame(columns=cfg.FEATURES, index=idx)
+    return {mea_id: pd.concat(dfs) if dfs else df_empty
+            for mea_id, dfs in results.items()}
+
+
+@prf.timed
+def update_local(nrm_type, ses_batch=cfg.SES_BATCH):
+    ''' recomputes local measures only for sessions with changed inputs
+
+    based on the change log on chunks (see incremental.sql): chunk pairs are 
+    rebuilt for all sessions changed since the last rebuild, normalization 
+    statistics are refreshed for the speakers (or genders) in sessions 
+    changed since the last update, and lcon/syn are 
+    recomputed for all sessions whose chunks or normalization statistics 
+    changed; the results (with speaker info) replace those sessions' rows in 
+    the persisted result sets (see save_results; the first call per result 
+    set computes everything); all changes are committed
+
+    args:
+        nrm_type: how to normalize features (see cfg.NRM_TYPES)
+        ses_batch: (maximum) number of sessions per batch (see stream_local)
+    returns:
+        dict with pandas dataframe with all persisted results per measure 
+        (cfg.MEA_LCON and cfg.MEA_SYN), as returned by load_results
+    '''
+    def __refresh_nrm_stats(ses_ids):
+        ''' recomputes persisted normalization statistics where needed
+
+        returns:
+            statistics for all groups (as per _get_nrm_stats) and list of 
+            ses_id of all sessions affected by changed statistics
+        '''
+        if nrm_type == cfg.NRM_RAW or len(ses_ids) == 0:
+            return {}, []
+        grp_col = cfg.NRM_GRP_COLS[nrm_type]
+        df_spk = db.get_ses_speakers()
+        grps = df_spk.loc[df_spk['ses_id'].isin(ses_ids), grp_col].unique()
+        uniques, means, stds = _nrm_stats_from_df(db.get_nrm_stats(nrm_type))
+        new_uniques, new_means, new_stds = _get_nrm_stats(
+            [nrm_type], {nrm_type: grps})[nrm_type]
+        # compare new statistics with old ones per group (absent as nan)
+        pos = uniques.get_indexer(grps)
+        new_pos = new_uniques.get_indexer(grps)
+        changed = np.zeros(len(grps), dtype=bool)
+        for vals, new_vals in [(means, new_means), (stds, new_stds)]:
+            old = _gather(vals, pos)
+            new = _gather(new_vals, new_pos)
+            changed |= ~np.all(np.isclose(old, new, equal_nan=True), axis=1)
+        # replace statistics of all groups in changed sessions
+        keep = ~uniques.isin(grps)
+        nrm_stats = {nrm_type: (
+            uniques[keep].append(new_uniques), 
+            np.vstack([means[keep], new_means]), 
+            np.vstack([stds[keep], new_stds]))}
+        db.del_nrm_stats(nrm_type)
+        db.ins_nrm_stats(_nrm_stats_to_rows(nrm_type, nrm_stats))
+        chg_grps = grps[changed]
+        return nrm_stats, df_spk.loc[
+            df_spk[grp_col].isin(chg_grps), 'ses_id'].unique().tolist()
+    mea_ids = [cfg.MEA_LCON, cfg.MEA_SYN]
+    db.executescript(cfg.SQL_PATH, cfg.SQL_INC_FNAME)
+    db.executescript(cfg.SQL_PATH, cfg.SQL_RES_FNAME)
+    chg_seq = db.get_chg_seq()
+    # rebuild chunk pairs of sessions changed since last rebuild 
+    ses_ids = db.get_changed_ses_ids(db.get_chg_consumer('chunk_pairs') or 0)
+    if len(ses_ids) > 0:
+        db.rebuild_chunk_pairs(ses_ids)
+    db.set_chg_consumer('chunk_pairs', chg_seq)
+    res_ids = {mea_id: db.ins_result_set(
+                   mea_id, nrm_type, get_cfg_hash(mea_id, nrm_type))
+               for mea_id in mea_ids}
+    chg_seqs = [db.get_chg_consumer('res:%d' % res_id) 
+                for res_id in res_ids.values()]
+    if None in chg_seqs:
+        # first call, compute everything
+        nrm_stats = _get_nrm_stats([nrm_type])
+        db.del_nrm_stats(nrm_type)
+        if nrm_type != cfg.NRM_RAW:
+            db.ins_nrm_stats(_nrm_stats_to_rows(nrm_type, nrm_stats))
+        ses_ids = None
+    else:
+        ses_ids = db.get_changed_ses_ids(min(chg_seqs))
+        nrm_stats, ses_ids_nrm = __refresh_nrm_stats(ses_ids)
+        ses_ids = sorted(set(ses_ids + ses_ids_nrm))
+    if ses_ids is None or len(ses_ids) > 0:
+        results = stream_local(
+            nrm_type, mea_ids, ses_batch, ses_ids, nrm_stats, spk_info=True)
+        for mea_id, res_id in res_ids.items():
+            db.del_results(res_id, ses_ids)
+            db.ins_result_groups(_groups_to_rows(results[mea_id], res_id))
+            db.ins_measure_results(_results_to_rows(results[mea_id], res_id))
+    for res_id in res_ids.values():
+        db.set_chg_consumer('res:%d' % res_id, chg_seq)
+    db.commit()
+    return {mea_id: load_results(mea_id, nrm_type) for mea_id in mea_ids}
+
+
+def get_cfg_hash(mea_id, nrm_type, params={}):
+    ''' computes hash of the configuration that results of a measure depend on
+
+    covers measure, normalization type, features, the sql scripts that 
+    determine chunks, chunk pairs, and (for global measures) speaker pairs, 
+    and further measure parameters; results stored for one configuration 
+    (see save_results) are thus never mixed up with those of another one;
+    for cfg.MEA_WSYN, window, step, and lag are always covered (values from
+    cfg unless given in params, as passed to wsyn)
+
+    args:
+        mea_id: measure identifier (see cfg.MEASURES)
+        nrm_type: normalization type (see cfg.NRM_TYPES)
+        params: dict with further parameters (e.g., {'n_perm': 1000})
+    returns:
+        hash as hex string
+    '''
+    if mea_id == cfg.MEA_WSYN:
+        params = dict({'window': cfg.WSYN_WINDOW, 'step': cfg.WSYN_STEP, 
+                       'lag': cfg.WSYN_LAG}, **params)
+    sql_fnames = [cfg.SQL_AT_FNAME, cfg.SQL_BT_FNAME]
+    if mea_id in [cfg.MEA_PRX, cfg.MEA_CON]:
+        sql_fnames.append(cfg.SQL_SP_FNAME)
+    h = hashlib.sha1(json.dumps(
+        [mea_id, nrm_type, cfg.FEATURES, sorted(params.items())], 
+        default=str).encode())
+    for sql_fname in sql_fnames:
+        h.update(''.join(fio.readlines(cfg.SQL_PATH, sql_fname)).encode())
+    return h.hexdigest()[:16]
+
+
+@prf.timed
+def save_results(df, mea_id, nrm_type, params={}):
+    ''' persists measure results in the results store (see results.sql)
+
+    replaces any results stored for the same measure, normalization type, 
+    and configuration (see get_cfg_hash)
+
+    args:
+        df: pandas dataframe as returned by the measure functions, optionally
+            with speaker info and annotation columns (see cfg.SPK_INFO_COLS 
+            and cfg.ANN_COLS; other columns are not stored)
+        mea_id: measure identifier (see cfg.MEASURES)
+        nrm_type: normalization type the results are based on
+        params: dict with further parameters the results depend on
+    returns:
+        res_id of the result set (not committed yet)
+    '''
+    assert 'sample_frac' not in df.attrs, \
+        'results for a sample of sessions are not persisted'
+    db.executescript(cfg.SQL_PATH, cfg.SQL_RES_FNAME)
+    res_id = db.ins_result_set(
+        mea_id, nrm_type, get_cfg_hash(mea_id, nrm_type, params))
+    db.del_results(res_id)
+    db.ins_result_groups(_groups_to_rows(df, res_id))
+    db.ins_measure_results(_results_to_rows(df, res_id))
+    return res_id
+
+
+@prf.timed
+def load_results(mea_id, nrm_type, features=None, params={}, **filters):
+    ''' loads (a slice of) persisted measure results (see save_results)
+
+    filters are applied in the database, so only the requested slice is
+    loaded; e.g., load_results(cfg.MEA_LCON, cfg.NRM_SPK, ['pitch_mean'], 
+    speaker_role='f', gender=['f', 'm'], native_lang='Chinese')
+
+    args:
+        mea_id: measure identifier (see cfg.MEASURES)
+        nrm_type: normalization type the results are based on
+        features: features for which to load results (all if None)
+        params: dict with further parameters the results depend on
+        filters: admissible value or list of values per speaker info column 
+            (see cfg.SPK_INFO_COLS) or "pm_type"
+    returns:
+        pandas dataframe with results as returned by the measure functions, 
+        plus speaker info and annotation columns (where stored), ready for 
+        the functions in ana
+    '''
+    for col in filters:
+        assert col in cfg.SPK_INFO_COLS + ['pm_type'], 'unknown filter column'
+    filters = {col: vals if isinstance(vals, (list, tuple)) else [vals]
+               for col, vals in filters.items()}
+    res_id = db.get_res_id(
+        mea_id, nrm_type, get_cfg_hash(mea_id, nrm_type, params))
+    assert res_id is not None, 'no results stored for this configuration'
+    return _results_from_df(db.get_measure_results(res_id, features, filters),
+                            db.get_result_groups(res_id, filters))
+
+
+@prf.timed
+def sample_non_adjacent_pairs(seed=cfg.SEED):
+    ''' samples non-adjacent chunk pairs ("x") and inserts them in chunk_pairs
+
+    replaces the commented-out RANDOM() cross join in aux_tables.sql; choices 
+    per turn-initial chunk are the turn-final chunks of all other adjacent 
+    pairs with same session, speaker, and role of the turn-final chunk; these
+    are grouped once and at least cfg.NON_ADJ_MIN and at least cfg.NON_ADJ_FRAC
+    of the choices are drawn without replacement per turn-initial chunk, rid 
+    being the (random) rank of each choice; existing "x" pairs are replaced
+
+    args:
+        seed: seed for the random generator
+    returns:
+        number of inserted non-adjacent pairs (not committed yet)
+    '''
+    def __get_rows(df_chp, rng):
+        ''' yields rows to insert, group by group '''
+        grp_cols = ['ses_id', 'spk_id1', 'speaker_role1']
+        for _, df_grp in df_chp.groupby(grp_cols, sort=True):
+            n = len(df_grp)
+            # number of choices per turn-initial chunk (all but its own pair)
+            k = min(n - 1, max(cfg.NON_ADJ_MIN, 
+                               int(np.ceil(cfg.NON_ADJ_FRAC * (n - 1)))))
+            if k == 0:
+                continue
+            # random key per turn-initial chunk and choice; the k smallest keys
+            # per row determine selection and order (own pair never selected);
+            # only those k are sorted, after partitioning each row
+            keys = rng.random((n, n))
+            np.fill_diagonal(keys, np.inf)
+            sel = np.argpartition(keys, k - 1, axis=1)[:, :k]
+            sel = np.take_along_axis(sel, np.argsort(
+                np.take_along_axis(keys, sel, axis=1), axis=1), axis=1)
+            chu_ids1 = df_grp['chu_id1'].to_numpy()[sel].ravel()
+            chu_ids2 = np.repeat(df_grp['chu_id2'].to_numpy(), k)
+            rids = np.tile(np.arange(k), n)
+            yield from zip(['x'] * len(rids), chu_ids1.tolist(), 
+                           chu_ids2.tolist(), rids.tolist())
+    df_chp = db.get_adjacent_pairs()
+    db.del_chunk_pairs('x')
+    db.ins_chunk_pairs(__get_rows(df_chp, np.random.default_rng(seed)))
+    return db.getrowcount()
+
+
+@prf.timed
 def syn(df_bt):
     ''' computes synchrony for given data, per session, task, and speaker
 
@@ -179,6 +1183,78 @@ def syn(df_bt):
     return aux.get_df(results, ['ses_id', 'tsk_id', 'spk_id'])
 
 
+@prf.timed
+def wsyn_lags(df_bt, lags, window=cfg.WSYN_WINDOW, step=cfg.WSYN_STEP):
+    ''' computes time-windowed synchrony for several lags at once
+
+    unlike syn, which correlates the features of adjacent chunk pairs, this
+    correlates the feature means of both speakers in sliding windows over the
+    whole task (see _get_window_means); the windowed means are computed only
+    once for all lags; note that overlapping windows (step < window) are not 
+    independent, p-values are then too optimistic
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data (not in 
+            pairs-only mode, all chunks are used)
+        lags: list of lags (number of steps) by which the partner's windows 
+            precede the speaker's windows; negative lags for the speaker 
+            leading the partner
+        window: window length (seconds, by chunk start time)
+        step: time between the starts of consecutive windows (seconds)
+    returns:
+        dict with pandas dataframe per lag, with results (r-value, p-value, 
+        degrees of freedom) in the same format as lcon/syn; tasks with fewer 
+        windows than needed for a lag are omitted for that lag
+    '''
+    win_means = _get_window_means(df_bt, window, step)
+    results = {}
+    for lag in lags:
+        idx = []
+        xs = []
+        ys = []
+        for (ses_id, tsk_id), spk_ids, means in win_means:
+            n_win = len(means[0])
+            if n_win <= abs(lag):
+                continue
+            # speaker's window k is paired with the partner's window k - lag
+            k = np.arange(max(0, lag), n_win + min(0, lag))
+            for i in [0, 1]:
+                idx.append((ses_id, tsk_id, spk_ids[i]))
+                xs.append(means[i][k])
+                ys.append(means[1 - i][k - lag])
+        if len(idx) == 0:
+            results[lag] = aux.get_df({f: {} for f in cfg.FEATURES}, 
+                                      ['ses_id', 'tsk_id', 'spk_id'])
+            continue
+        starts = np.cumsum([0] + [len(x) for x in xs[:-1]])
+        r, n = _grp_pearsonr(np.concatenate(xs), np.concatenate(ys), starts)
+        dofs = n.astype(int) - 2
+        with np.errstate(invalid='ignore'):
+            p = aux.r2p(r, np.maximum(dofs, 1))
+        p[np.isnan(r)] = np.nan
+        results[lag] = aux.get_df(
+            {f: dict(zip(idx, zip(r[:, j], p[:, j], dofs[:, j])))
+             for j, f in enumerate(cfg.FEATURES)}, 
+            ['ses_id', 'tsk_id', 'spk_id'])
+    return results
+
+
+def wsyn(df_bt, window=cfg.WSYN_WINDOW, step=cfg.WSYN_STEP, lag=cfg.WSYN_LAG):
+    ''' computes time-windowed synchrony per session, task, and speaker
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+        window, step: see wsyn_lags
+        lag: number of steps by which the partner's windows precede the 
+            speaker's windows (see wsyn_lags)
+    returns:
+        pandas dataframe with results (r-value, p-value, degrees of freedom), 
+        indexed by ses_id, tsk_id, and spk_id (as for syn)
+    '''
+    return wsyn_lags(df_bt, [lag], window, step)[lag]
+
+
+@prf.timed
 def lcon(df_bt):
     ''' computes local convergence for given data, per session and speaker
 
@@ -217,7 +1293,137 @@ def lcon(df_bt):
     return aux.get_df(results, ['ses_id', 'tsk_id', 'spk_id'])
 
 
+@prf.timed
+def prx(df_bt):
+    ''' computes global proximity per session/task and speaker
 
+    proximity is the similarity of a speaker's feature means to their partner's
+    means, compared with the mean similarity to all matched non-partners (from
+    speaker_pairs.sql; same topic, gender, and role constellation) as baseline
 
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+    returns:
+        pandas dataframe with results (partner similarity, mean non-partner 
+        similarity, number of non-partners), indexed by ses_id, tsk_id, and 
+        spk_id (0 for tsk_id index means all tasks in that session)
+    '''
+    idx, sims_p, sims_x, cnts_x = _get_global_sims(df_bt)
+    return _get_global_df(idx, sims_p[:, 0], sims_x[:, 0], cnts_x[:, 0])
+
+
+@prf.timed
+def con(df_bt):
+    ''' computes global convergence per session/task and speaker
+
+    convergence is the change in similarity to the partner from the first to 
+    the second half of a task/session, compared with the mean change in 
+    similarity to all matched non-partners (see prx) as baseline
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+    returns:
+        pandas dataframe with results (change in partner similarity, change in 
+        mean non-partner similarity, number of non-partners), indexed by 
+        ses_id, tsk_id, and spk_id (0 for tsk_id means all tasks in session)
+    '''
+    idx, sims_p, sims_x, cnts_x = _get_global_sims(df_bt)
+    return _get_global_df(idx, 
+                          sims_p[:, 2] - sims_p[:, 1], 
+                          sims_x[:, 2] - sims_x[:, 1], 
+                          np.minimum(cnts_x[:, 1], cnts_x[:, 2]))
+
+
+@prf.timed
+def perm_test(df_bt, mea_id, n_perm=cfg.PERM_N, seed=cfg.SEED, n_jobs=None):
+    ''' computes local measure with empirical p-values from permutations
 
+    for each permutation, turn-final chunks are shuffled among the turn 
+    exchanges of the same session, speaker, and role (i.e., same candidates as 
+    for non-adjacent pairs in aux_tables.sql) and the measure is recomputed; 
+    permutations are run in blocks of cfg.PERM_BLOCK with one seed per block 
+    (derived from given seed), so results do not depend on n_jobs
 
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+        mea_id: local measure to test (cfg.MEA_LCON or cfg.MEA_SYN)
+        n_perm: number of permutations
+        seed: seed for the random generator
+        n_jobs: number of worker processes (default: number of cpus)
+    returns:
+        pandas dataframe with results (r-value, empirical two-sided p-value, 
+        degrees of freedom) in the same format as lcon/syn
+    '''
+    idx, data = _get_local_data(df_bt, mea_id)
+    r_obs, n = _local_r(mea_id, data, data['y'])
+    data['r_obs'] = r_obs
+    # one job per block of permutations, each with its own seed
+    starts = range(0, n_perm, cfg.PERM_BLOCK)
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(starts))
+    jobs = [(mea_id, seed_seqs[b], min(cfg.PERM_BLOCK, n_perm - start))
+            for b, start in enumerate(starts)]
+    shms, specs = _share_arrays(data)
+    try:
+        cnts = sum(_run_in_pool(_perm_worker, specs, jobs, 
+                                n_jobs or os.cpu_count()))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    p = (cnts + 1) / (n_perm + 1)
+    p[np.isnan(r_obs)] = np.nan
+    dofs = n.astype(int) - 2
+    results = {f: dict(zip(idx, zip(r_obs[:, j], p[:, j], dofs[:, j])))
+               for j, f in enumerate(cfg.FEATURES)}
+    return aux.get_df(results, ['ses_id', 'tsk_id', 'spk_id'])
+
+
+@prf.timed
+def boot_test(df_bt, mea_id, n_boot=cfg.BOOT_N, alpha=cfg.BOOT_ALPHA, 
+              seed=cfg.SEED, n_jobs=None, sig_alpha=cfg.SIG_ALPHA):
+    ''' computes local measure with bootstrap confidence intervals
+
+    turn exchanges are resampled within each (ses_id, tsk_id, spk_id) group; 
+    each group's resamples are seeded by given seed and the group's key, so
+    results are reproducible regardless of n_jobs and data subsets; groups 
+    are processed in blocks of cfg.BOOT_BLOCK in a process pool
+
+    args:
+        df_bt: "big table" pandas dataframe as returned by load_data
+        mea_id: local measure to bootstrap (cfg.MEA_LCON or cfg.MEA_SYN)
+        n_boot: number of bootstrap resamples per group
+        alpha: confidence intervals are at level 1 - alpha (percentile method)
+        seed: seed for the random generators
+        n_jobs: number of worker processes (default: number of cpus)
+        sig_alpha: significance level for whether a speaker entrains on a 
+            feature in a resample (as in ana.annotate_local_measure)
+    returns:
+        pandas dataframe with results (r-value, lower and upper confidence 
+        bound) per feature, in the same index as lcon/syn, plus column 
+        "ent_boot" with a boolean array per speaker whether they entrain on 
+        any feature in each resample (see ana.get_ent_pct_ci), and marker 
+        column "boot_ci" with the confidence level; cells hold no p-values, 
+        so the result is not meant for ana.annotate_local_measure/get_stats
+    '''
+    idx, data = _get_local_data(df_bt, mea_id)
+    r_obs, _ = _local_r(mea_id, data, data['y'])
+    grps = np.arange(len(idx))
+    jobs = [(mea_id, seed, list(idx[b:b + cfg.BOOT_BLOCK]), 
+             grps[b:b + cfg.BOOT_BLOCK], n_boot, alpha, sig_alpha)
+            for b in range(0, len(idx), cfg.BOOT_BLOCK)]
+    shms, specs = _share_arrays(data)
+    try:
+        results = _run_in_pool(_boot_worker, specs, jobs, 
+                               n_jobs or os.cpu_count())
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    cis = np.concatenate([cis for cis, _ in results])
+    ents = np.concatenate([ents for _, ents in results])
+    results = {f: dict(zip(idx, zip(r_obs[:, j], cis[:, 0, j], cis[:, 1, j])))
+               for j, f in enumerate(cfg.FEATURES)}
+    df = aux.get_df(results, ['ses_id', 'tsk_id', 'spk_id'])
+    df['ent_boot'] = list(ents)
+    df['boot_ci'] = 1 - alpha
+    return df
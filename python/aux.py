@@ -1,13 +1,22 @@
-import hyphenate
 import math
-import nltk
 import numpy as np
 import pandas as pd
 import scipy
 
 import cfg
 
-cmu_dict = nltk.corpus.cmudict.dict()
+# cmu pronouncing dictionary for syllable counts, loaded on first use (see
+# _get_cmu_dict), so that importing this module needs neither nltk nor its data
+_cmu_dict = None
+
+
+def _get_cmu_dict():
+    ''' returns the cmu pronouncing dictionary (from nltk), loads it once '''
+    global _cmu_dict
+    if _cmu_dict is None:
+        import nltk
+        _cmu_dict = nltk.corpus.cmudict.dict()
+    return _cmu_dict
 
 
 
@@ -36,6 +45,9 @@ def preprocess_transcript(transcript):
 
 def count_syllables(in_str):
     ''' counts the number of syllables in a given string '''
+    # (only needed for transcripts, imported here like the dictionary above)
+    import hyphenate
+    cmu_dict = _get_cmu_dict()
     syll_count = 0
     for word in in_str.split(' '):
         ### PREPROCESSING
@@ -88,6 +100,14 @@ def pearsonr(x, y):
     return scipy.stats.pearsonr(x, y) + (len(x) - 2,)
 
 
+def r2p(r, dof):
+    ''' two-sided p-value(s) of pearson r with given degrees of freedom '''
+    r = np.clip(r, -1.0, 1.0)
+    with np.errstate(divide='ignore'):
+        t = r * np.sqrt(dof / (1.0 - r ** 2))
+    return 2 * scipy.stats.t.sf(np.abs(t), dof)
+
+
 def r2z(r):
     ''' fisher z-transformation of a pearson correlation coefficient '''
     return 0.5 * (math.log(1 + r) - math.log(1 - r))
@@ -101,6 +121,22 @@ def cohen_d(x, y):
     return (np.mean(x) - np.mean(y)) / np.sqrt((std_x ** 2 + std_y ** 2) / 2.0)
 
 
+def get_spk_type(gender, native_lang):
+    ''' speaker type labels for pandas series of gender and native language
+
+    e.g., "FC" for a female native speaker of Chinese (as in ana.get_chart);
+    "X"/"x" for missing gender/native language
+    '''
+    return gender.fillna('x').str.upper() + native_lang.fillna('x').str[0]
+
+
+def get_pair_type(spk_type1, spk_type2):
+    ''' labels of unordered pairs of speaker types (e.g., "FC-ME") '''
+    first = spk_type1 <= spk_type2
+    return spk_type1.where(first, spk_type2) + '-' \
+         + spk_type2.where(first, spk_type1)
+
+
 
            
 
@@ -8,40 +8,134 @@ CORPUS_ID_DC = 'XCDC'
 CORPUS_IDS = [CORPUS_ID_FC, CORPUS_ID_DC]
 
 # external paths (corpora directories and temporary file directory)
-# comment back in and point to corpora 
-# CORPUS_PATH_FC = ''
-# CORPUS_PATH_DC = ''
+# point to corpora (empty by default, enough for the tests)
+CORPUS_PATH_FC = ''
+CORPUS_PATH_DC = ''
 META_PATH_FC = CORPUS_PATH_FC + 'meta/'
 META_PATH_DC = CORPUS_PATH_DC + 'meta/'
 # set as needed
 TMP_PATH = ''
 
+# fisher corpus audio: by default, pre-split files per speaker in the corpus
+# directory ("<ses_id>.<A|B>.wav"); set FC_STEREO to True to read the original
+# two-channel recordings instead (speaker A on channel 1, B on channel 2),
+# selecting the speaker's channel per chunk
+# note: the LDC distribution stores these as shorten-compressed sphere files,
+#     which praat cannot open; convert them to wav first, keeping LDC's layout
+#     of 100 sessions per directory (audio/000/fe_03_00001.wav, ...), e.g.,
+#     "sph2pipe -f rif <in>.sph <out>.wav" per file; FC_STEREO_FNAME is
+#     relative to the corpus directory, with keys ses_id and dir
+#     (ses_id // 100, i.e., the audio/NNN directory)
+FC_STEREO = False
+FC_STEREO_FNAME = 'audio/%(dir)03d/fe_03_%(ses_id)05d.wav'
+
 # database filenames
 DB_FNAME_FC = '../../fc.db'
 DB_FNAME_DC = '../../xcdc.db'
 
+# timeout per praat call (in seconds) and number of retries per chunk before
+# it is quarantined in the extraction_errors table (fio.try_extract_features)
+PRAAT_TIMEOUT = 60
+PRAAT_RETRIES = 2
+
 # praat and sql scripts
 PRAAT_CUT_FNAME = 'extract_part_and_cut_pauses.praat'
 PRAAT_EXTRACT_FNAME = 'extract_features.praat'
 SQL_INIT_FNAME_FC = 'init_fc.sql'
 SQL_INIT_FNAME_DC = 'init_xcdc.sql'
 SQL_DI_FNAME = 'fc_del_irrelevant_ses.sql'
-SQL_CU_FNAME = 'cleanup.sql'
 SQL_FT_FNAME = 'fix_timestamps.sql'
+SQL_MIG_FNAME = 'migrate_has_all_features.sql'
 SQL_AT_FNAME = 'aux_tables.sql'
 SQL_BT_FNAME = 'big_table.sql'
 SQL_SP_FNAME = 'speaker_pairs.sql'
+SQL_INC_FNAME = 'incremental.sql'
+SQL_RES_FNAME = 'results.sql'
+SQL_PL_FNAME = 'pipeline.sql'
+SQL_SHD_FNAME = 'shard.sql'
 
 # normalization types
 NRM_SPK = 'SPEAKER'
 NRM_GND = 'GENDER'
 NRM_RAW = 'RAW'
 NRM_TYPES = [NRM_SPK, NRM_GND, NRM_RAW]
+# column suffixes for extra normalizations loaded alongside the primary one
+NRM_SUFFIXES = {NRM_SPK: '_spk', NRM_GND: '_gnd', NRM_RAW: '_raw'}
+# grouping columns for the computation of means/standard deviations
+NRM_GRP_COLS = {NRM_SPK: 'spk_id', NRM_GND: 'gender'}
 
 # entrainment measure identifiers
 MEA_LCON = 'lcon'
 MEA_SYN  = 'syn'
-MEASURES = [MEA_LCON, MEA_SYN]
+MEA_PRX  = 'prx'
+MEA_CON  = 'con'
+MEA_WSYN = 'wsyn'
+MEASURES = [MEA_LCON, MEA_SYN, MEA_PRX, MEA_CON, MEA_WSYN]
+
+# columns with speaker info and annotation per speaker in measure results
+# (see ana.add_speaker_info, ana.annotate_local_measure, and results.sql)
+SPK_INFO_COLS = ['gender', 'native_lang', 'gender_paired', 'native_lang_paired',
+                 'speaker_a_or_b', 'speaker_role', 'eng_yrs']
+ANN_COLS = ['+', '-', '+/-', 'pm_type']
+
+# dimensions of the speaker count cube all comparisons of annotated local
+# measures are computed from (see ana.get_cnt_cube)
+CNT_CUBE_COLS = ['gender', 'native_lang', 'gender_paired', 
+                 'native_lang_paired', 'pm_type', '+/-']
+
+# default number of permutations for ap.perm_test, permutations per seed/job
+# and default seed for all random sampling
+PERM_N = 1000
+PERM_BLOCK = 100
+SEED = 0
+
+# significance level of the local measures per speaker and feature (p-values
+# in ana.annotate_local_measure, r-values per resample in ap.boot_test)
+SIG_ALPHA = 0.05
+
+# default number of resamples and confidence level (1 - alpha) for 
+# ap.boot_test, number of (ses_id, tsk_id, spk_id) groups per job
+BOOT_N = 1000
+BOOT_ALPHA = 0.05
+BOOT_BLOCK = 500
+
+# minimum number and fraction of choices per turn-initial chunk for which 
+# non-adjacent pairs are sampled (ap.sample_non_adjacent_pairs)
+NON_ADJ_MIN = 10
+NON_ADJ_FRAC = 0.25
+
+# window length and step (seconds, by chunk start time) and default lag (in 
+# steps, partner preceding speaker) for time-windowed synchrony (ap.wsyn)
+WSYN_WINDOW = 30.0
+WSYN_STEP = 10.0
+WSYN_LAG = 0
+
+# number of rows per dataframe when streaming large query results
+# (e.g., non-partner speaker pairs from SQL_SP_FNAME for the fisher corpus)
+SQL_CHUNKSIZE = 500000
+
+# number of sessions per batch when streaming local measures (ap.stream_local)
+SES_BATCH = 50
+
+# instrumentation of hot paths (see prf.py; also enabled by environment 
+# variable IV_PROFILE), directory for the statistics files of all processes,
+# fraction of calls whose duration is kept for percentiles, maximum number of
+# durations kept per timer and process (reservoir), and minimum time between
+# writes of the statistics file of a process (seconds)
+PROFILE = False
+PROFILE_PATH = TMP_PATH + 'prf/'
+PROFILE_SAMPLE = 1.0
+PROFILE_RESERVOIR = 10000
+PROFILE_FLUSH_SECS = 5.0
+
+# columns of the "big table" kept in pairs-only mode of ap.load_data, in 
+# addition to features and extra paired columns (enough for the measures and 
+# for ana.add_speaker_info)
+PAIR_COLS = [
+    'ses_id', 'tsk_id', 'tur_id', 'chu_id', 'spk_id', 'speaker_role', 
+    'speaker_a_or_b', 'gender', 'native_lang', 'eng_yrs', 'start_time', 
+    'end_time', 'duration'
+]
 
 # all features computed by praat and those actually analyzed
 FEATURES_ALL = [
@@ -59,6 +153,20 @@ FEATURES_ALL = [
     'rate_syl',
     'rate_vcd'
 ]
+# complete output of the praat scripts per chunk (plus rate_syl, computed in
+# fio.extract_features), persisted in the chunk_features table (db.set_features;
+# a new praat output needs a column here and in the init scripts); columns of 
+# the chunks table are named as in FEATURES_ALL, any other column listed here 
+# can be added to FEATURES directly (ap joins it from chunk_features)
+FEATURES_STORE = [
+    'start_point', 'end_point', 'dur', 
+    'f0_min', 'f0_max', 'f0_mean', 'f0_std', 'f0_mas', 'f0_min_time', 
+    'f0_max_time', 'f0_pct1', 'f0_pct99', 'f0_q1', 'f0_q2', 'f0_q3', 
+    'vcd2tot_frames', 
+    'int_min', 'int_max', 'int_mean', 'int_std', 'int_min_time', 
+    'int_max_time', 'int_pct1', 'int_pct99', 'int_q1', 'int_q2', 'int_q3', 
+    'jitter', 'shimmer', 'nhr', 'rate_syl'
+]
 FEATURES = [
     'intensity_mean',
     'intensity_max',
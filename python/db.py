@@ -3,6 +3,7 @@ import sqlite3
 
 import cfg
 import fio
+import prf
 
 
 
@@ -59,6 +60,11 @@ def commit():
     dbc.commit()
 
 
+def getrowcount():
+    ''' returns number of rows affected by last (bulk) insert/update/delete '''
+    return dbc.getrowcount()
+
+
 def get_conn():
     ''' returns internal sqlite3 connection of global connection object 
 
@@ -175,6 +181,76 @@ def ins_chu(chu_id, tur_id, chunk_index, start, end, transcript, words,
 
 
 
+def ins_chunk_pairs(rows):
+    ''' inserts list of (p_or_x, chu_id1, chu_id2, rid) in chunk_pairs table '''
+    sql_stmt = \
+        'INSERT INTO chunk_pairs (p_or_x, chu_id1, chu_id2, rid)\n' \
+        'VALUES (?,?,?,?);'
+    dbc.executemany(sql_stmt, rows)
+
+
+def ins_nrm_stats(rows):
+    ''' inserts/replaces (nrm_type, grp, feature, mean, std) in nrm_stats '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO nrm_stats ' \
+            '(nrm_type, grp, feature, mean, std)\n' \
+        'VALUES (?,?,?,?,?);'
+    dbc.executemany(sql_stmt, rows)
+
+
+def ins_result_set(mea_id, nrm_type, cfg_hash):
+    ''' inserts result set (unless it exists) and returns its res_id '''
+    sql_stmt = \
+        'INSERT OR IGNORE INTO result_sets (mea_id, nrm_type, cfg_hash)\n' \
+        'VALUES (?,?,?);'
+    dbc.execute(sql_stmt, (mea_id, nrm_type, cfg_hash))
+    return get_res_id(mea_id, nrm_type, cfg_hash)
+
+
+def ins_result_groups(rows):
+    ''' inserts/replaces rows in result_groups (see results.sql) '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO result_groups (res_id, ses_id, tsk_id, ' \
+            'spk_id, gender, native_lang, gender_paired, native_lang_paired, ' \
+            'speaker_a_or_b, speaker_role, eng_yrs, pos_cnt, neg_cnt, ' \
+            'sig_cnt, pm_type)\n' \
+        'VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);'
+    dbc.executemany(sql_stmt, rows)
+
+
+def ins_measure_results(rows):
+    ''' inserts/replaces rows in measure_results (see results.sql) '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO measure_results (res_id, ses_id, tsk_id, ' \
+            'spk_id, feature, stat0, stat1, stat2)\n' \
+        'VALUES (?,?,?,?,?,?,?,?);'
+    dbc.executemany(sql_stmt, rows)
+
+
+def ins_extraction_errors(rows):
+    ''' inserts/replaces (ses_id, chu_id, attempts, error, stderr) rows '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO extraction_errors ' \
+            '(ses_id, chu_id, attempts, error, stderr)\n' \
+        'VALUES (?,?,?,?,?);'
+    dbc.executemany(sql_stmt, rows)
+
+
+
+def ins_ses_sample(ses_ids):
+    ''' replaces the sessions in temporary table ses_sample by given ones
+
+    the table only exists for the current connection (see ap.load_data with
+    sample_frac; get_sample_chunk_pairs)
+    '''
+    dbc.execute('CREATE TEMP TABLE IF NOT EXISTS ses_sample (\n'
+                '    ses_id INTEGER NOT NULL,\n'
+                '    PRIMARY KEY (ses_id)\n'
+                ');')
+    dbc.execute('DELETE FROM ses_sample;')
+    dbc.executemany('INSERT INTO ses_sample (ses_id) VALUES (?);', 
+                    [(ses_id,) for ses_id in ses_ids])
+
 ################################################################################
 #                           SETTERS (SIMPLE UPDATES)                           #
 ################################################################################
@@ -210,8 +286,29 @@ def set_turn_index_ses():
     dbc.execute(sql_stmt)
 
 
+@prf.timed
 def set_features(chu_id, features):
-    ''' sets features of given chunk '''
+    ''' sets features of given chunk (in chunks and chunk_features tables)
+
+    completeness is decided here: unless all features are set, all of them 
+    are stored as null, and has_all_features is set accordingly
+    '''
+    vals = [features['f0_min'],
+            features['f0_max'],
+            features['f0_mean'],
+            features['f0_std'],
+            features['rate_syl'],
+            features['vcd2tot_frames'],
+            features['int_min'],
+            features['int_max'],
+            features['int_mean'],
+            features['int_std'],
+            features['jitter'],
+            features['shimmer'],
+            features['nhr']]
+    has_all_features = all(val is not None for val in vals)
+    if not has_all_features:
+        vals = [None] * len(vals)
     sql_stmt = \
         'UPDATE chunks\n' \
         'SET    start_time = ?,\n' \
@@ -229,26 +326,52 @@ def set_features(chu_id, features):
         '       intensity_std = ?,\n' \
         '       jitter = ?,\n' \
         '       shimmer = ?,\n' \
-        '       nhr = ?\n' \
+        '       nhr = ?,\n' \
+        '       has_all_features = ?\n' \
         'WHERE  chu_id == ?;'
     dbc.execute(sql_stmt, 
-                (round(features['start_point'], 3),
+                [round(features['start_point'], 3),
                  round(features['end_point'], 3),
-                 round(features['dur'], 3),
-                 features['f0_min'],
-                 features['f0_max'],
-                 features['f0_mean'],
-                 features['f0_std'],
-                 features['rate_syl'],
-                 features['vcd2tot_frames'],
-                 features['int_min'],
-                 features['int_max'],
-                 features['int_mean'],
-                 features['int_std'],
-                 features['jitter'],
-                 features['shimmer'],
-                 features['nhr'],
-                 chu_id))
+                 round(features['dur'], 3)] + vals + 
+                [int(has_all_features), chu_id])
+    # complete output in feature store (keys not output are stored as null)
+    sql_stmt = \
+        'INSERT OR REPLACE INTO chunk_features (chu_id, %s)\n' \
+        'VALUES (?%s);' % (', '.join(cfg.FEATURES_STORE), 
+                           ',?' * len(cfg.FEATURES_STORE))
+    dbc.execute(sql_stmt, 
+                [chu_id] + [features.get(k) for k in cfg.FEATURES_STORE])
+
+
+def set_extraction_results(all_features, errors):
+    ''' sets features of extracted chunks, quarantines failed ones
+
+    args:
+        all_features: dict with features per chu_id (see set_features)
+        errors: list of (ses_id, chu_id, attempts, error, stderr) per 
+            quarantined chunk (see ins_extraction_errors)
+    '''
+    for chu_id, features in all_features.items():
+        set_features(chu_id, features)
+    del_extraction_errors(all_features.keys())
+    ins_extraction_errors(errors)
+
+
+def set_chg_consumer(name, chg_seq):
+    ''' records up to which change given consumer of ses_changes processed '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO chg_consumers (name, chg_seq)\n' \
+        'VALUES (?,?);'
+    dbc.execute(sql_stmt, (name, chg_seq))
+
+
+def set_pipeline_stage(stage, fingerprint, completed, seconds):
+    ''' records completion of given pipeline stage (see pipeline.sql) '''
+    sql_stmt = \
+        'INSERT OR REPLACE INTO pipeline_stages\n' \
+        '       (stage, fingerprint, completed, seconds)\n' \
+        'VALUES (?,?,?,?);'
+    dbc.execute(sql_stmt, (stage, fingerprint, completed, seconds))
 
 
 def set_duration():
@@ -273,6 +396,337 @@ def get_ses_ids():
     return [int(v[0]) for v in dbc.execute(sql_stmt).fetchall()]
 
 
+def get_ses_chunks(ses_id_from, ses_id_to):
+    ''' returns (ses_id, chu_id) of all chunks of sessions in given range '''
+    sql_stmt = \
+        'SELECT tsk.ses_id,\n' \
+        '       chu.chu_id\n' \
+        'FROM   chunks chu\n' \
+        'JOIN   turns tur\n' \
+        'ON     chu.tur_id == tur.tur_id\n' \
+        'JOIN   tasks tsk\n' \
+        'ON     tur.tsk_id == tsk.tsk_id\n' \
+        'WHERE  tsk.ses_id BETWEEN ? AND ?\n' \
+        'ORDER BY chu.chu_id;'
+    return dbc.execute(sql_stmt, (ses_id_from, ses_id_to)).fetchall()
+
+
+
+def get_chunk_times(ses_id_from, ses_id_to):
+    ''' returns timestamps and speaker of all chunks of sessions in range
+
+    chunks without timestamps are omitted; ordered by session and start time
+    '''
+    sql_stmt = \
+        'SELECT tsk.ses_id,\n' \
+        '       chu.chu_id,\n' \
+        '       CASE\n' \
+        '           WHEN tur.speaker_role == "d" AND tsk.a_or_b == "A"\n' \
+        '           THEN "A"\n' \
+        '           WHEN tur.speaker_role == "f" AND tsk.a_or_b == "B"\n' \
+        '           THEN "A"\n' \
+        '           ELSE "B"\n' \
+        '       END a_or_b,\n' \
+        '       chu.start_time,\n' \
+        '       chu.end_time\n' \
+        'FROM   chunks chu\n' \
+        'JOIN   turns tur\n' \
+        'ON     chu.tur_id == tur.tur_id\n' \
+        'JOIN   tasks tsk\n' \
+        'ON     tur.tsk_id == tsk.tsk_id\n' \
+        'WHERE  tsk.ses_id BETWEEN ? AND ?\n' \
+        'AND    chu.start_time IS NOT NULL\n' \
+        'AND    chu.end_time IS NOT NULL\n' \
+        'ORDER BY tsk.ses_id, chu.start_time, chu.end_time;'
+    return pd_read_sql_query(sql_stmt, params=(ses_id_from, ses_id_to))
+
+
+def get_adjacent_pairs():
+    ''' returns adjacent chunk pairs with session, speaker, role of chunk 1 
+
+    these are the candidates for non-adjacent pairs (see aux_tables.sql)
+    '''
+    sql_stmt = \
+        'SELECT chp.chu_id1,\n' \
+        '       chp.chu_id2,\n' \
+        '       ses.ses_id,\n' \
+        '       CASE\n' \
+        '           WHEN tur1.speaker_role == "d" AND tsk1.a_or_b == "A"\n' \
+        '           THEN ses.spk_id_a\n' \
+        '           WHEN tur1.speaker_role == "f" AND tsk1.a_or_b == "B"\n' \
+        '           THEN ses.spk_id_a\n' \
+        '           ELSE ses.spk_id_b\n' \
+        '       END spk_id1,\n' \
+        '       tur1.speaker_role speaker_role1\n' \
+        'FROM   chunk_pairs chp\n' \
+        'JOIN   chunks chu1\n' \
+        'ON     chp.chu_id1 == chu1.chu_id\n' \
+        'JOIN   turns tur1\n' \
+        'ON     chu1.tur_id == tur1.tur_id\n' \
+        'JOIN   tasks tsk1\n' \
+        'ON     tur1.tsk_id == tsk1.tsk_id\n' \
+        'JOIN   sessions ses\n' \
+        'ON     tsk1.ses_id == ses.ses_id\n' \
+        'WHERE  chp.p_or_x == "p"\n' \
+        'ORDER BY chp.chu_id2;'
+    return pd_read_sql_query(sql_stmt)
+
+
+def get_chg_seq():
+    ''' returns sequence number of the latest change in ses_changes '''
+    sql_stmt = 'SELECT IFNULL(MAX(chg_seq), 0) FROM ses_changes;'
+    return dbc.execute(sql_stmt).fetchone()[0]
+
+
+def get_chg_consumer(name):
+    ''' returns up to which change given consumer processed (None if never) '''
+    sql_stmt = \
+        'SELECT chg_seq\n' \
+        'FROM   chg_consumers\n' \
+        'WHERE  name == ?;'
+    res = dbc.execute(sql_stmt, (name,)).fetchone()
+    return None if res is None else res[0]
+
+
+def get_changed_ses_ids(chg_seq):
+    ''' returns ses_id for all sessions changed after given change, in order '''
+    sql_stmt = \
+        'SELECT ses_id\n' \
+        'FROM   ses_changes\n' \
+        'WHERE  chg_seq > ?\n' \
+        'ORDER BY ses_id;'
+    return [int(v[0]) for v in dbc.execute(sql_stmt, (chg_seq,)).fetchall()]
+
+
+def get_ses_speaker_types():
+    ''' returns ses_id, gender, and native language of both speakers per 
+    session (native language as in big_table.sql) '''
+    sql_stmt = \
+        'SELECT ses.ses_id,\n' \
+        '       spk_a.gender gender_a,\n' \
+        '       CASE\n' \
+        '           WHEN spk_a.native_lang == "Mandarin"\n' \
+        '           THEN "Chinese"\n' \
+        '           ELSE spk_a.native_lang\n' \
+        '       END native_lang_a,\n' \
+        '       spk_b.gender gender_b,\n' \
+        '       CASE\n' \
+        '           WHEN spk_b.native_lang == "Mandarin"\n' \
+        '           THEN "Chinese"\n' \
+        '           ELSE spk_b.native_lang\n' \
+        '       END native_lang_b\n' \
+        'FROM   sessions ses\n' \
+        'JOIN   speakers spk_a\n' \
+        'ON     ses.spk_id_a == spk_a.spk_id\n' \
+        'JOIN   speakers spk_b\n' \
+        'ON     ses.spk_id_b == spk_b.spk_id\n' \
+        'ORDER BY ses.ses_id;'
+    return pd_read_sql_query(sql_stmt)
+
+
+def get_ses_speakers():
+    ''' returns ses_id, spk_id, and gender for both speakers of all sessions '''
+    sql_stmt = \
+        'SELECT ses.ses_id,\n' \
+        '       spk.spk_id,\n' \
+        '       spk.gender\n' \
+        'FROM   sessions ses\n' \
+        'JOIN   speakers spk\n' \
+        'ON     spk.spk_id IN (ses.spk_id_a, ses.spk_id_b)\n' \
+        'ORDER BY ses.ses_id;'
+    return pd_read_sql_query(sql_stmt)
+
+
+def get_nrm_stats(nrm_type):
+    ''' returns persisted normalization statistics for given type '''
+    sql_stmt = \
+        'SELECT grp, feature, mean, std\n' \
+        'FROM   nrm_stats\n' \
+        'WHERE  nrm_type == ?;'
+    return pd_read_sql_query(sql_stmt, params=(nrm_type,))
+
+
+def get_res_id(mea_id, nrm_type, cfg_hash):
+    ''' returns res_id of given result set (None if it does not exist) '''
+    sql_stmt = \
+        'SELECT res_id\n' \
+        'FROM   result_sets\n' \
+        'WHERE  mea_id == ?\n' \
+        'AND    nrm_type == ?\n' \
+        'AND    cfg_hash == ?;'
+    res = dbc.execute(sql_stmt, (mea_id, nrm_type, cfg_hash)).fetchone()
+    return None if res is None else res[0]
+
+
+def get_result_sets():
+    ''' returns all persisted result sets (see results.sql) '''
+    return pd_read_sql_query('SELECT * FROM result_sets ORDER BY res_id;')
+
+
+def get_pipeline_stages():
+    ''' returns dict with (fingerprint, completed, seconds) per stage '''
+    sql_stmt = \
+        'SELECT stage, fingerprint, completed, seconds\n' \
+        'FROM   pipeline_stages\n' \
+        'ORDER  BY completed;'
+    return {row[0]: row[1:] for row in dbc.execute(sql_stmt).fetchall()}
+
+
+def has_corpus_tables():
+    ''' returns whether the corpus tables exist (i.e., init ran before) '''
+    sql_stmt = \
+        'SELECT COUNT(*)\n' \
+        'FROM   sqlite_master\n' \
+        "WHERE  type == 'table'\n" \
+        "AND    name == 'chunks';"
+    return dbc.execute(sql_stmt).fetchone()[0] > 0
+
+
+def get_extraction_errors():
+    ''' returns list of (ses_id, chu_id, attempts, error) per quarantined chunk
+    
+    (stderr output is omitted, query extraction_errors table directly) '''
+    sql_stmt = \
+        'SELECT ses_id, chu_id, attempts, error\n' \
+        'FROM   extraction_errors\n' \
+        'ORDER  BY chu_id;'
+    return dbc.execute(sql_stmt).fetchall()
+
+
+def _get_result_filter(res_id, filters):
+    ''' returns where clause and parameters for result queries below '''
+    sql_where = 'WHERE  grp.res_id == ?\n'
+    params = [res_id]
+    for col, vals in filters.items():
+        sql_where += \
+            'AND    grp.%s IN (%s)\n' % (col, ','.join('?' * len(vals)))
+        params += list(vals)
+    return sql_where, params
+
+
+def get_result_groups(res_id, filters={}):
+    ''' returns speaker info and annotation for given result set 
+
+    args:
+        res_id: identifier of the result set
+        filters: dict with list of admissible values per result_groups column
+            (e.g., {'speaker_role': ['f']})
+    returns:
+        pandas dataframe with one row per session/task/speaker, with columns
+        named as by ana.add_speaker_info and ana.annotate_local_measure
+    '''
+    sql_where, params = _get_result_filter(res_id, filters)
+    sql_stmt = \
+        'SELECT grp.ses_id,\n' \
+        '       grp.tsk_id,\n' \
+        '       grp.spk_id,\n' \
+        '       grp.pos_cnt "+",\n' \
+        '       grp.neg_cnt "-",\n' \
+        '       grp.sig_cnt "+/-",\n' \
+        '       grp.pm_type,\n' \
+        '       grp.gender,\n' \
+        '       grp.native_lang,\n' \
+        '       grp.gender_paired,\n' \
+        '       grp.native_lang_paired,\n' \
+        '       grp.speaker_a_or_b,\n' \
+        '       grp.speaker_role,\n' \
+        '       grp.eng_yrs\n' \
+        'FROM   result_groups grp\n' + \
+        sql_where + \
+        'ORDER BY grp.ses_id, grp.tsk_id, grp.spk_id;'
+    return pd_read_sql_query(sql_stmt, params=params)
+
+
+def get_measure_results(res_id, features=None, filters={}):
+    ''' returns results per feature for given result set 
+
+    args:
+        res_id: identifier of the result set
+        features: features for which to return results (all if None)
+        filters: see get_result_groups
+    returns:
+        pandas dataframe with one row per session/task/speaker and feature
+    '''
+    sql_where, params = _get_result_filter(res_id, filters)
+    if features is not None:
+        sql_where += \
+            'AND    res.feature IN (%s)\n' % ','.join('?' * len(features))
+        params += list(features)
+    sql_stmt = \
+        'SELECT res.ses_id,\n' \
+        '       res.tsk_id,\n' \
+        '       res.spk_id,\n' \
+        '       res.feature,\n' \
+        '       res.stat0,\n' \
+        '       res.stat1,\n' \
+        '       res.stat2\n' \
+        'FROM   measure_results res\n' \
+        'JOIN   result_groups grp\n' \
+        'ON     res.res_id == grp.res_id\n' \
+        'AND    res.ses_id == grp.ses_id\n' \
+        'AND    res.tsk_id == grp.tsk_id\n' \
+        'AND    res.spk_id == grp.spk_id\n' + \
+        sql_where + ';'
+    return pd_read_sql_query(sql_stmt, params=params)
+
+
+def get_chunk_features(features, chu_id_from=None, chu_id_to=None):
+    ''' returns dataframe with given columns of feature store per chu_id
+
+    args:
+        features: columns of chunk_features table (see cfg.FEATURES_STORE)
+        chu_id_from: first chunk to include (None for no lower bound)
+        chu_id_to: last chunk to include (None for no upper bound)
+    returns:
+        pandas dataframe indexed by chu_id
+    '''
+    for f in features:
+        assert f in cfg.FEATURES_STORE, 'unknown feature in feature store'
+    sql_stmt = \
+        'SELECT chu_id, %s\n' \
+        'FROM   chunk_features\n' \
+        'WHERE  chu_id BETWEEN ? AND ?;' % ', '.join(features)
+    params = (-1 if chu_id_from is None else chu_id_from,
+              2**63 - 1 if chu_id_to is None else chu_id_to)
+    return pd_read_sql_query(sql_stmt, params=params).set_index('chu_id')
+
+
+def get_chunk_pairs(ses_id_from, ses_id_to):
+    ''' returns all chunk pairs of sessions in given range (both inclusive) '''
+    sql_stmt = \
+        'SELECT chp.p_or_x,\n' \
+        '       chp.chu_id1,\n' \
+        '       chp.chu_id2,\n' \
+        '       chp.rid\n' \
+        'FROM   chunk_pairs chp\n' \
+        'JOIN   chunks chu2\n' \
+        'ON     chp.chu_id2 == chu2.chu_id\n' \
+        'JOIN   turns tur2\n' \
+        'ON     chu2.tur_id == tur2.tur_id\n' \
+        'JOIN   tasks tsk2\n' \
+        'ON     tur2.tsk_id == tsk2.tsk_id\n' \
+        'WHERE  tsk2.ses_id BETWEEN ? AND ?;'
+    return pd_read_sql_query(sql_stmt, params=(ses_id_from, ses_id_to))
+
+
+def get_sample_chunk_pairs():
+    ''' returns all chunk pairs of the sessions in ses_sample (see 
+    ins_ses_sample), like get_chunk_pairs '''
+    sql_stmt = \
+        'SELECT chp.p_or_x,\n' \
+        '       chp.chu_id1,\n' \
+        '       chp.chu_id2,\n' \
+        '       chp.rid\n' \
+        'FROM   chunk_pairs chp\n' \
+        'JOIN   chunks chu2\n' \
+        'ON     chp.chu_id2 == chu2.chu_id\n' \
+        'JOIN   turns tur2\n' \
+        'ON     chu2.tur_id == tur2.tur_id\n' \
+        'JOIN   tasks tsk2\n' \
+        'ON     tur2.tsk_id == tsk2.tsk_id\n' \
+        'WHERE  tsk2.ses_id IN (SELECT ses_id FROM ses_sample);'
+    return pd_read_sql_query(sql_stmt)
+
 
 ################################################################################
 #                                    OTHER                                     #
@@ -282,10 +736,12 @@ def executescript(path, fname):
     ''' executes given file as script '''
     # users should obviously not have the ability to execute arbitrary scripts,  
     # but this project is not for end users, just privately run data analysis
-    dbc.executescript(''.join(fio.readlines(path, fname)))
+    with prf.timer('db.executescript:' + fname):
+        dbc.executescript(''.join(fio.readlines(path, fname)))
 
 
-def pd_read_sql_query(sql_stmt='', sql_fname=''):
+def pd_read_sql_query(
+        sql_stmt='', sql_fname='', chunksize=None, params=tuple()):
     ''' runs given sql query and returns pandas dataframe of result 
 
     establishes and closes db connection for each call
@@ -293,13 +749,20 @@ def pd_read_sql_query(sql_stmt='', sql_fname=''):
     args:
         sql_stmt: sql statement to execute (only run if no filename given)
         sql_fname: filename (in cfg.SQL_PATH) from where to load sql statement
+        chunksize: if given, number of rows per dataframe to stream large
+            result sets (see cfg.SQL_CHUNKSIZE)
+        params: parameters for placeholders in the sql statement
     returns:
-        pandas dataframe with query result set 
+        pandas dataframe with query result set (or iterator over dataframes 
+        with up to chunksize rows each, if chunksize is given)
     '''
     assert len(sql_stmt) > 0 or len(sql_fname) > 0, 'need sql query or filename'
     if len(sql_fname) > 0:
         sql_stmt = '\n'.join(fio.readlines(cfg.SQL_PATH, sql_fname))
-    df = pd.read_sql_query(sql_stmt, get_conn())
+    # (with chunksize, only the execution and not the streaming is timed)
+    with prf.timer('db.pd_read_sql_query:' + (sql_fname or 'stmt')):
+        df = pd.read_sql_query(
+            sql_stmt, get_conn(), params=params, chunksize=chunksize)
     return df
 
 
@@ -333,8 +796,102 @@ def find_chunks(ses_id, a_or_b, time_suffix=''):
         yield(chu_id, words, start, end, task_index, spk_id_a, spk_id_b)
 
 
+def del_chunk_pairs(p_or_x):
+    ''' deletes all adjacent ("p") or non-adjacent ("x") chunk pairs '''
+    dbc.execute('DELETE FROM chunk_pairs WHERE p_or_x == ?;', (p_or_x,))
+
 
+def del_nrm_stats(nrm_type):
+    ''' deletes all persisted normalization statistics of given type '''
+    dbc.execute('DELETE FROM nrm_stats WHERE nrm_type == ?;', (nrm_type,))
 
 
+def del_results(res_id, ses_ids=None):
+    ''' deletes persisted results of given result set 
+
+    args:
+        res_id: identifier of the result set
+        ses_ids: sessions for which to delete results (None for all)
+    '''
+    for table in ['measure_results', 'result_groups']:
+        sql_stmt = 'DELETE FROM %s\nWHERE  res_id == ?' % table
+        if ses_ids is None:
+            dbc.execute(sql_stmt + ';', (res_id,))
+        else:
+            dbc.executemany(sql_stmt + '\nAND    ses_id == ?;', 
+                            [(res_id, ses_id) for ses_id in ses_ids])
+
 
+def del_extraction_errors(chu_ids):
+    ''' deletes quarantine entries of given chunks (extracted successfully) '''
+    dbc.executemany('DELETE FROM extraction_errors WHERE chu_id == ?;', 
+                    [(chu_id,) for chu_id in chu_ids])
 
+
+def rebuild_chunk_pairs(ses_ids):
+    ''' rebuilds chunk pairs of given sessions only, with aux_tables.sql 
+
+    the script runs in a separate in-memory database on copies of the data of
+    the given sessions (which only sees committed data, so pending changes are
+    committed first); the resulting adjacent pairs replace all existing pairs
+    of these sessions (non-adjacent pairs of the sessions are removed, see
+    ap.sample_non_adjacent_pairs to resample them)
+
+    args:
+        ses_ids: list of ses_id of sessions for which to rebuild pairs
+    returns:
+        number of inserted chunk pairs (not committed yet)
+    '''
+    dbc.commit()
+    db_fname = dbc.execute('PRAGMA database_list;').fetchone()[2]
+    conn = sqlite3.connect(':memory:')
+    conn.execute('ATTACH DATABASE ? AS src;', (db_fname,))
+    conn.execute('CREATE TABLE ses_ids (ses_id INTEGER NOT NULL);')
+    conn.executemany('INSERT INTO ses_ids (ses_id) VALUES (?);', 
+                     [(ses_id,) for ses_id in ses_ids])
+    conn.executescript(
+        'CREATE TABLE speakers AS\n' \
+        'SELECT * FROM src.speakers;\n' \
+        'CREATE TABLE sessions AS\n' \
+        'SELECT * FROM src.sessions\n' \
+        'WHERE  ses_id IN (SELECT ses_id FROM ses_ids);\n' \
+        'CREATE TABLE tasks AS\n' \
+        'SELECT * FROM src.tasks\n' \
+        'WHERE  ses_id IN (SELECT ses_id FROM ses_ids);\n' \
+        'CREATE TABLE turns AS\n' \
+        'SELECT * FROM src.turns\n' \
+        'WHERE  tsk_id IN (SELECT tsk_id FROM tasks);\n' \
+        'CREATE TABLE chunks AS\n' \
+        'SELECT * FROM src.chunks\n' \
+        'WHERE  tur_id IN (SELECT tur_id FROM turns);\n' \
+        'CREATE UNIQUE INDEX chu_pk ON chunks (chu_id);\n' \
+        'CREATE INDEX chu_tur_fk ON chunks (tur_id);\n' \
+        'CREATE UNIQUE INDEX tur_pk ON turns (tur_id);\n' \
+        'CREATE INDEX tur_tsk_fk ON turns (tsk_id);\n' \
+        'CREATE UNIQUE INDEX tsk_pk ON tasks (tsk_id);\n' \
+        'CREATE UNIQUE INDEX ses_pk ON sessions (ses_id);\n' \
+        'CREATE UNIQUE INDEX spk_pk ON speakers (spk_id);')
+    # the script drops tables by unqualified names, detach source beforehand
+    conn.execute('DETACH DATABASE src;')
+    conn.executescript(''.join(fio.readlines(cfg.SQL_PATH, cfg.SQL_AT_FNAME)))
+    rows = conn.execute(
+        'SELECT p_or_x, chu_id1, chu_id2, rid FROM chunk_pairs;').fetchall()
+    conn.close()
+    # remove pairs of given sessions and pairs of chunks no longer present
+    dbc.execute(
+        'DELETE FROM chunk_pairs\n' \
+        'WHERE  chu_id2 NOT IN (SELECT chu_id FROM chunks);')
+    dbc.executemany(
+        'DELETE FROM chunk_pairs\n' \
+        'WHERE  chu_id2 IN (\n' \
+        '    SELECT chu.chu_id\n' \
+        '    FROM   chunks chu\n' \
+        '    JOIN   turns tur\n' \
+        '    ON     chu.tur_id == tur.tur_id\n' \
+        '    JOIN   tasks tsk\n' \
+        '    ON     tur.tsk_id == tsk.tsk_id\n' \
+        '    WHERE  tsk.ses_id == ?\n' \
+        ');',
+        [(ses_id,) for ses_id in ses_ids])
+    ins_chunk_pairs(rows)
+    return len(rows)
@@ -4,6 +4,7 @@ import aux
 import cfg
 import db
 import fio
+import prf
 
 # functions for the population of deception corpus tables
 # note: chunks are listed in csv files per role and their audio contained in 
@@ -69,6 +70,7 @@ def get_ses_dict():
     return ses_dict
 
 
+@prf.timed
 def populate_speakers(ses_dict):
     ''' populates speakers table from dict of relevant sessions '''
     # dict to track speakers stored in database
@@ -86,6 +88,7 @@ def populate_speakers(ses_dict):
             spk_dict[row[13]] = 1
 
 
+@prf.timed
 def populate_sessions_and_tasks(ses_dict):
     ''' populates sessions/tasks tables from dict of relevant sessions '''
     for ses_id, spk_id_b, spk_id_a in ses_dict.values():
@@ -95,6 +98,7 @@ def populate_sessions_and_tasks(ses_dict):
         db.ins_tsk_dc(2*ses_id, ses_id, 2, 'A')
 
 
+@prf.timed
 def populate_turns_and_chunks(ses_dict):
     ''' populates turns/chunks tables from meta-data for relevant sessions '''
     # load chunks to dicts from meta-data csv files 
@@ -124,31 +128,56 @@ def populate_turns_and_chunks(ses_dict):
             role_prev = role
 
 
-def extract_features(ses_id):
-    ''' runs feature extraction for all chunks in given session, updates db '''
-    db.connect(cfg.CORPUS_ID_DC)
+@prf.timed
+def get_features(ses_id):
+    ''' runs feature extraction for all chunks in given session
+
+    only reads from the database (open connection), results are not stored 
+    (see extract_features, shard.extract_shard)
+
+    returns:
+        dict with features per chu_id for all chunks extracted successfully,
+        list of (ses_id, chu_id, attempts, error, stderr) per quarantined chunk
+        (see fio.try_extract_features)
+    '''
     path = cfg.get_corpus_path(cfg.CORPUS_ID_DC)
     path += 'wav_segments/ses' + str(ses_id) + '/'
+    all_features = {}
+    errors = []
     for a_or_b, ch in [('A', 1), ('B', 2)]:
-        all_features = {}
         for chu_id, words, start, end, task_index, spk_id_a, spk_id_b \
         in db.find_chunks(ses_id, a_or_b):
             if end - start >= 0.04: # min duration for 75Hz min pitch
                 fname = 'p%dp%d-part%d_ch%d:%f:%f.wav' % \
                     (spk_id_b, spk_id_a, task_index, ch, start, end)
-                all_features[chu_id] = fio.extract_features(
+                features, error = fio.try_extract_features(
                     path, fname, ses_id, chu_id, words, start, end, False)
-        # function is invoked in parallel, database might be locked;
-        # keep trying to update until it works
-        done = False
+                if error is None:
+                    all_features[chu_id] = features
+                else:
+                    # quarantine chunk, carry on with the next one
+                    errors.append((ses_id, chu_id) + error)
+    return all_features, errors
+
+
+@prf.timed
+def extract_features(ses_id):
+    ''' runs feature extraction for all chunks in given session, updates db '''
+    db.connect(cfg.CORPUS_ID_DC)
+    all_features, errors = get_features(ses_id)
+    # function is invoked in parallel, database might be locked;
+    # keep trying to update until it works
+    done = False
+    with prf.timer('dc.write_features'):
         while not done:
             try:
-                for chu_id, features in all_features.items():
-                    db.set_features(chu_id, features)
+                db.set_extraction_results(all_features, errors)
                 db.commit()
                 done = True
-            except sqlite3.OperationalError:
-                pass
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                prf.count('dc.locked_retries')
     db.close()
 
 
@@ -5,9 +5,11 @@ import aux
 import cfg
 import db
 import fio
+import prf
 
 
 
+@prf.timed
 def populate_speakers():
     ''' reads meta-data to populate speakers table '''
     fname = 'fe_03_pindata.tbl'
@@ -21,6 +23,7 @@ def populate_speakers():
         db.ins_spk_fc(spk_id, gender, age, years_edu, native_lang, where_raised)
 
 
+@prf.timed
 def populate_topics():
     ''' reads meta-data to populate topics table '''
     xml_str = ''.join(list(fio.readlines(cfg.META_PATH_FC, 'fe_03_topics.sgm')))
@@ -32,6 +35,7 @@ def populate_topics():
         db.ins_top_fc(top_id, title, details)
 
 
+@prf.timed
 def populate_sessions_and_tasks():
     ''' reads meta-data to populate tasks/sessions table '''
     # call data is split up in two files, process both
@@ -76,6 +80,7 @@ def populate_sessions_and_tasks():
                  phset_a, phset_b, phtype_a, phtype_b)
 
 
+@prf.timed
 def populate_turns_and_chunks():
     ''' populates turns/chunks tables from session transcripts '''
     # global ids for turns and chunks
@@ -124,29 +129,60 @@ def populate_turns_and_chunks():
     print('%d done, finished!' % ses_id)
 
 
-def extract_features(ses_id):
-    ''' runs feature extraction for all chunks in given session, updates db '''
-    db.connect(cfg.CORPUS_ID_FC)
+@prf.timed
+def get_features(ses_id):
+    ''' runs feature extraction for all chunks in given session
+
+    only reads from the database (open connection), results are not stored 
+    (see extract_features, shard.extract_shard)
+
+    returns:
+        dict with features per chu_id for all chunks extracted successfully,
+        list of (ses_id, chu_id, attempts, error, stderr) per quarantined chunk
+        (see fio.try_extract_features)
+    '''
     path = cfg.get_corpus_path(cfg.CORPUS_ID_FC)
-    for a_or_b in ['A', 'B']:
-        fname = '%d.%s.wav' % (ses_id, a_or_b)
-        all_features = {}
+    all_features = {}
+    errors = []
+    for a_or_b, ch in [('A', 1), ('B', 2)]:
+        if cfg.FC_STEREO:
+            # original recording, speaker's channel selected per chunk
+            fname = cfg.FC_STEREO_FNAME % {'ses_id': ses_id, 
+                                           'dir': ses_id // 100}
+        else:
+            fname = '%d.%s.wav' % (ses_id, a_or_b)
+            ch = 0
         for chu_id, words, start, end, _, _, _ \
         in db.find_chunks(ses_id, a_or_b, '_og'):
             if end - start >= 0.04: # min duration for 75Hz min pitch
-                all_features[chu_id] = fio.extract_features(
-                    path, fname, ses_id, chu_id, words, start, end)
-        # function is invoked in parallel, database might be locked;
-        # keep trying to update until it works
-        done = False
+                features, error = fio.try_extract_features(
+                    path, fname, ses_id, chu_id, words, start, end, channel=ch)
+                if error is None:
+                    all_features[chu_id] = features
+                else:
+                    # quarantine chunk, carry on with the next one
+                    errors.append((ses_id, chu_id) + error)
+    return all_features, errors
+
+
+@prf.timed
+def extract_features(ses_id):
+    ''' runs feature extraction for all chunks in given session, updates db '''
+    db.connect(cfg.CORPUS_ID_FC)
+    all_features, errors = get_features(ses_id)
+    # function is invoked in parallel, database might be locked;
+    # keep trying to update until it works
+    done = False
+    with prf.timer('fc.write_features'):
         while not done:
             try:
-                for chu_id, features in all_features.items():
-                    db.set_features(chu_id, features)
+                db.set_extraction_results(all_features, errors)
                 db.commit()
                 done = True
-            except sqlite3.OperationalError:
-                pass
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                prf.count('fc.locked_retries')
     db.close()
             
 
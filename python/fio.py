@@ -6,6 +6,7 @@ import subprocess
 import aux
 import cfg
 import db
+import prf
 
 
 
@@ -35,50 +36,106 @@ def read_csv(path, fname, delimiter=",", quotechar='"', skip_header=False):
 #                                     OTHER                                    #
 ################################################################################
 
-def extract_features(
-        in_path, in_fname, ses_id, chu_id, words, start, end, do_cut=True):
-    ''' runs feature extraction for given chunk section, returns features '''
+def _run_praat(args):
+    ''' runs praat script with given args, raises exception on failure
+
+    raises subprocess.CalledProcessError for non-zero exit codes and 
+    subprocess.TimeoutExpired (after killing praat) if the call takes longer
+    than cfg.PRAAT_TIMEOUT; both carry the captured stderr output
+    '''
+    subprocess.run(['praat', '--run'] + args, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.PIPE, timeout=cfg.PRAAT_TIMEOUT, 
+                   check=True)
+
+
+@prf.timed
+def extract_features(in_path, in_fname, ses_id, chu_id, words, start, end,
+                     do_cut=True, channel=0):
+    ''' runs feature extraction for given chunk section, returns features
+
+    channel is the speaker's channel (1 or 2) if in_fname is a two-channel
+    recording, 0 otherwise; the cutting script selects it per chunk while
+    reading (only possible with do_cut) '''
     # determine tmp filenames
     cut_fname = '%d_%d.wav' % (ses_id, chu_id)
     out_fname = '%d_%d.txt' % (ses_id, chu_id)
-    if do_cut:
-        # extract relevant audio with praat, removing pauses (fisher corpus 
-        # contains pauses longer than 50ms within transcription segments)
-        subprocess.check_call(['praat', '--run',
-                                cfg.PRAAT_PATH + cfg.PRAAT_CUT_FNAME,
-                                in_path + in_fname, 
-                                cfg.TMP_PATH + cut_fname,
-                                cfg.TMP_PATH + out_fname, 
-                                str(start), str(end)])
-    else:
-        # chunks are already in separate wav files, simply use the whole file
-        shutil.copy(in_path + in_fname, cfg.TMP_PATH + cut_fname)
-    # extract features
-    subprocess.check_call(['praat', '--run', 
-                           cfg.PRAAT_PATH + cfg.PRAAT_EXTRACT_FNAME,
-                           cfg.TMP_PATH + cut_fname, 
-                           cfg.TMP_PATH + out_fname])
-    # read output
-    features = {}
-    for line in readlines(cfg.TMP_PATH, out_fname):
-        key, val = line.replace('\n', '').split(',')
-        try:
-            val = float(val)
-        except:
-            val = None
-        features[key] = val
-    if not do_cut:
-        # cutting script writes start and end to output; if it's not run, these
-        # keys need to be set manually
-        features['start_point'] = start
-        features['end_point'] = end
-    features['rate_syl'] = aux.count_syllables(words) / features['dur']
-    # clean up
-    os.remove(cfg.TMP_PATH + cut_fname)
-    os.remove(cfg.TMP_PATH + out_fname)
+    try:
+        if do_cut:
+            # extract relevant audio with praat, removing pauses (fisher 
+            # corpus contains pauses longer than 50ms within transcription 
+            # segments)
+            with prf.timer('fio.praat_cut'):
+                _run_praat([cfg.PRAAT_PATH + cfg.PRAAT_CUT_FNAME,
+                            in_path + in_fname, 
+                            cfg.TMP_PATH + cut_fname,
+                            cfg.TMP_PATH + out_fname, 
+                            str(start), str(end), str(channel)])
+        else:
+            # chunks are already in separate wav files, simply use whole file
+            assert channel == 0, 'channel selection requires cutting'
+            with prf.timer('fio.copy'):
+                shutil.copy(in_path + in_fname, cfg.TMP_PATH + cut_fname)
+        # extract features
+        with prf.timer('fio.praat_extract'):
+            _run_praat([cfg.PRAAT_PATH + cfg.PRAAT_EXTRACT_FNAME,
+                        cfg.TMP_PATH + cut_fname, 
+                        cfg.TMP_PATH + out_fname])
+        # read output
+        with prf.timer('fio.read_output'):
+            features = {}
+            for line in readlines(cfg.TMP_PATH, out_fname):
+                key, val = line.replace('\n', '').split(',')
+                try:
+                    val = float(val)
+                except:
+                    val = None
+                features[key] = val
+        if not do_cut:
+            # cutting script writes start and end to output; if it's not run, 
+            # these keys need to be set manually
+            features['start_point'] = start
+            features['end_point'] = end
+        with prf.timer('fio.count_syllables'):
+            features['rate_syl'] = aux.count_syllables(words) / features['dur']
+        # all output is persisted (see db.set_features), nothing is dropped
+        assert set(features).issubset(cfg.FEATURES_STORE), \
+            'praat output without column in feature store (cfg.FEATURES_STORE)'
+    finally:
+        # clean up (also after failures, files might not exist then)
+        with prf.timer('fio.cleanup'):
+            for fname in [cut_fname, out_fname]:
+                if os.path.exists(cfg.TMP_PATH + fname):
+                    os.remove(cfg.TMP_PATH + fname)
+    prf.count('fio.chunks')
     
     return features
 
 
+def try_extract_features(in_path, in_fname, ses_id, chu_id, words, start, end,
+                         do_cut=True, channel=0, retries=cfg.PRAAT_RETRIES):
+    ''' runs extract_features with up to given number of retries
+
+    any failure (praat error or timeout, unexpected output) is caught, so 
+    that callers can carry on with the next chunk and quarantine this one
+
+    returns:
+        tuple (features, error); features is None if all attempts failed, 
+        error is None on success, otherwise a tuple (attempts, exception, 
+        stderr) of the last attempt (stderr None if not from a praat call)
+    '''
+    for attempt in range(1, retries + 2):
+        try:
+            return extract_features(in_path, in_fname, ses_id, chu_id, words,
+                                    start, end, do_cut, channel), None
+        except Exception as e:
+            prf.count('fio.failed_attempts')
+            stderr = getattr(e, 'stderr', None)
+            if isinstance(stderr, bytes):
+                stderr = stderr.decode(errors='replace')
+            error = (attempt, '%s: %s' % (type(e).__name__, e), stderr)
+    prf.count('fio.quarantined')
+    return None, error
+
+
 
 
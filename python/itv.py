@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+
+import db
+import prf
+
+# this module implements an interval index over the chunk timestamps of each
+# session: per speaker, sorted arrays of start and end times (built in one pass
+# over the chunks table) answer which chunks of the other speaker overlap a
+# chunk or follow it within a given time by binary search, for single chunks
+# as well as for all chunks of a corpus at once; this replaces pairwise sql
+# predicates on consecutive chunks (see aux_tables.sql) and quadratic self
+# joins for overlap statistics and overlap-based pair policies
+# note:
+#     code assumes continuous timestamps per session, no reset per task (see
+#     fix_timestamps.sql); chunks without timestamps are not indexed;
+#     overlap queries additionally use the running maximum of end times, so
+#     they stay logarithmic as long as chunks of one speaker do not nest
+#     (candidates in the searched range are filtered exactly either way)
+
+
+
+################################################################################
+#                                AUX FUNCTIONS                                 #
+################################################################################
+# auxiliary functions used only internally within this module
+
+def _expand(lo, hi):
+    ''' expands ranges [lo, hi) per query into flat arrays of positions
+
+    returns:
+        tuple of query positions and index positions, one entry per element
+        in all ranges (in order of queries, then index positions)
+    '''
+    cnts = np.maximum(hi - lo, 0)
+    qry = np.repeat(np.arange(len(lo)), cnts)
+    offs = np.arange(cnts.sum()) - np.repeat(np.cumsum(cnts) - cnts, cnts)
+    return qry, lo[qry] + offs
+
+
+
+################################################################################
+#                                MAIN FUNCTIONS                                #
+################################################################################
+
+class ChunkIndex(object):
+    ''' interval index over the chunks of one session, per speaker (A or B) '''
+
+    def __init__(self, ses_id, df_ses):
+        ''' builds index from dataframe with chu_id, a_or_b, start_time, and
+        end_time of all chunks of the session (see db.get_chunk_times) '''
+        self.ses_id = ses_id
+        # per speaker: chu_id, start, end, and running max of end, by start
+        self._spk = {}
+        # per chu_id: speaker, start, and end
+        self._chu = {}
+        for a_or_b in ['A', 'B']:
+            df = df_ses[df_ses['a_or_b'] == a_or_b] \
+                .sort_values(['start_time', 'end_time'])
+            chu_ids = df['chu_id'].to_numpy(dtype=np.int64)
+            starts = df['start_time'].to_numpy(dtype=float)
+            ends = df['end_time'].to_numpy(dtype=float)
+            self._spk[a_or_b] = (
+                chu_ids, starts, ends, np.maximum.accumulate(ends))
+            self._chu.update(zip(chu_ids.tolist(),
+                                 zip([a_or_b] * len(df), starts, ends)))
+
+    def __len__(self):
+        return len(self._chu)
+
+    def _get_other(self, a_or_b):
+        ''' returns index arrays of the speaker other than the given one '''
+        return self._spk['B' if a_or_b == 'A' else 'A']
+
+    def _find_overlaps(self, a_or_b, starts, ends):
+        ''' finds chunks of other speaker overlapping the given intervals
+
+        returns:
+            tuple of query positions and positions in the other speaker's
+            index arrays, one entry per overlapping pair
+        '''
+        _, starts2, ends2, max_ends2 = self._get_other(a_or_b)
+        # all chunks before lo end before the query starts (running max), all
+        # chunks from hi on start after the query ends
+        lo = np.searchsorted(max_ends2, starts, 'right')
+        hi = np.searchsorted(starts2, ends, 'left')
+        qry, pos = _expand(lo, hi)
+        keep = ends2[pos] > starts[qry]
+        return qry[keep], pos[keep]
+
+    def _find_following(self, a_or_b, starts, ends, delta, overlap_frac):
+        ''' finds chunks of other speaker starting within the given limits
+
+        returns:
+            tuple of query positions and positions in the other speaker's
+            index arrays, one entry per following pair
+        '''
+        _, starts2, _, _ = self._get_other(a_or_b)
+        lo = np.searchsorted(
+            starts2, ends - overlap_frac * (ends - starts), 'left')
+        hi = np.searchsorted(starts2, ends + delta, 'right')
+        return _expand(lo, hi)
+
+    def overlapping(self, chu_id):
+        ''' returns chu_id of the other speaker's chunks overlapping given one
+
+        chunks that only touch (end of one equal to start of the other) do not
+        overlap; result is ordered by start time
+        '''
+        a_or_b, start, end = self._chu[chu_id]
+        _, pos = self._find_overlaps(a_or_b, np.array([start]), np.array([end]))
+        return self._get_other(a_or_b)[0][pos]
+
+    def following(self, chu_id, delta, overlap_frac=0.0):
+        ''' returns chu_id of the other speaker's chunks following given one
+
+        args:
+            chu_id: chunk to find followers for
+            delta: maximum time between end of given chunk and start of the
+                following ones (seconds)
+            overlap_frac: fraction of given chunk's duration the following ones
+                may overlap it at most (0: start only after it ended, as for
+                adjacent pairs in aux_tables.sql; 0.5: the 50 percent rule)
+        returns:
+            numpy array of chu_id, ordered by start time
+        '''
+        a_or_b, start, end = self._chu[chu_id]
+        _, pos = self._find_following(
+            a_or_b, np.array([start]), np.array([end]), delta, overlap_frac)
+        return self._get_other(a_or_b)[0][pos]
+
+    def get_overlaps(self):
+        ''' returns all overlapping chunk pairs of different speakers
+
+        returns:
+            pandas dataframe with ses_id, chu_id1 (the chunk starting first),
+            chu_id2, and overlap (seconds), one row per pair
+        '''
+        chu_ids, starts, ends, _ = self._spk['A']
+        qry, pos = self._find_overlaps('A', starts, ends)
+        chu_ids2, starts2, ends2, _ = self._spk['B']
+        first = starts[qry] <= starts2[pos]
+        return pd.DataFrame({
+            'ses_id': self.ses_id,
+            'chu_id1': np.where(first, chu_ids[qry], chu_ids2[pos]),
+            'chu_id2': np.where(first, chu_ids2[pos], chu_ids[qry]),
+            'overlap': np.minimum(ends[qry], ends2[pos])
+                     - np.maximum(starts[qry], starts2[pos])})
+
+    def get_following(self, delta, overlap_frac=0.0):
+        ''' returns all pairs of chunks followed by chunks of the other speaker
+
+        args: see following
+        returns:
+            pandas dataframe with ses_id, chu_id1, chu_id2 (following chunk),
+            and gap between end of chunk 1 and start of chunk 2 (seconds;
+            negative for overlaps), one row per pair
+        '''
+        dfs = []
+        for a_or_b in ['A', 'B']:
+            chu_ids, starts, ends, _ = self._spk[a_or_b]
+            qry, pos = self._find_following(
+                a_or_b, starts, ends, delta, overlap_frac)
+            chu_ids2, starts2, _, _ = self._get_other(a_or_b)
+            dfs.append(pd.DataFrame({
+                'ses_id': self.ses_id,
+                'chu_id1': chu_ids[qry],
+                'chu_id2': chu_ids2[pos],
+                'gap': starts2[pos] - ends[qry]}))
+        return pd.concat(dfs, ignore_index=True)
+
+    def get_overlap_stats(self):
+        ''' returns overlap statistics per speaker (A and B)
+
+        returns:
+            pandas dataframe indexed by ses_id and a_or_b with number of
+            chunks, number of chunks overlapped by the other speaker, speech
+            time, and time overlapped by the other speaker (seconds; sum over
+            all overlapping pairs)
+        '''
+        df_ovl = self.get_overlaps()
+        rows = []
+        for a_or_b in ['A', 'B']:
+            chu_ids, starts, ends, _ = self._spk[a_or_b]
+            ovl = df_ovl[df_ovl['chu_id1'].isin(chu_ids)
+                         | df_ovl['chu_id2'].isin(chu_ids)]
+            rows.append([self.ses_id, a_or_b, len(chu_ids),
+                         len(np.intersect1d(chu_ids, ovl[['chu_id1', 'chu_id2']]
+                                            .to_numpy())),
+                         (ends - starts).sum(), ovl['overlap'].sum()])
+        return pd.DataFrame(rows, columns=[
+            'ses_id', 'a_or_b', 'chunks', 'chunks_overlapped',
+            'speech_time', 'overlap_time'
+        ]).set_index(['ses_id', 'a_or_b'])
+
+
+@prf.timed
+def build(ses_id_from=None, ses_id_to=None):
+    ''' builds interval indexes for all sessions in given range, in one pass
+
+    args:
+        ses_id_from: first session to include (None for no lower bound)
+        ses_id_to: last session to include (None for no upper bound)
+    returns:
+        dictionary of ChunkIndex per ses_id
+    '''
+    df = db.get_chunk_times(-1 if ses_id_from is None else ses_id_from,
+                            2**63 - 1 if ses_id_to is None else ses_id_to)
+    return {int(ses_id): ChunkIndex(int(ses_id), df_ses)
+            for ses_id, df_ses in df.groupby('ses_id', sort=True)}
+
+
+@prf.timed
+def get_overlaps(indexes):
+    ''' returns overlapping chunk pairs for all given indexes (see build) '''
+    return pd.concat([idx.get_overlaps() for idx in indexes.values()],
+                     ignore_index=True)
+
+
+@prf.timed
+def get_following(indexes, delta, overlap_frac=0.0):
+    ''' returns following chunk pairs for all given indexes (see build)
+
+    can serve as pair policy, e.g., a turn exchange candidate for every
+    chunk followed by the other speaker within delta seconds, allowing for
+    overlaps of up to overlap_frac of its duration (see
+    ChunkIndex.following)
+    '''
+    return pd.concat([idx.get_following(delta, overlap_frac)
+                      for idx in indexes.values()], ignore_index=True)
+
+
+@prf.timed
+def get_overlap_stats(indexes):
+    ''' returns overlap statistics per speaker for all given indexes
+
+    see ChunkIndex.get_overlap_stats; adds fraction of overlapped chunks and
+    of overlapped speech time
+    '''
+    df = pd.concat([idx.get_overlap_stats() for idx in indexes.values()])
+    df['chunks_overlapped_frac'] = df['chunks_overlapped'] / df['chunks']
+    df['overlap_time_frac'] = df['overlap_time'] / df['speech_time']
+    return df
@@ -0,0 +1,283 @@
+import atexit
+import contextlib
+import functools
+import glob
+import json
+import multiprocessing
+import multiprocessing.util
+import numpy as np
+import os
+import pandas as pd
+import random
+import time
+import uuid
+
+import cfg
+
+# this module implements lightweight instrumentation (timers, counters, and
+# sampled per-call durations) for the hot paths of extraction and analysis;
+# enabled by cfg.PROFILE or the environment variable IV_PROFILE (e.g.,
+# IV_PROFILE=1); while disabled (the default), timers and counters are no-ops
+# note 1:
+#     every process keeps its own statistics and writes them to its own file
+#     in the profile directory: at exit, when an outermost timer completes at
+#     least cfg.PROFILE_FLUSH_SECS after the last write, and, in pool workers
+#     (terminated without exit handlers), whenever an outermost timer
+#     completes, i.e., once per pool task; the report aggregates all files
+#     in the directory, i.e., across pool workers and corpora; enable()
+#     passes the settings on to processes started afterwards via environment
+#     variables (forked and spawned alike)
+# note 2:
+#     sampled durations are kept in a reservoir of cfg.PROFILE_RESERVOIR per
+#     timer and process (uniform sample of all sampled calls), so memory and
+#     the cost of each write stay bounded however many calls are timed;
+#     percentiles are computed over the pooled reservoirs of all processes
+
+
+
+################################################################################
+#                                AUX FUNCTIONS                                 #
+################################################################################
+# auxiliary functions used only internally within this module
+
+def _env_flag(name, default):
+    ''' returns whether given environment variable is set (and not "0") '''
+    val = os.environ.get(name, '')
+    return default if val == '' else val != '0'
+
+
+_enabled = _env_flag('IV_PROFILE', cfg.PROFILE)
+_path = os.environ.get('IV_PROFILE_DIR', '') or cfg.PROFILE_PATH
+_sample = float(os.environ.get('IV_PROFILE_SAMPLE', '') or cfg.PROFILE_SAMPLE)
+# per process: {name: [calls, total, min, max, sampled durations (reservoir),
+# number of sampled calls]}, {name: count}, depth of nested timers, process id
+# and file token, time of the last write, and whether it is a pool worker
+_timers = {}
+_counters = {}
+_depth = 0
+_pid = None
+_token = None
+_flushed = 0.0
+_is_worker = False
+_rng = random.Random()
+# shared no-op context returned by timer() while disabled
+_null = contextlib.nullcontext()
+
+
+def _check_pid():
+    ''' resets state inherited from parent process after a fork '''
+    global _timers, _counters, _depth, _pid, _token, _flushed, _is_worker
+    if _pid != os.getpid():
+        _timers, _counters, _depth = {}, {}, 0
+        _pid, _token = os.getpid(), uuid.uuid4().hex[:8]
+        _flushed = time.perf_counter()
+        # pool workers are daemonic; other child processes exit normally,
+        # which runs multiprocessing's finalizers (but not atexit handlers)
+        _is_worker = multiprocessing.current_process().daemon
+        if multiprocessing.parent_process() is not None:
+            multiprocessing.util.Finalize(None, _flush, exitpriority=0)
+
+
+def _get_fname():
+    ''' returns the file the current process writes its statistics to '''
+    return os.path.join(_path, 'prf_%d_%s.json' % (_pid, _token))
+
+
+def _record(name, dur):
+    ''' adds duration of one call to the statistics for given name '''
+    stats = _timers.get(name)
+    if stats is None:
+        stats = _timers[name] = [0, 0.0, dur, dur, [], 0]
+    stats[0] += 1
+    stats[1] += dur
+    stats[2] = min(stats[2], dur)
+    stats[3] = max(stats[3], dur)
+    if _sample >= 1 or _rng.random() < _sample:
+        # reservoir sampling: the n-th sampled call replaces a random kept
+        # duration with probability size / n once the reservoir is full
+        stats[5] += 1
+        if len(stats[4]) < cfg.PROFILE_RESERVOIR:
+            stats[4].append(dur)
+        else:
+            i = _rng.randrange(stats[5])
+            if i < cfg.PROFILE_RESERVOIR:
+                stats[4][i] = dur
+
+
+def _flush():
+    ''' writes statistics of the current process to its file (atomically) '''
+    global _flushed
+    _check_pid()
+    if not _enabled or (len(_timers) == 0 and len(_counters) == 0):
+        return
+    _flushed = time.perf_counter()
+    os.makedirs(_path, exist_ok=True)
+    fname = _get_fname()
+    with open(fname + '.tmp', 'w') as file:
+        json.dump({'timers': _timers, 'counters': _counters}, file)
+    os.replace(fname + '.tmp', fname)
+
+
+atexit.register(_flush)
+
+
+class _Timer(object):
+    ''' context manager recording the wall time of its block '''
+    __slots__ = ['_name', '_start']
+
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        global _depth
+        _check_pid()
+        _depth += 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _depth
+        end = time.perf_counter()
+        _record(self._name, end - self._start)
+        _depth -= 1
+        if _depth == 0 \
+        and (_is_worker or end - _flushed >= cfg.PROFILE_FLUSH_SECS):
+            _flush()
+        return False
+
+
+
+################################################################################
+#                                MAIN FUNCTIONS                                #
+################################################################################
+
+def enable(path=None, sample=None):
+    ''' enables instrumentation in this and all subsequently started processes
+
+    args:
+        path: directory for the statistics files (default: cfg.PROFILE_PATH)
+        sample: fraction of calls whose duration is kept for percentiles
+            (default: cfg.PROFILE_SAMPLE; counts, totals, min and max always
+            cover all calls)
+    '''
+    global _enabled, _path, _sample
+    _enabled = True
+    _path = path or _path
+    _sample = cfg.PROFILE_SAMPLE if sample is None else sample
+    os.environ['IV_PROFILE'] = '1'
+    os.environ['IV_PROFILE_DIR'] = _path
+    os.environ['IV_PROFILE_SAMPLE'] = str(_sample)
+
+
+def disable():
+    ''' disables instrumentation (statistics recorded so far are kept) '''
+    global _enabled
+    _flush()
+    _enabled = False
+    os.environ['IV_PROFILE'] = '0'
+
+
+def is_enabled():
+    ''' returns whether instrumentation is enabled in this process '''
+    return _enabled
+
+
+def timer(name):
+    ''' returns context manager recording the wall time of its block '''
+    return _Timer(name) if _enabled else _null
+
+
+def timed(func):
+    ''' decorator recording the wall time of each call of func
+
+    statistics are kept under "<module>.<function name>"; not suited for
+    generator functions (would only time the creation of the generator)
+    '''
+    name = '%s.%s' % (func.__module__, func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with _Timer(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def count(name, n=1):
+    ''' increments given counter by n
+
+    counters are written with the statistics file of the process (see note
+    1 at the top), i.e., counts outside of any timer in pool workers are
+    only reported up to their last completed outermost timer
+    '''
+    if _enabled:
+        _check_pid()
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    ''' clears statistics of this process and all files in the directory '''
+    global _timers, _counters
+    _check_pid()
+    _timers, _counters = {}, {}
+    for fname in glob.glob(os.path.join(_path, 'prf_*.json')):
+        os.remove(fname)
+
+
+def get_report(percentiles=[50, 90, 99]):
+    ''' aggregates the statistics of all processes into one dataframe
+
+    args:
+        percentiles: percentiles of the sampled call durations to compute
+    returns:
+        pandas dataframe indexed by name with kind ("timer" or "counter"),
+        number of processes, calls (or count), total, mean, min, and max
+        seconds, and one column per percentile (timers only)
+    '''
+    _flush()
+    timers = {}
+    counters = {}
+    for fname in sorted(glob.glob(os.path.join(_path, 'prf_*.json'))):
+        with open(fname) as file:
+            data = json.load(file)
+        for name, stats in data['timers'].items():
+            calls, total, t_min, t_max, samples = stats[:5]
+            agg = timers.setdefault(name, [0, 0, 0.0, np.inf, 0.0, []])
+            agg[0] += 1
+            agg[1] += calls
+            agg[2] += total
+            agg[3] = min(agg[3], t_min)
+            agg[4] = max(agg[4], t_max)
+            agg[5].extend(samples)
+        for name, cnt in data['counters'].items():
+            agg = counters.setdefault(name, [0, 0])
+            agg[0] += 1
+            agg[1] += cnt
+    pct_cols = ['p%g' % p for p in percentiles]
+    rows = []
+    for name, (n_procs, calls, total, t_min, t_max, samples) \
+    in timers.items():
+        pcts = np.percentile(samples, percentiles) if len(samples) > 0 \
+            else [np.nan] * len(percentiles)
+        rows.append([name, 'timer', n_procs, calls, total, total / calls,
+                     t_min, t_max] + list(pcts))
+    for name, (n_procs, cnt) in counters.items():
+        rows.append([name, 'counter', n_procs, cnt] +
+                    [np.nan] * (4 + len(percentiles)))
+    df = pd.DataFrame(rows, columns=[
+        'name', 'kind', 'n_procs', 'calls', 'total', 'mean', 'min', 'max'
+    ] + pct_cols)
+    return df.sort_values(['kind', 'total'], ascending=[False, False]) \
+        .set_index('name')
+
+
+def export_report(fname, percentiles=[50, 90, 99]):
+    ''' writes report (see get_report) to given .json or .csv file '''
+    assert fname.endswith(('.json', '.csv')), 'need .json or .csv filename'
+    df = get_report(percentiles)
+    if fname.endswith('.csv'):
+        df.to_csv(fname)
+    else:
+        df.to_json(fname, orient='index', indent=1)
+    return df
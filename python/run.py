@@ -0,0 +1,450 @@
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import pandas as pd
+import time
+
+import ana
+import ap
+import cfg
+import db
+import dc
+import fc
+import fio
+import prf
+
+# this module implements drivers that run the processing/analysis pipelines
+# for several corpora concurrently (one process and connection per corpus);
+# run as script for the full pipeline from database initialization to local
+# measures (python run.py --help; from within the python directory)
+
+
+
+################################################################################
+#                                AUX FUNCTIONS                                 #
+################################################################################
+# auxiliary functions used only internally within this module
+
+def _timed(timings, corpus_id, stage, func, *args, **kwargs):
+    ''' calls func(*args, **kwargs), appends its wall time to timings '''
+    start = time.perf_counter()
+    res = func(*args, **kwargs)
+    timings.append((corpus_id, stage, time.perf_counter() - start))
+    return res
+
+
+def _log(corpus_id, msg):
+    ''' prints progress message (one write, lines of processes don't mix) '''
+    print('%s: %s\n' % (corpus_id, msg), end='', flush=True)
+
+
+def _get_settings():
+    ''' returns all settings in cfg (upper case names) by name '''
+    return {name: getattr(cfg, name) for name in dir(cfg) if name.isupper()}
+
+
+def _spawned(settings, func, *args):
+    ''' calls func(*args) in spawned process, with settings of the parent
+
+    spawned processes import cfg anew, so any change made at runtime (e.g.,
+    to database paths or cfg.FEATURES) would otherwise be lost
+    '''
+    for name, val in settings.items():
+        setattr(cfg, name, val)
+    return func(*args)
+
+
+def _save_local_results(corpus_id, nrm_type, mea_ids, timings):
+    ''' computes, annotates, and persists local measures (open connection) '''
+    funcs = {cfg.MEA_LCON: ap.lcon, cfg.MEA_SYN: ap.syn}
+    df_bt = _timed(timings, corpus_id, 'load_data', ap.load_data,
+                   nrm_type, ['gender', 'native_lang'])
+    for mea_id in mea_ids:
+        df = _timed(timings, corpus_id, mea_id, funcs[mea_id], df_bt)
+        df = _timed(timings, corpus_id, mea_id + ':annotate',
+                    ana.annotate_local_measure, df)
+        df = _timed(timings, corpus_id, mea_id + ':add_speaker_info',
+                    ana.add_speaker_info, df, df_bt)
+        _timed(timings, corpus_id, mea_id + ':save_results',
+               ap.save_results, df, mea_id, nrm_type)
+        db.commit()
+
+
+def _analyze_corpus(corpus_id, nrm_type, mea_ids):
+    ''' runs local measure pipeline for one corpus, persists results
+
+    runs in its own process, with its own (global) connection; results are
+    passed back through the results store (see ap.save_results), only the
+    timings are returned
+
+    args:
+        corpus_id: one of the constants defined in cfg, identifying the corpus
+        nrm_type: normalization type (see cfg.NRM_TYPES)
+        mea_ids: local measures to compute (cfg.MEA_LCON and/or cfg.MEA_SYN)
+    returns:
+        list of (corpus_id, stage, seconds) tuples
+    '''
+    start = time.perf_counter()
+    timings = []
+    db.connect(corpus_id)
+    try:
+        _save_local_results(corpus_id, nrm_type, mea_ids, timings)
+    finally:
+        db.close()
+    timings.append((corpus_id, 'total', time.perf_counter() - start))
+    return timings
+
+
+def _get_file_listing(path):
+    ''' returns sorted (name, size, mtime) of all files below given path '''
+    listing = []
+    for root, _, fnames in os.walk(path):
+        for fname in fnames:
+            st = os.stat(os.path.join(root, fname))
+            listing.append((os.path.relpath(os.path.join(root, fname), path),
+                            st.st_size, int(st.st_mtime)))
+    return sorted(listing)
+
+
+def _get_stages(corpus_id, nrm_type, n_jobs):
+    ''' returns the pipeline stages for given corpus, in topological order
+
+    each stage is a tuple (name, dependencies, inputs, func, blocked_by);
+    inputs is a function returning all values the stage's result depends on
+    (besides its dependencies); blocked_by lists the stages after whose
+    completion (since the last init) the stage must not run again, because
+    the corpus tables are no longer in the state it expects:
+        populate inserts into empty tables (duplicates otherwise);
+        fix_timestamps offsets all second tasks (twice otherwise);
+        dc extraction finds chunk files by the original timestamps, i.e.,
+        only before fix_timestamps
+    populate to fix_timestamps thus form one non-idempotent chain that can
+    only run again from init on
+    '''
+    is_fc = corpus_id == cfg.CORPUS_ID_FC
+    meta_path = cfg.META_PATH_FC if is_fc else cfg.META_PATH_DC
+    init_fname = cfg.SQL_INIT_FNAME_FC if is_fc else cfg.SQL_INIT_FNAME_DC
+    get_script = lambda path, fname: ''.join(fio.readlines(path, fname))
+    get_sql = lambda fname: lambda: [get_script(cfg.SQL_PATH, fname)]
+    run_sql = lambda fname: lambda: db.executescript(cfg.SQL_PATH, fname)
+
+    def __populate():
+        ''' extracts meta-data from logs/transcripts/meta-data files '''
+        if is_fc:
+            fc.populate_speakers()
+            fc.populate_topics()
+            fc.populate_sessions_and_tasks()
+            fc.populate_turns_and_chunks()
+        else:
+            ses_dict = dc.get_ses_dict()
+            dc.populate_speakers(ses_dict)
+            dc.populate_sessions_and_tasks(ses_dict)
+            dc.populate_turns_and_chunks(ses_dict)
+            db.set_turn_index_ses()
+            db.set_duration()
+
+    def __extract():
+        ''' extracts features for all chunks, sessions in parallel 
+        
+        (chunks for which extraction fails are quarantined, see fc/dc) '''
+        ses_ids = db.get_ses_ids()
+        # workers use their own connections; none is inherited by the fork
+        db.commit()
+        db.close()
+        func = fc.extract_features if is_fc else dc.extract_features
+        try:
+            with multiprocessing.Pool(n_jobs or os.cpu_count()) as pool:
+                for i, _ in enumerate(pool.imap_unordered(func, ses_ids), 1):
+                    if i % 100 == 0:
+                        _log(corpus_id, '%d/%d sessions extracted' % 
+                             (i, len(ses_ids)))
+        finally:
+            db.connect(corpus_id)
+        errors = db.get_extraction_errors()
+        if len(errors) > 0:
+            _log(corpus_id, '%d chunks quarantined (see extraction_errors)' % 
+                 len(errors))
+
+    def __measures():
+        ''' computes local measures and saves them in the results store '''
+        _save_local_results(
+            corpus_id, nrm_type, [cfg.MEA_LCON, cfg.MEA_SYN], [])
+
+    stages = [
+        ('init', [], get_sql(init_fname), run_sql(init_fname), []),
+        ('populate', ['init'], lambda: _get_file_listing(meta_path), 
+         __populate, ['populate'])
+    ]
+    if is_fc:
+        stages.append(('del_irrelevant', ['populate'], 
+                       get_sql(cfg.SQL_DI_FNAME), 
+                       run_sql(cfg.SQL_DI_FNAME), []))
+    stages += [
+        ('extract', [stages[-1][0]], 
+         lambda: [get_script(cfg.PRAAT_PATH, cfg.PRAAT_CUT_FNAME),
+                  get_script(cfg.PRAAT_PATH, cfg.PRAAT_EXTRACT_FNAME)],
+         __extract, [] if is_fc else ['fix_timestamps'])
+    ]
+    if not is_fc:
+        # offsets all second tasks, must only run once on populated chunks
+        stages.append(('fix_timestamps', ['extract'], 
+                       get_sql(cfg.SQL_FT_FNAME), 
+                       run_sql(cfg.SQL_FT_FNAME), ['fix_timestamps']))
+    stages += [
+        ('aux_tables', [stages[-1][0]], get_sql(cfg.SQL_AT_FNAME), 
+         run_sql(cfg.SQL_AT_FNAME), []),
+        ('measures', ['aux_tables'], 
+         lambda: [nrm_type] + [ap.get_cfg_hash(mea_id, nrm_type)
+                               for mea_id in [cfg.MEA_LCON, cfg.MEA_SYN]],
+         __measures, [])
+    ]
+    return stages
+
+
+def _get_fingerprint(inputs, deps, records):
+    ''' hash over stage inputs and fingerprints/completion of dependencies '''
+    h = hashlib.sha1(json.dumps(
+        [inputs, [records.get(dep, [None, None])[:2] for dep in deps]],
+        default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def _get_plan(corpus_id, stages, records, force, until, has_tables):
+    ''' returns names of the stages that are not up to date, in order
+
+    a stage is not up to date if it is forced, one of its dependencies runs,
+    or its fingerprint changed; stages after until are never included; init
+    (which drops all corpus tables) is only planned on its own for a new
+    database, i.e., without corpus tables and init record; otherwise only if
+    forced (a changed init script is reported, not acted on)
+    '''
+    plan = []
+    for name, deps, inputs, _, _ in stages:
+        changed = records.get(name, [None])[0] != _get_fingerprint(
+            inputs(), deps, records)
+        if name == 'init' and (has_tables or 'init' in records):
+            if changed and name not in force:
+                _log(corpus_id, 'init script changed since the database was '
+                     'initialized, not rebuilding it (python run.py --force '
+                     'init rebuilds the database from scratch)')
+            changed = False
+        if name in force or any(dep in plan for dep in deps) or changed:
+            plan.append(name)
+        if name == until:
+            break
+    return plan
+
+
+def _check_plan(corpus_id, stages, records, plan):
+    ''' asserts that no stage in plan is blocked (see _get_stages)
+
+    a stage is blocked if a stage in its blocked_by list completed after the
+    last init and init is not part of the plan; without init record (corpus
+    tables created outside of run.py), it is unknown which stages completed,
+    so all stages with a blocked_by list are blocked
+    '''
+    if 'init' in plan:
+        return
+    for name, _, _, _, blocked_by in stages:
+        if name not in plan or len(blocked_by) == 0:
+            continue
+        assert 'init' in records, \
+            '%s: database has corpus tables but no pipeline records, %s ' \
+            'cannot run on them (not idempotent); force init to rebuild ' \
+            'the database from scratch (python run.py --force init)' % \
+            (corpus_id, name)
+        for blocker in blocked_by:
+            assert records.get(blocker, [None, ''])[1] <= records['init'][1], \
+                '%s: %s cannot run again after %s completed on the current ' \
+                'tables (not idempotent); force init to rebuild the ' \
+                'database from scratch (python run.py --force init)' % \
+                (corpus_id, name, blocker)
+
+
+def _run_stages(corpus_id, force, until, dry_run, n_jobs, nrm_type):
+    ''' runs all stages of the pipeline for one corpus that are not up to date
+
+    runs in its own process (for several corpora), with its own connection;
+    stage completion is recorded in the corpus database (see pipeline.sql);
+    refuses to run anything if a stage of the plan is blocked (see
+    _get_stages and _check_plan)
+    '''
+    db.connect(corpus_id)
+    try:
+        db.executescript(cfg.SQL_PATH, cfg.SQL_PL_FNAME)
+        db.commit()
+        records = db.get_pipeline_stages()
+        stages = _get_stages(corpus_id, nrm_type, n_jobs)
+        plan = _get_plan(corpus_id, stages, records, force, until, 
+                         db.has_corpus_tables())
+        _check_plan(corpus_id, stages, records, plan)
+        for name, deps, inputs, func, _ in stages:
+            if name not in plan:
+                _log(corpus_id, '%s is up to date' % name)
+            elif dry_run:
+                _log(corpus_id, '%s would run' % name)
+            else:
+                # (fingerprint after the dependencies ran, if they did)
+                fpr = _get_fingerprint(inputs(), deps, records)
+                _log(corpus_id, '%s started' % name)
+                start = time.perf_counter()
+                func()
+                db.commit()
+                seconds = time.perf_counter() - start
+                records[name] = [
+                    fpr, datetime.datetime.now().isoformat(), seconds]
+                db.set_pipeline_stage(name, *records[name])
+                db.commit()
+                _log(corpus_id, '%s done (%.1fs)' % (name, seconds))
+            if name == until:
+                break
+    finally:
+        db.close()
+
+
+
+################################################################################
+#                                MAIN FUNCTIONS                                #
+################################################################################
+
+def analyze_corpora(corpus_ids=cfg.CORPUS_IDS, nrm_type=cfg.NRM_SPK,
+                    mea_ids=[cfg.MEA_LCON, cfg.MEA_SYN], do_filter=True,
+                    n_jobs=None):
+    ''' runs local measure pipelines for several corpora concurrently
+
+    per corpus: ap.load_data, measures, ana.annotate_local_measure,
+    ana.add_speaker_info, (in the parent process, after loading results from
+    the results store) ana.filter_half_of_matches; corpora are processed in
+    separate processes ("spawned", so no connection is ever shared), each
+    with its own connection to its corpus database and the settings in cfg
+    as in the calling process
+
+    args:
+        corpus_ids: corpora to analyze (see cfg.CORPUS_IDS)
+        nrm_type: normalization type (see cfg.NRM_TYPES)
+        mea_ids: local measures to compute (cfg.MEA_LCON and/or cfg.MEA_SYN)
+        do_filter: whether to filter half of matching speaker types
+        n_jobs: number of processes (None: one per corpus, 1: no pool)
+    returns:
+        dict with result dataframe per (corpus_id, mea_id), and dataframe of
+        timings per corpus and stage in seconds ('total' for all stages run
+        in each corpus' process, corpus 'all' for the overall wall time)
+    '''
+    for corpus_id in corpus_ids:
+        cfg.check_corpus_id(corpus_id)
+    for mea_id in mea_ids:
+        assert mea_id in [cfg.MEA_LCON, cfg.MEA_SYN], 'only local measures'
+    assert db.dbc is None, 'close database connection first'
+    start = time.perf_counter()
+    args = [(corpus_id, nrm_type, mea_ids) for corpus_id in corpus_ids]
+    n_jobs = min(len(args), n_jobs or len(args))
+    if n_jobs == 1:
+        timings = [_analyze_corpus(*a) for a in args]
+    else:
+        settings = _get_settings()
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(n_jobs) as pool:
+            timings = pool.starmap(
+                _spawned, [(settings, _analyze_corpus) + a for a in args])
+    timings = [t for ts in timings for t in ts]
+    results = {}
+    for corpus_id in corpus_ids:
+        db.connect(corpus_id)
+        try:
+            for mea_id in mea_ids:
+                df = _timed(timings, corpus_id, mea_id + ':load_results',
+                            ap.load_results, mea_id, nrm_type)
+                if do_filter:
+                    df = _timed(timings, corpus_id, mea_id + ':filter',
+                                ana.filter_half_of_matches, corpus_id, df)
+                results[(corpus_id, mea_id)] = df
+        finally:
+            db.close()
+    timings.append(('all', 'total', time.perf_counter() - start))
+    return results, pd.DataFrame(
+        timings, columns=['corpus_id', 'stage', 'seconds'])
+
+
+def run_pipelines(corpus_ids=cfg.CORPUS_IDS, force=[], until=None, 
+                  dry_run=False, n_jobs=None, nrm_type=cfg.NRM_SPK):
+    ''' runs processing pipelines (init to local measures) per corpus
+
+    stages that are up to date (same inputs, dependencies not run again since)
+    are skipped; pipelines of different corpora run in parallel processes
+    (with the settings in cfg as in the calling process); prints per-stage
+    timings
+
+    args:
+        corpus_ids: corpora to process (see cfg.CORPUS_IDS)
+        force: names of stages to run even if up to date (later stages follow)
+        until: name of the last stage to run (None: all)
+        dry_run: only print which stages would run
+        n_jobs: number of processes for feature extraction per corpus
+        nrm_type: normalization type for the local measures
+    '''
+    for corpus_id in corpus_ids:
+        cfg.check_corpus_id(corpus_id)
+    assert db.dbc is None, 'close database connection first'
+    args = [(corpus_id, force, until, dry_run, n_jobs, nrm_type) 
+            for corpus_id in corpus_ids]
+    if len(args) == 1:
+        _run_stages(*args[0])
+    else:
+        # not daemonic, so each can run its own pool for feature extraction
+        settings = _get_settings()
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=_spawned,
+                             args=(settings, _run_stages) + a) for a in args]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        assert all(proc.exitcode == 0 for proc in procs), 'pipeline failed'
+    if not dry_run:
+        for corpus_id in corpus_ids:
+            db.connect(corpus_id)
+            try:
+                for name, (_, completed, seconds) in \
+                db.get_pipeline_stages().items():
+                    print('%-5s %-15s %10.1fs  (%s)' % 
+                          (corpus_id, name, seconds, completed))
+            finally:
+                db.close()
+
+
+def main(argv=None):
+    ''' command line interface for run_pipelines '''
+    parser = argparse.ArgumentParser(
+        description='runs the processing pipeline per corpus, skipping '
+                    'stages that are up to date')
+    parser.add_argument('--corpus', nargs='+', choices=cfg.CORPUS_IDS,
+                        default=cfg.CORPUS_IDS, help='corpora to process')
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE',
+                        help='stages to run even if up to date')
+    parser.add_argument('--until', metavar='STAGE', 
+                        help='last stage to run')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only print which stages would run')
+    parser.add_argument('--n-jobs', type=int, 
+                        help='processes for feature extraction per corpus')
+    parser.add_argument('--nrm-type', choices=cfg.NRM_TYPES, 
+                        default=cfg.NRM_SPK, 
+                        help='normalization type for local measures')
+    parser.add_argument('--profile', metavar='FNAME',
+                        help='instrument all processes and write report with '
+                             'per-stage percentiles to .json or .csv file')
+    args = parser.parse_args(argv)
+    if args.profile:
+        prf.enable()
+        prf.reset()
+    run_pipelines(args.corpus, args.force, args.until, args.dry_run, 
+                  args.n_jobs, args.nrm_type)
+    if args.profile:
+        print(prf.export_report(args.profile).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import collections
+import datetime
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import pandas as pd
+import sqlite3
+
+import cfg
+import db
+import dc
+import fc
+import fio
+
+# this module implements sharded feature extraction across machines (sqlite
+# does not support concurrent writers from several hosts): a manifest assigns
+# session ranges to shards, a worker per shard extracts the features of its
+# sessions into its own small sqlite file (reading chunks from its own copy of
+# the corpus database), and a merge applies all shard files to the corpus
+# database with conflict detection; run_local runs the whole flow on a single
+# machine; run as script for the command line interface (python shard.py -h)
+
+
+
+################################################################################
+#                                AUX FUNCTIONS                                 #
+################################################################################
+# auxiliary functions used only internally within this module
+
+def _get_module(corpus_id):
+    ''' returns the module with the corpus specific functions (fc or dc) '''
+    cfg.check_corpus_id(corpus_id)
+    return fc if corpus_id == cfg.CORPUS_ID_FC else dc
+
+
+def _get_chunk_hash(ses_chunks):
+    ''' returns hash over list of (ses_id, chu_id) to detect changed chunks '''
+    return hashlib.sha1(json.dumps(ses_chunks).encode()).hexdigest()[:16]
+
+
+def _load_manifest(fname):
+    ''' returns manifest and its id (hash over the file content) '''
+    with open(fname) as file:
+        content = file.read()
+    return json.loads(content), hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+def _init_worker(corpus_id):
+    ''' opens connection of pool worker (only used to read chunks) '''
+    db.connect(corpus_id)
+
+
+def _extract_ses(corpus_id, ses_id):
+    ''' runs extraction for one session in pool worker, returns results '''
+    return (ses_id,) + _get_module(corpus_id).get_features(ses_id)
+
+
+def _write_ses(conn, ses_id, all_features, errors):
+    ''' writes results of one session to shard file (one transaction) '''
+    conn.executemany(
+        'INSERT OR REPLACE INTO shard_features (chu_id, ses_id, features)\n'
+        'VALUES (?,?,?);',
+        [(chu_id, ses_id, json.dumps(features))
+         for chu_id, features in all_features.items()])
+    conn.executemany(
+        'INSERT OR REPLACE INTO shard_errors '
+            '(ses_id, chu_id, attempts, error, stderr)\n'
+        'VALUES (?,?,?,?,?);', errors)
+    conn.execute(
+        'INSERT OR REPLACE INTO shard_sessions (ses_id, completed)\n'
+        'VALUES (?,?);', (ses_id, datetime.datetime.now().isoformat()))
+    conn.commit()
+
+
+def _read_shard(fname):
+    ''' returns info, session ids, features, and errors from shard file '''
+    conn = sqlite3.connect(fname)
+    info = dict(conn.execute('SELECT key, value FROM shard_info;'))
+    ses_ids = [row[0] for row in conn.execute(
+        'SELECT ses_id FROM shard_sessions ORDER BY ses_id;')]
+    features = {chu_id: (ses_id, json.loads(val))
+                for chu_id, ses_id, val in conn.execute(
+                    'SELECT chu_id, ses_id, features FROM shard_features;')}
+    errors = conn.execute(
+        'SELECT ses_id, chu_id, attempts, error, stderr\n'
+        'FROM   shard_errors;').fetchall()
+    conn.close()
+    return info, ses_ids, features, errors
+
+
+def _is_same(val1, val2):
+    ''' returns whether two feature values are equal (null/nan as equal) '''
+    if val1 is None or val1 != val1:
+        return val2 is None or val2 != val2
+    return val1 == val2
+
+
+
+################################################################################
+#                                MAIN FUNCTIONS                                #
+################################################################################
+
+def get_shard_fname(path, corpus_id, shard_id):
+    ''' returns name of the file a shard worker writes to '''
+    return os.path.join(path, '%s_shard%d.db' % (corpus_id.lower(), shard_id))
+
+
+def make_manifest(corpus_id, n_shards, fname):
+    ''' assigns contiguous session ranges to shards, writes manifest file
+
+    ranges are balanced by number of chunks; per shard, the manifest holds a
+    hash over its chunks to detect extraction from (or merging into) a
+    database with different chunks; fewer shards than requested are created
+    if the sessions cannot be split that often
+
+    args:
+        corpus_id: corpus identifier (see cfg.CORPUS_IDS)
+        n_shards: number of shards
+        fname: name of the manifest (json) file to write
+    returns:
+        manifest as dict
+    '''
+    cfg.check_corpus_id(corpus_id)
+    assert db.dbc is None, 'close database connection first'
+    db.connect(corpus_id)
+    try:
+        ses_ids = db.get_ses_ids()
+        ses_chunks = db.get_ses_chunks(ses_ids[0], ses_ids[-1])
+    finally:
+        db.close()
+    assert 0 < n_shards <= len(ses_ids), 'invalid number of shards'
+    cnts = collections.Counter(ses_id for ses_id, _ in ses_chunks)
+    target = len(ses_chunks) / n_shards
+    grps = [[]]
+    total = 0
+    for ses_id in ses_ids:
+        grps[-1].append(ses_id)
+        total += cnts[ses_id]
+        if total >= target * len(grps) and len(grps) < n_shards:
+            grps.append([])
+    shards = []
+    for grp in [grp for grp in grps if len(grp) > 0]:
+        chunks = [row for row in ses_chunks if grp[0] <= row[0] <= grp[-1]]
+        shards.append({
+            'shard_id': len(shards),
+            'ses_id_from': grp[0],
+            'ses_id_to': grp[-1],
+            'n_sessions': len(grp),
+            'n_chunks': len(chunks),
+            'chunk_hash': _get_chunk_hash(chunks)
+        })
+    manifest = {
+        'corpus_id': corpus_id,
+        'created': datetime.datetime.now().isoformat(),
+        'shards': shards
+    }
+    with open(fname, 'w') as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+def extract_shard(manifest_fname, shard_id, path='', n_jobs=None):
+    ''' extracts features for all sessions of one shard into its shard file
+
+    chunks are read from the corpus database configured in cfg (on another
+    machine, a copy of the one the manifest was created from), which is not
+    written to; sessions already in the shard file are skipped, so an
+    interrupted worker can simply be started again
+
+    args:
+        manifest_fname: manifest file (see make_manifest)
+        shard_id: id of the shard in the manifest
+        path: directory for the shard file (see get_shard_fname)
+        n_jobs: number of processes for the extraction (None: all cores)
+    returns:
+        name of the shard file
+    '''
+    manifest, manifest_id = _load_manifest(manifest_fname)
+    corpus_id = manifest['corpus_id']
+    shard = manifest['shards'][shard_id]
+    assert db.dbc is None, 'close database connection first'
+    db.connect(corpus_id)
+    try:
+        ses_ids = [ses_id for ses_id in db.get_ses_ids()
+                   if shard['ses_id_from'] <= ses_id <= shard['ses_id_to']]
+        ses_chunks = db.get_ses_chunks(shard['ses_id_from'], shard['ses_id_to'])
+    finally:
+        db.close()
+    assert _get_chunk_hash(ses_chunks) == shard['chunk_hash'], \
+        'chunks differ from those the manifest was created for'
+    fname = get_shard_fname(path, corpus_id, shard_id)
+    conn = sqlite3.connect(fname)
+    try:
+        conn.executescript(
+            ''.join(fio.readlines(cfg.SQL_PATH, cfg.SQL_SHD_FNAME)))
+        info = {'manifest_id': manifest_id, 'corpus_id': corpus_id,
+                'shard_id': str(shard_id)}
+        conn.executemany(
+            'INSERT OR IGNORE INTO shard_info (key, value) VALUES (?,?);',
+            info.items())
+        conn.commit()
+        assert dict(conn.execute('SELECT key, value FROM shard_info;')) \
+            == info, 'shard file exists for a different manifest or shard'
+        done = set(row[0] for row in conn.execute(
+            'SELECT ses_id FROM shard_sessions;'))
+        ses_ids = [ses_id for ses_id in ses_ids if ses_id not in done]
+        func = functools.partial(_extract_ses, corpus_id)
+        with multiprocessing.Pool(
+                n_jobs or os.cpu_count(), _init_worker, (corpus_id,)) as pool:
+            # results are written by this process only (no locking issues)
+            for ses_id, all_features, errors in \
+            pool.imap_unordered(func, ses_ids):
+                _write_ses(conn, ses_id, all_features, errors)
+    finally:
+        conn.close()
+    return fname
+
+
+def merge_shards(manifest_fname, fnames, overwrite=False):
+    ''' applies shard files to the corpus database in one transaction
+
+    conflicts are detected before anything is written and reported, all
+    else is applied; conflicts of a shard file skip the whole file:
+        - shard file of a different manifest, or several files for one shard
+        - session outside the range of its shard
+        - chunks of a shard changed since the manifest was created
+    conflicts of a chunk skip only that chunk:
+        - chunk not (or no longer) part of the session it was extracted for
+        - features that differ from those already in the corpus database
+          (unless overwrite is set; identical ones are no conflict, so a
+          merge can be repeated)
+    shards need not be complete, sessions not yet extracted (or chunks
+    skipped) can be merged with a later call
+
+    args:
+        manifest_fname: manifest file (see make_manifest)
+        fnames: shard files to merge (see extract_shard)
+        overwrite: whether to replace differing features in the database
+    returns:
+        pandas dataframe with one row per conflict (fname, ses_id, chu_id,
+        conflict); empty if the shards were merged completely
+    '''
+    manifest, manifest_id = _load_manifest(manifest_fname)
+    corpus_id = manifest['corpus_id']
+    shards = manifest['shards']
+    conflicts = []
+    seen = set()
+    ses_done = set()
+    all_features = {}
+    errors = []
+    assert db.dbc is None, 'close database connection first'
+    db.connect(corpus_id)
+    try:
+        for fname in fnames:
+            info, ses_ids, features, ses_errors = _read_shard(fname)
+            if info.get('manifest_id') != manifest_id:
+                conflicts.append((fname, None, None, 'different manifest'))
+                continue
+            shard = shards[int(info['shard_id'])]
+            if shard['shard_id'] in seen:
+                conflicts.append((fname, None, None, 'shard merged twice'))
+                continue
+            seen.add(shard['shard_id'])
+            n_conflicts = len(conflicts)
+            for ses_id in ses_ids:
+                if not shard['ses_id_from'] <= ses_id <= shard['ses_id_to']:
+                    conflicts.append(
+                        (fname, ses_id, None, 'session outside shard range'))
+            ses_chunks = db.get_ses_chunks(
+                shard['ses_id_from'], shard['ses_id_to'])
+            if _get_chunk_hash(ses_chunks) != shard['chunk_hash']:
+                conflicts.append(
+                    (fname, None, None, 'chunks changed since manifest'))
+            if len(conflicts) > n_conflicts:
+                continue
+            chu_ses = dict((chu_id, ses_id) for ses_id, chu_id in ses_chunks)
+            stored = {}
+            if len(features) > 0:
+                df_cf = db.get_chunk_features(
+                    cfg.FEATURES_STORE, min(features), max(features))
+                stored = df_cf.to_dict('index')
+            for chu_id, (ses_id, vals) in features.items():
+                if chu_ses.get(chu_id) != ses_id:
+                    conflicts.append(
+                        (fname, ses_id, chu_id, 'chunk not in session'))
+                elif chu_id in stored and not overwrite and not all(
+                        _is_same(vals.get(k), stored[chu_id][k])
+                        for k in cfg.FEATURES_STORE):
+                    conflicts.append((fname, ses_id, chu_id,
+                                      'differs from corpus database'))
+                else:
+                    all_features[chu_id] = vals
+            errors += ses_errors
+            ses_done.update(ses_ids)
+        df = pd.DataFrame(
+            conflicts, columns=['fname', 'ses_id', 'chu_id', 'conflict']
+        ).astype({'ses_id': 'Int64', 'chu_id': 'Int64'})
+        db.set_extraction_results(all_features, errors)
+        db.commit()
+    finally:
+        db.close()
+    n_ses = sum(shard['n_sessions'] for shard in shards)
+    print('merged %d chunks (%d quarantined) of %d/%d sessions, '
+          '%d conflicts skipped' % (len(all_features), len(errors),
+                                    len(ses_done), n_ses, len(df)))
+    return df
+
+
+def run_local(corpus_id, n_shards, path='', n_jobs=1):
+    ''' runs the sharded extraction on this machine, e.g., to test the flow
+
+    creates the manifest in given path, runs all shard workers concurrently
+    (one process each, with n_jobs processes for the extraction), and merges
+    the shard files into the corpus database
+
+    returns:
+        pandas dataframe with conflicts, as returned by merge_shards
+    '''
+    if len(path) > 0:
+        os.makedirs(path, exist_ok=True)
+    manifest_fname = os.path.join(
+        path, '%s_manifest.json' % corpus_id.lower())
+    manifest = make_manifest(corpus_id, n_shards, manifest_fname)
+    # not daemonic, so each can run its own pool
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=extract_shard,
+                         args=(manifest_fname, shard['shard_id'], path, n_jobs))
+             for shard in manifest['shards']]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert all(proc.exitcode == 0 for proc in procs), 'shard worker failed'
+    return merge_shards(manifest_fname, [
+        get_shard_fname(path, corpus_id, shard['shard_id'])
+        for shard in manifest['shards']])
+
+
+def main(argv=None):
+    ''' command line interface (manifest, extract, merge, local) '''
+    parser = argparse.ArgumentParser(
+        description='sharded feature extraction across machines')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('manifest', help='assign session ranges to shards')
+    p.add_argument('--corpus', choices=cfg.CORPUS_IDS, required=True)
+    p.add_argument('--n-shards', type=int, required=True)
+    p.add_argument('--out', required=True, help='manifest file to write')
+    p = sub.add_parser('extract', help='run the worker of one shard')
+    p.add_argument('manifest')
+    p.add_argument('--shard', type=int, required=True, help='shard id')
+    p.add_argument('--path', default='', help='directory for shard file')
+    p.add_argument('--n-jobs', type=int, help='processes for extraction')
+    p = sub.add_parser('merge', help='apply shard files to corpus database')
+    p.add_argument('manifest')
+    p.add_argument('fnames', nargs='+', metavar='SHARD_FILE')
+    p.add_argument('--overwrite', action='store_true',
+                   help='replace features that differ in the database')
+    p = sub.add_parser('local', help='run all shards on this machine')
+    p.add_argument('--corpus', choices=cfg.CORPUS_IDS, required=True)
+    p.add_argument('--n-shards', type=int, required=True)
+    p.add_argument('--path', default='', help='directory for shard files')
+    p.add_argument('--n-jobs', type=int, default=1,
+                   help='processes for extraction per shard')
+    args = parser.parse_args(argv)
+    if args.cmd == 'manifest':
+        manifest = make_manifest(args.corpus, args.n_shards, args.out)
+        for shard in manifest['shards']:
+            print('shard %(shard_id)d: sessions %(ses_id_from)d-%(ses_id_to)d '
+                  '(%(n_sessions)d sessions, %(n_chunks)d chunks)' % shard)
+    elif args.cmd == 'extract':
+        print(extract_shard(args.manifest, args.shard, args.path, args.n_jobs))
+    else:
+        if args.cmd == 'merge':
+            df = merge_shards(args.manifest, args.fnames, args.overwrite)
+        else:
+            df = run_local(args.corpus, args.n_shards, args.path, args.n_jobs)
+        if len(df) > 0:
+            print(df.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,8 @@
 --     code assumes continuous timestamps per session, no reset per task!
 -- note 3:
 --     non-adjacent turn exchanges not included here because local similarity is
---     not being analyzed in this project (can be commented back in below)
+--     not being analyzed in this project (can be commented back in below, but 
+--     ap.sample_non_adjacent_pairs does the same much faster after this script)
 
 
 
@@ -105,23 +106,7 @@ chu AS
             THEN 1
             ELSE 0
         END is_last_in_task,
-        CASE
-            WHEN chu.pitch_min IS NOT NULL 
-            AND  chu.pitch_max IS NOT NULL 
-            AND  chu.pitch_mean IS NOT NULL 
-            AND  chu.pitch_std IS NOT NULL 
-            AND  chu.intensity_min IS NOT NULL 
-            AND  chu.intensity_max IS NOT NULL 
-            AND  chu.intensity_mean IS NOT NULL 
-            AND  chu.intensity_std IS NOT NULL 
-            AND  chu.rate_vcd IS NOT NULL 
-            AND  chu.rate_syl IS NOT NULL 
-            AND  chu.jitter IS NOT NULL 
-            AND  chu.shimmer IS NOT NULL 
-            AND  chu.nhr IS NOT NULL 
-            THEN 1
-            ELSE 0
-        END has_all_features
+        chu.has_all_features
  FROM   chunks chu
  JOIN   turns tur
  ON     chu.tur_id == tur.tur_id
@@ -313,6 +298,8 @@ CREATE INDEX chp_chu_fk2 ON chunk_pairs (chu_id2);
 
 
 
+-- (superseded by ap.sample_non_adjacent_pairs, which draws the same number of
+--  choices per turn-initial chunk in python, without the quadratic cross join)
 -- CREATE TABLE tmp
 -- AS
 -- -- all possible non-adjacent choices per turn-initial chunk in random order; 
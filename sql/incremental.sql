@@ -0,0 +1,105 @@
+-- tables and triggers for incremental recomputation (see ap.update_local);
+-- run once after aux_tables.sql, script can safely be run again (it never
+-- drops anything); changes made before it was first run are not tracked;
+-- measure results themselves are persisted in tables from results.sql
+-- note 1:
+--     changes are tracked on chunks only (inserts, deletes, and updates of the
+--     columns relevant for the analysis); each change stamps the session with
+--     a new, increasing sequence number; every consumer of the log (chunk
+--     pairs, persisted result sets of local measures) records up to which
+--     sequence number it has processed the changes
+-- note 2:
+--     fix_timestamps.sql is not incremental (offsets all second tasks again);
+--     re-extracted chunks need to be written with continuous timestamps
+
+
+
+CREATE TABLE IF NOT EXISTS ses_changes (
+    ses_id      INTEGER NOT NULL,
+    -- sequence number of the latest change to any chunk in the session
+    chg_seq     INTEGER NOT NULL,
+    PRIMARY KEY (ses_id)
+);
+
+CREATE INDEX IF NOT EXISTS sch_seq ON ses_changes (chg_seq);
+
+
+
+CREATE TABLE IF NOT EXISTS chg_consumers (
+    -- "chunk_pairs" or "res:<res_id>" (result set, see results.sql)
+    name        TEXT NOT NULL,
+    -- sequence number up to which changes have been processed
+    chg_seq     INTEGER NOT NULL,
+    PRIMARY KEY (name)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS nrm_stats (
+    -- normalization statistics the persisted measure results are based on
+    nrm_type    TEXT NOT NULL,
+    -- spk_id or gender (no type affinity, values are stored as given)
+    grp         NOT NULL,
+    feature     TEXT NOT NULL,
+    mean        NUMERIC,
+    std         NUMERIC,
+    PRIMARY KEY (nrm_type, grp, feature)
+);
+
+
+
+CREATE TRIGGER IF NOT EXISTS chu_ins_log
+AFTER INSERT ON chunks
+BEGIN
+    INSERT OR REPLACE INTO ses_changes (ses_id, chg_seq)
+    SELECT tsk.ses_id,
+           (SELECT IFNULL(MAX(chg_seq), 0) + 1 FROM ses_changes)
+    FROM   turns tur
+    JOIN   tasks tsk
+    ON     tur.tsk_id == tsk.tsk_id
+    WHERE  tur.tur_id == NEW.tur_id;
+END;
+
+
+
+CREATE TRIGGER IF NOT EXISTS chu_del_log
+AFTER DELETE ON chunks
+BEGIN
+    INSERT OR REPLACE INTO ses_changes (ses_id, chg_seq)
+    SELECT tsk.ses_id,
+           (SELECT IFNULL(MAX(chg_seq), 0) + 1 FROM ses_changes)
+    FROM   turns tur
+    JOIN   tasks tsk
+    ON     tur.tsk_id == tsk.tsk_id
+    WHERE  tur.tur_id == OLD.tur_id;
+END;
+
+
+
+CREATE TRIGGER IF NOT EXISTS chu_upd_log
+AFTER UPDATE OF tur_id, chunk_index, start_time, end_time, duration, words,
+                pitch_min, pitch_max, pitch_mean, pitch_std, rate_syl,
+                rate_vcd, intensity_min, intensity_max, intensity_mean,
+                intensity_std, jitter, shimmer, nhr
+ON chunks
+-- only actual changes (e.g., re-extraction with identical results)
+WHEN (OLD.tur_id, OLD.chunk_index, OLD.start_time, OLD.end_time,
+      OLD.duration, OLD.words, OLD.pitch_min, OLD.pitch_max, OLD.pitch_mean,
+      OLD.pitch_std, OLD.rate_syl, OLD.rate_vcd, OLD.intensity_min,
+      OLD.intensity_max, OLD.intensity_mean, OLD.intensity_std, OLD.jitter,
+      OLD.shimmer, OLD.nhr)
+     IS NOT
+     (NEW.tur_id, NEW.chunk_index, NEW.start_time, NEW.end_time,
+      NEW.duration, NEW.words, NEW.pitch_min, NEW.pitch_max, NEW.pitch_mean,
+      NEW.pitch_std, NEW.rate_syl, NEW.rate_vcd, NEW.intensity_min,
+      NEW.intensity_max, NEW.intensity_mean, NEW.intensity_std, NEW.jitter,
+      NEW.shimmer, NEW.nhr)
+BEGIN
+    INSERT OR REPLACE INTO ses_changes (ses_id, chg_seq)
+    SELECT tsk.ses_id,
+           (SELECT IFNULL(MAX(chg_seq), 0) + 1 FROM ses_changes)
+    FROM   turns tur
+    JOIN   tasks tsk
+    ON     tur.tsk_id == tsk.tsk_id
+    WHERE  tur.tur_id IN (OLD.tur_id, NEW.tur_id);
+END;
@@ -3,6 +3,8 @@
 --     allows for reuse of code
 
 
+DROP TABLE IF EXISTS chunk_features;
+DROP TABLE IF EXISTS extraction_errors;
 DROP TABLE IF EXISTS chunks;
 DROP TABLE IF EXISTS turns;
 DROP TABLE IF EXISTS tasks;
@@ -137,14 +139,80 @@ CREATE TABLE chunks (
     jitter            NUMERIC,
     shimmer           NUMERIC,
     nhr               NUMERIC,
+    -- 1 if all features above are set, 0 otherwise; decided when features
+    -- are written (db.set_features sets either all of them or none)
+    has_all_features  INTEGER NOT NULL DEFAULT 0,
     PRIMARY KEY (chu_id),
     FOREIGN KEY (tur_id) REFERENCES turns (tur_id)
 );
 
 
 
+CREATE TABLE chunk_features (
+    -- feature store: complete output of the praat scripts per chunk, one 
+    -- column per key (see cfg.FEATURES_STORE; values as extracted, without 
+    -- rounding; "--undefined--" stored as null); chu_id is an alias of the
+    -- rowid, rows are thus stored in a single b-tree without extra index
+    chu_id            INTEGER NOT NULL,
+    start_point       REAL,
+    end_point         REAL,
+    dur               REAL,
+    f0_min            REAL,
+    f0_max            REAL,
+    f0_mean           REAL,
+    f0_std            REAL,
+    f0_mas            REAL,
+    f0_min_time       REAL,
+    f0_max_time       REAL,
+    f0_pct1           REAL,
+    f0_pct99          REAL,
+    f0_q1             REAL,
+    f0_q2             REAL,
+    f0_q3             REAL,
+    vcd2tot_frames    REAL,
+    int_min           REAL,
+    int_max           REAL,
+    int_mean          REAL,
+    int_std           REAL,
+    int_min_time      REAL,
+    int_max_time      REAL,
+    int_pct1          REAL,
+    int_pct99         REAL,
+    int_q1            REAL,
+    int_q2            REAL,
+    int_q3            REAL,
+    jitter            REAL,
+    shimmer           REAL,
+    nhr               REAL,
+    rate_syl          REAL,
+    PRIMARY KEY (chu_id),
+    FOREIGN KEY (chu_id) REFERENCES chunks (chu_id)
+);
+
+
+
+CREATE TABLE extraction_errors (
+    -- chunks quarantined after feature extraction failed in all attempts
+    -- (see fio.try_extract_features); their features are not updated
+    ses_id            INTEGER NOT NULL,
+    chu_id            INTEGER NOT NULL,
+    -- number of attempts made (1 + cfg.PRAAT_RETRIES)
+    attempts          INTEGER NOT NULL,
+    -- exception raised in the last attempt (incl. timeouts) and stderr output
+    -- of the failed praat call, if any
+    error             TEXT NOT NULL,
+    stderr            TEXT,
+    PRIMARY KEY (chu_id),
+    FOREIGN KEY (chu_id) REFERENCES chunks (chu_id)
+);
+
+
+
 CREATE UNIQUE INDEX chu_pk ON chunks (chu_id);
 CREATE INDEX chu_tur_fk ON chunks (tur_id);
+CREATE INDEX chu_tur_all_fea ON chunks (tur_id, chunk_index)
+WHERE  has_all_features == 1;
+CREATE INDEX err_ses_fk ON extraction_errors (ses_id);
 CREATE UNIQUE INDEX tur_pk ON turns (tur_id);
 CREATE INDEX tur_tsk_fk ON turns (tsk_id);
 CREATE UNIQUE INDEX tsk_pk ON tasks (tsk_id);
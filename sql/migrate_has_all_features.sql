@@ -0,0 +1,69 @@
+-- one-time migration of databases created before chunks.has_all_features
+-- existed (the init scripts now create the column and its index); run it
+-- only once per database (the ALTER TABLE fails if the column exists), then
+-- run aux_tables.sql again, since chunk_pairs is based on the new flag
+-- note:
+--     features were previously stored as extracted and made consistent
+--     afterwards by a cleanup script, which set all features null for chunks
+--     missing any of them; this script applies that cleanup once more and
+--     then sets the flag for all complete chunks, as db.set_features does
+--     for chunks extracted from now on
+
+
+
+ALTER TABLE chunks ADD COLUMN has_all_features INTEGER NOT NULL DEFAULT 0;
+
+
+
+-- set all features null for any chunk that is missing any feature
+UPDATE chunks
+SET    pitch_min = NULL,
+       pitch_max = NULL,
+       pitch_mean = NULL,
+       pitch_std = NULL,
+       rate_syl = NULL,
+       rate_vcd = NULL,
+       intensity_min = NULL,
+       intensity_max = NULL,
+       intensity_mean = NULL,
+       intensity_std = NULL,
+       jitter = NULL,
+       shimmer = NULL,
+       nhr = NULL
+WHERE  pitch_min IS NULL
+OR     pitch_max IS NULL
+OR     pitch_mean IS NULL
+OR     pitch_std IS NULL
+OR     rate_syl IS NULL
+OR     rate_vcd IS NULL
+OR     intensity_min IS NULL
+OR     intensity_max IS NULL
+OR     intensity_mean IS NULL
+OR     intensity_std IS NULL
+OR     jitter IS NULL
+OR     shimmer IS NULL
+OR     nhr IS NULL;
+
+
+
+-- flag all chunks with complete features
+UPDATE chunks
+SET    has_all_features = 1
+WHERE  pitch_min IS NOT NULL
+AND    pitch_max IS NOT NULL
+AND    pitch_mean IS NOT NULL
+AND    pitch_std IS NOT NULL
+AND    rate_syl IS NOT NULL
+AND    rate_vcd IS NOT NULL
+AND    intensity_min IS NOT NULL
+AND    intensity_max IS NOT NULL
+AND    intensity_mean IS NOT NULL
+AND    intensity_std IS NOT NULL
+AND    jitter IS NOT NULL
+AND    shimmer IS NOT NULL
+AND    nhr IS NOT NULL;
+
+
+
+CREATE INDEX chu_tur_all_fea ON chunks (tur_id, chunk_index)
+WHERE  has_all_features == 1;
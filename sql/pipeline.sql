@@ -0,0 +1,20 @@
+-- table recording completed stages of the processing pipeline (see run.py);
+-- script can safely be run again (it never drops anything; the table also 
+-- survives the init scripts, which only drop the corpus tables)
+-- note:
+--     a stage is up to date if its fingerprint matches; the fingerprint is a
+--     hash over the stage's inputs (scripts, listing of meta data files, 
+--     parameters) and the fingerprints and completion times of the stages it
+--     depends on, so any stage that runs again invalidates all later stages
+
+
+
+CREATE TABLE IF NOT EXISTS pipeline_stages (
+    -- stage name (e.g., "init", "extract", "aux_tables")
+    stage       TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    -- completion time (iso format) and run time of the stage (in seconds)
+    completed   TEXT NOT NULL,
+    seconds     NUMERIC NOT NULL,
+    PRIMARY KEY (stage)
+);
@@ -0,0 +1,64 @@
+-- tables for persisted measure results (see ap.save_results/load_results);
+-- script can safely be run again (it never drops anything)
+-- note:
+--     a result set holds the results of one measure for one normalization type
+--     and one configuration (hash over feature list, relevant sql scripts, and
+--     measure parameters, see ap.get_cfg_hash); results are stored per 
+--     session/task/speaker (result_groups, with speaker info and annotation
+--     for filtering) and per feature (measure_results)
+
+
+
+CREATE TABLE IF NOT EXISTS result_sets (
+    res_id      INTEGER NOT NULL,
+    mea_id      TEXT NOT NULL,
+    nrm_type    TEXT NOT NULL,
+    cfg_hash    TEXT NOT NULL,
+    PRIMARY KEY (res_id),
+    UNIQUE (mea_id, nrm_type, cfg_hash)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS result_groups (
+    res_id              INTEGER NOT NULL,
+    ses_id              INTEGER NOT NULL,
+    tsk_id              INTEGER NOT NULL,
+    spk_id              INTEGER NOT NULL,
+    -- speaker info (see ana.add_speaker_info), null if not available
+    gender              TEXT,
+    native_lang         TEXT,
+    gender_paired       TEXT,
+    native_lang_paired  TEXT,
+    speaker_a_or_b      TEXT,
+    speaker_role        TEXT,
+    eng_yrs             NUMERIC,
+    -- annotation (see ana.annotate_local_measure), null if not available;
+    -- number of features with significant positive/negative results and
+    -- their sum ("+", "-", "+/-"), and overall valence
+    pos_cnt             INTEGER,
+    neg_cnt             INTEGER,
+    sig_cnt             INTEGER,
+    pm_type             TEXT,
+    PRIMARY KEY (res_id, ses_id, tsk_id, spk_id),
+    FOREIGN KEY (res_id) REFERENCES result_sets (res_id)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS measure_results (
+    -- one row per result tuple (see measure functions in ap), i.e., per 
+    -- session/task/speaker and feature; stat0/1/2 are the tuple components
+    -- (e.g., r-value, p-value, degrees of freedom)
+    res_id      INTEGER NOT NULL,
+    ses_id      INTEGER NOT NULL,
+    tsk_id      INTEGER NOT NULL,
+    spk_id      INTEGER NOT NULL,
+    feature     TEXT NOT NULL,
+    stat0       NUMERIC,
+    stat1       NUMERIC,
+    stat2       NUMERIC,
+    PRIMARY KEY (res_id, ses_id, tsk_id, spk_id, feature),
+    FOREIGN KEY (res_id, ses_id, tsk_id, spk_id) 
+        REFERENCES result_groups (res_id, ses_id, tsk_id, spk_id)
+);
@@ -0,0 +1,48 @@
+-- tables of a shard file: features extracted for the sessions that a manifest
+-- assigns to one shard, to be merged into the corpus database (see shard.py);
+-- script can safely be run again (it never drops anything)
+-- note:
+--     each session is written in one transaction together with its entry in
+--     shard_sessions, so an interrupted shard worker resumes with the first
+--     session not yet in shard_sessions
+
+
+
+CREATE TABLE IF NOT EXISTS shard_info (
+    -- "manifest_id", "corpus_id", and "shard_id" of the shard
+    key         TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    PRIMARY KEY (key)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS shard_sessions (
+    -- sessions extracted completely, with completion time (iso format)
+    ses_id      INTEGER NOT NULL,
+    completed   TEXT NOT NULL,
+    PRIMARY KEY (ses_id)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS shard_features (
+    chu_id      INTEGER NOT NULL,
+    ses_id      INTEGER NOT NULL,
+    -- complete output of the extraction as json object (keys as in
+    -- cfg.FEATURES_STORE), applied with db.set_features when merged
+    features    TEXT NOT NULL,
+    PRIMARY KEY (chu_id)
+);
+
+
+
+CREATE TABLE IF NOT EXISTS shard_errors (
+    -- quarantined chunks, as in extraction_errors table of corpus database
+    ses_id      INTEGER NOT NULL,
+    chu_id      INTEGER NOT NULL,
+    attempts    INTEGER NOT NULL,
+    error       TEXT NOT NULL,
+    stderr      TEXT,
+    PRIMARY KEY (chu_id)
+);
@@ -0,0 +1,91 @@
+import os
+import pytest
+import random
+import sys
+
+# the modules import each other by name and use paths relative to the python
+# directory (see cfg), so tests run with it on the path and as working dir
+PY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                       'python')
+sys.path.insert(0, PY_PATH)
+
+import cfg
+import db
+
+
+@pytest.fixture(autouse=True)
+def py_cwd(monkeypatch):
+    ''' runs each test from within the python directory '''
+    monkeypatch.chdir(PY_PATH)
+
+
+def _get_features(rng, start, dur):
+    ''' returns random output of the feature extraction for one chunk '''
+    return {
+        'start_point': start, 'end_point': start + dur, 'dur': dur,
+        'f0_min': rng.gauss(150, 30), 'f0_max': rng.gauss(250, 30),
+        'f0_mean': rng.gauss(200, 30), 'f0_std': rng.gauss(20, 5),
+        'rate_syl': rng.gauss(4, 1), 'vcd2tot_frames': rng.gauss(0.5, 0.1),
+        'int_min': rng.gauss(50, 5), 'int_max': rng.gauss(70, 5),
+        'int_mean': rng.gauss(60, 5), 'int_std': rng.gauss(5, 1),
+        'jitter': rng.gauss(0.02, 0.005), 'shimmer': rng.gauss(0.08, 0.01),
+        'nhr': rng.gauss(0.1, 0.02)
+    }
+
+
+def build_dc_db(n_ses=6, n_tur=30, seed=0):
+    ''' populates the (connected) deception corpus database with random data
+
+    sessions of two tasks with alternating turns of one to three chunks each,
+    continuous timestamps per session (as after fix_timestamps.sql), features
+    set like the extraction does (db.set_features; about 2% of the chunks
+    miss a feature); chunk_pairs is created at the end (aux_tables.sql)
+    '''
+    rng = random.Random(seed)
+    db.executescript(cfg.SQL_PATH, cfg.SQL_INIT_FNAME_DC)
+    tur_id = 0
+    chu_id = 0
+    for ses_id in range(1, n_ses + 1):
+        for spk_id in [2 * ses_id - 1, 2 * ses_id]:
+            db.ins_spk_dc(spk_id, rng.choice('fm'),
+                          rng.choice(['Chinese', 'English']),
+                          rng.randint(20, 40), '', '', '', 1, 1, 1, 1, 1)
+        db.ins_ses_dc(ses_id, 2 * ses_id - 1, 2 * ses_id)
+        t = 0.0
+        for task_index, a_or_b in [(1, 'B'), (2, 'A')]:
+            tsk_id = 2 * (ses_id - 1) + task_index
+            db.ins_tsk_dc(tsk_id, ses_id, task_index, a_or_b)
+            for turn_index in range(1, n_tur + 1):
+                tur_id += 1
+                db.ins_tur_dc(tur_id, tsk_id, turn_index,
+                              'd' if turn_index % 2 else 'f')
+                for chunk_index in range(1, rng.randint(1, 3) + 1):
+                    chu_id += 1
+                    t += rng.uniform(0.05, 0.5)
+                    dur = rng.uniform(0.3, 2.0)
+                    db.ins_chu(chu_id, tur_id, chunk_index, t, t + dur,
+                               'hello world', 'hello world')
+                    features = _get_features(rng, t, dur)
+                    if rng.random() < 0.02:
+                        features['jitter'] = None
+                    db.set_features(chu_id, features)
+                    t += dur
+    db.set_turn_index_ses()
+    db.executescript(cfg.SQL_PATH, cfg.SQL_AT_FNAME)
+    db.commit()
+
+
+@pytest.fixture
+def dc_db(tmp_path, monkeypatch):
+    ''' small random deception corpus database, connected
+
+    (a temporary file rather than in memory: db.rebuild_chunk_pairs attaches
+    the database file to a separate connection)
+    '''
+    monkeypatch.setattr(cfg, 'DB_FNAME_DC', str(tmp_path / 'xcdc.db'))
+    db.connect(cfg.CORPUS_ID_DC)
+    try:
+        build_dc_db()
+        yield
+    finally:
+        db.close()
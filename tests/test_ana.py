@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.stats
+
+import ana
+import cfg
+
+# checks ana.get_anovas against reference values from R, hard-coded below:
+# - warpbreaks (R datasets, balanced), summary(aov(breaks ~ wool * tension))
+#   and TukeyHSD of the same fit
+# - kidney data (balanced and, with its first three rows dropped, unbalanced),
+#   with R output as quoted in the anova tests of statsmodels
+#   (statsmodels/stats/tests/test_anova.py); for the unbalanced design only
+#   type II values are given there, which equal the sequential (type I) ones
+#   of aov for the terms entered after the first factor (l, g:l, Residuals)
+# factors are mapped to the columns get_anovas expects: g first, l second
+# (plus a check that bootstrap results are not read as p-values)
+
+
+
+################################################################################
+#                                    DATA                                      #
+################################################################################
+
+# breaks per wool (g) and tension (l), nine looms each
+WARPBREAKS = {
+    ('A', 'L'): [26, 30, 54, 25, 70, 52, 51, 26, 67],
+    ('A', 'M'): [18, 21, 29, 17, 12, 18, 35, 30, 36],
+    ('A', 'H'): [36, 21, 24, 18, 10, 43, 28, 15, 26],
+    ('B', 'L'): [27, 14, 29, 19, 29, 31, 41, 20, 44],
+    ('B', 'M'): [42, 26, 19, 16, 39, 28, 21, 39, 29],
+    ('B', 'H'): [20, 21, 24, 17, 13, 15, 15, 16, 28],
+}
+
+# days per duration (g) and weight (l), ten patients each
+KIDNEY = {
+    ('1', '1'): [0, 2, 1, 3, 0, 2, 0, 5, 6, 8],
+    ('1', '2'): [2, 4, 7, 12, 15, 4, 3, 1, 5, 20],
+    ('1', '3'): [15, 10, 8, 5, 25, 16, 7, 30, 3, 27],
+    ('2', '1'): [0, 1, 1, 0, 4, 2, 7, 4, 0, 3],
+    ('2', '2'): [5, 3, 2, 0, 1, 1, 3, 6, 7, 9],
+    ('2', '3'): [10, 8, 12, 3, 7, 15, 4, 9, 6, 1],
+}
+
+# > summary(aov(breaks ~ wool * tension, data=warpbreaks))
+#              Df Sum Sq Mean Sq F value   Pr(>F)
+# wool          1    451   450.7   3.765 0.058213 .
+# tension       2   2034  1017.1   8.498 0.000693 ***
+# wool:tension  2   1003   501.4   4.189 0.021044 *
+# Residuals    48   5745   119.7
+# (sums of squares with more digits: 450.6667, 2034.2593, 1002.7778,
+# 5745.1111)
+WARPBREAKS_AOV = {
+    'g': (1, 450.6667, 3.765, 0.058213),
+    'l': (2, 2034.2593, 8.498, 0.000693),
+    'g:l': (2, 1002.7778, 4.189, 0.021044),
+    'Residuals': (48, 5745.1111, np.nan, np.nan),
+}
+
+# > TukeyHSD(aov(breaks ~ wool * tension, data=warpbreaks))
+# (all rows of wool and tension, rows of wool:tension against A:L)
+WARPBREAKS_TUKEY = {
+    'g': {
+        'B-A': (-5.777778, -11.76458, 0.2090243, 0.0582131),
+    },
+    'l': {
+        'M-L': (-10.000000, -18.81965, -1.180353, 0.0228554),
+        'H-L': (-14.722222, -23.54187, -5.902575, 0.0005595),
+        'H-M': (-4.722222, -13.54187, 4.097425, 0.4049442),
+    },
+    'g:l': {
+        'B:L-A:L': (-16.333333, -31.63966, -1.027012, 0.0302143),
+        'A:M-A:L': (-20.555556, -35.86188, -5.249234, 0.0029580),
+        'B:M-A:L': (-15.777778, -31.08410, -0.471456, 0.0398172),
+        'A:H-A:L': (-20.000000, -35.30632, -4.693678, 0.0040955),
+        'B:H-A:L': (-25.777778, -41.08410, -10.471456, 0.0001136),
+    },
+}
+
+# > anova(lm(log(Days + 1) ~ Duration * Weight, data=kidney))
+KIDNEY_AOV = {
+    'g': (1, 2.339693, 4.358293, 0.0415617),
+    'l': (2, 16.97129, 15.80674, 3.944502e-06),
+    'g:l': (2, 0.6356584, 0.5920404, 0.5567479),
+    'Residuals': (54, 28.9892, np.nan, np.nan),
+}
+
+# > Anova(lm(log(Days + 1) ~ Duration * Weight, data=kidney[-(1:3), ]),
+# +       type='II')
+KIDNEY_UNBALANCED_AOV = {
+    'l': (2, 13.27205, 12.26141, 4.487909e-05),
+    'g:l': (2, 0.1905093, 0.1760025, 0.8391231),
+    'Residuals': (51, 27.60181, np.nan, np.nan),
+}
+
+
+
+################################################################################
+#                                  HELPERS                                     #
+################################################################################
+
+def _get_df(cells, func=float):
+    ''' returns dataframe with g, l, and y, cells in given order '''
+    return pd.DataFrame(
+        [(g, l, func(y)) for (g, l), ys in cells.items() for y in ys],
+        columns=['g', 'l', 'y'])
+
+
+def _check_aov(df_aov, ref, sum_sq_tol):
+    ''' compares anova table of feature y against reference (Df, Sum Sq,
+    F value, Pr(>F)), to the digits given in the reference '''
+    for term, (dof, sum_sq, f, p) in ref.items():
+        row = df_aov.loc[('y', term)]
+        assert row['Df'] == dof
+        assert row['Sum Sq'] == pytest.approx(sum_sq, abs=sum_sq_tol)
+        assert row['Mean Sq'] == pytest.approx(row['Sum Sq'] / dof)
+        assert row['F value'] == pytest.approx(f, abs=1e-3, nan_ok=True)
+        assert row['Pr(>F)'] == pytest.approx(
+            p, rel=1e-3, nan_ok=True)
+
+
+def _check_tukey(df_tuk, term, comparison, ref):
+    ''' compares tukey row against reference (diff, lwr, upr, p adj)
+
+    levels are sorted alphabetically in get_anovas, so a comparison R names
+    'H-L' appears as 'L-H' there, with diff and interval negated
+    '''
+    diff, lwr, upr, p = ref
+    if ('y', term, comparison) not in df_tuk.index:
+        comparison = '-'.join(comparison.split('-')[::-1])
+        diff, lwr, upr = -diff, -upr, -lwr
+    row = df_tuk.loc[('y', term, comparison)]
+    assert row['diff'] == pytest.approx(diff, abs=1e-5)
+    assert row['lwr'] == pytest.approx(lwr, abs=1e-5)
+    assert row['upr'] == pytest.approx(upr, abs=1e-5)
+    assert row['p adj'] == pytest.approx(p, rel=1e-4, abs=1e-7)
+
+
+
+################################################################################
+#                                   TESTS                                      #
+################################################################################
+
+def test_warpbreaks_aov():
+    df_aov, _ = ana.get_anovas(_get_df(WARPBREAKS), features=['y'])
+    assert list(df_aov.loc['y'].index) == ['g', 'l', 'g:l', 'Residuals']
+    _check_aov(df_aov, WARPBREAKS_AOV, 1e-4)
+
+
+@pytest.mark.parametrize('term,comparison', [
+    (term, comparison)
+    for term, rows in WARPBREAKS_TUKEY.items() for comparison in rows])
+def test_warpbreaks_tukey(term, comparison):
+    # alpha=1: tukey tests for all terms, wool is not significant at 0.05
+    _, df_tuk = ana.get_anovas(_get_df(WARPBREAKS), features=['y'], alpha=1.0)
+    _check_tukey(df_tuk, term, comparison, WARPBREAKS_TUKEY[term][comparison])
+
+
+def test_warpbreaks_tukey_alpha():
+    _, df_tuk = ana.get_anovas(_get_df(WARPBREAKS), features=['y'])
+    assert set(df_tuk.loc['y'].index.get_level_values('term')) \
+        == {'l', 'g:l'}
+    assert len(df_tuk.loc[('y', 'g:l')]) == 15
+
+
+def test_kidney_aov():
+    df_aov, _ = ana.get_anovas(_get_df(KIDNEY, np.log1p), features=['y'])
+    _check_aov(df_aov, KIDNEY_AOV, 1e-4)
+
+
+def test_kidney_unbalanced_aov():
+    df = _get_df(KIDNEY, np.log1p).iloc[3:]
+    df_aov, _ = ana.get_anovas(df, features=['y'])
+    _check_aov(df_aov, KIDNEY_UNBALANCED_AOV, 1e-4)
+    # sequential sums of squares still add up to the total
+    assert df_aov.loc['y', 'Sum Sq'].sum() \
+        == pytest.approx(((df['y'] - df['y'].mean())**2).sum())
+
+
+def test_kidney_unbalanced_tukey():
+    # no R reference here: cell means and counts as in R's model.tables for
+    # the full interaction term, with the tukey interval from its residuals
+    df = _get_df(KIDNEY, np.log1p).iloc[3:]
+    df_aov, df_tuk = ana.get_anovas(df, features=['y'], alpha=1.0)
+    mse = df_aov.loc[('y', 'Residuals'), 'Mean Sq']
+    grp = df.groupby(['g', 'l'])['y']
+    means, cnts = grp.mean(), grp.count()
+    row = df_tuk.loc[('y', 'g:l', '2:1-1:1')]
+    q = row['diff'] \
+        / np.sqrt(mse / 2 * (1 / cnts['1', '1'] + 1 / cnts['2', '1']))
+    assert cnts['1', '1'] == 7
+    assert row['diff'] == pytest.approx(means['2', '1'] - means['1', '1'])
+    assert row['upr'] - row['diff'] == pytest.approx(row['diff'] - row['lwr'])
+    assert row['p adj'] == pytest.approx(
+        scipy.stats.studentized_range.sf(abs(q), 6, 51), rel=1e-4)
+
+
+def test_boot_results_refused():
+    # cells of ap.boot_test hold (r, lower, upper), no p-values
+    df = pd.DataFrame([[(0.5, 0.01, 0.9)] * len(cfg.FEATURES)],
+                      columns=cfg.FEATURES)
+    df['boot_ci'] = 0.95
+    with pytest.raises(AssertionError, match='confidence bounds'):
+        ana.annotate_local_measure(df)
+    with pytest.raises(AssertionError, match='confidence bounds'):
+        ana.get_stats(df, 'boot')
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ap
+import cfg
+import db
+
+# checks ap functions against straightforward reference computations, on
+# small hand-made data or a small random deception corpus database (see
+# conftest.build_dc_db)
+
+
+
+################################################################################
+#                                    DATA                                      #
+################################################################################
+
+# chunk pairs for _load_pairs: chunk 3 has two pairs, chunk 6 a pair with a
+# turn-final chunk not in the data, chunk 99 is not in the data, chunks 1, 2,
+# 4, and 7 are unpaired
+CHUNK_PAIRS = [
+    ('p', 2, 3, 0.0),
+    ('x', 1, 3, 1.0),
+    ('p', 3, 5, 0.0),
+    ('p', 98, 6, 0.0),
+    ('p', 5, 99, 0.0),
+    ('x', 7, 5, 2.0),
+]
+
+
+
+################################################################################
+#                                  HELPERS                                     #
+################################################################################
+
+def _get_chunks():
+    ''' returns random data per chunk for _load_pairs (chunks 1 to 7) '''
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        rng.normal(size=(7, len(cfg.FEATURES))), columns=cfg.FEATURES)
+    df.insert(0, 'chu_id', np.arange(1, 8))
+    df.insert(1, 'ses_id', [1, 1, 1, 2, 2, 2, 2])
+    df['gender'] = list('fmfmfmf')
+    df['other'] = np.arange(7) * 10
+    # not in order of chu_id, and with an index that is not the running one
+    return df.iloc[::-1].set_index(np.arange(7) * 3)
+
+
+def _load_pairs_join(df, extra_cols, pairs_only, df_chp):
+    ''' returns _load_pairs result as computed with joins (as it once was) '''
+    how = 'inner' if pairs_only else 'left'
+    if pairs_only:
+        loc_cols = [c for c in cfg.PAIR_COLS + cfg.FEATURES + extra_cols
+                    if c in df.columns]
+        df = df.loc[:, list(dict.fromkeys(loc_cols))]
+    tmp = df.loc[:, ['chu_id'] + cfg.FEATURES + extra_cols].set_index('chu_id')
+    df_res = df.join(df_chp.set_index('chu_id2'), on='chu_id', how=how)
+    df_res = df_res.join(tmp, rsuffix='_paired', on='chu_id1')
+    df_res.rename(columns={'chu_id1': 'chu_id_paired'}, inplace=True)
+    # stable sort by chunk (rows of one chunk in order of chunk pairs)
+    df_res = df_res.iloc[np.argsort(
+        df.index.get_indexer(df_res.index), kind='stable')]
+    df_res.reset_index(drop=True, inplace=True)
+    for f in cfg.FEATURES:
+        df_res[f + '_sim'] = -(df_res[f] - df_res[f + '_paired']).abs()
+    return df_res
+
+
+def _get_cells(df, index):
+    ''' returns (r, p, dof) cells of all features as float array, by index '''
+    df = df.reindex(index)
+    return np.array(
+        [[cell if isinstance(cell, tuple) else (np.nan,) * 3
+          for cell in df[f]] for f in cfg.FEATURES], dtype=float)
+
+
+def _check_local(results, df_bt):
+    ''' asserts results per local measure match a full computation '''
+    for mea_id, func in [(cfg.MEA_LCON, ap.lcon), (cfg.MEA_SYN, ap.syn)]:
+        df_ref = func(df_bt)
+        df = results[mea_id]
+        assert sorted(df.index) == sorted(df_ref.index)
+        np.testing.assert_allclose(
+            _get_cells(df, df_ref.index), _get_cells(df_ref, df_ref.index),
+            atol=1e-9)
+
+
+def _get_pairs():
+    ''' returns all adjacent chunk pairs, sorted '''
+    return sorted(db.dbc.execute(
+        "SELECT chu_id1, chu_id2 FROM chunk_pairs WHERE p_or_x == 'p';"
+    ).fetchall())
+
+
+def _get_chg_seq():
+    ''' returns the latest sequence number in the change log '''
+    return db.dbc.execute('SELECT MAX(chg_seq) FROM ses_changes;').fetchone()
+
+
+
+################################################################################
+#                                   TESTS                                      #
+################################################################################
+
+@pytest.mark.parametrize('pairs_only', [False, True])
+@pytest.mark.parametrize('n_pairs', [len(CHUNK_PAIRS), 1, 0])
+def test_load_pairs_matches_join(pairs_only, n_pairs):
+    df = _get_chunks()
+    df_chp = pd.DataFrame(CHUNK_PAIRS[:n_pairs],
+                          columns=['p_or_x', 'chu_id1', 'chu_id2', 'rid'])
+    extra_cols = ['gender', 'other']
+    df_res = ap._load_pairs(df, extra_cols, pairs_only, df_chp)
+    df_ref = _load_pairs_join(df, extra_cols, pairs_only, df_chp)
+    assert list(df_res.columns) == list(df_ref.columns)
+    pd.testing.assert_frame_equal(
+        df_res.astype(object), df_ref.astype(object), check_dtype=False)
+
+@pytest.mark.parametrize('nrm_type', [cfg.NRM_SPK, cfg.NRM_GND, cfg.NRM_RAW])
+def test_update_local_matches_full_run(dc_db, nrm_type):
+    # first call computes everything
+    _check_local(ap.update_local(nrm_type), ap.load_data(nrm_type))
+    # new features for one chunk (as re-extraction would set them), one chunk
+    # losing a feature, and one chunk deleted, in three different sessions
+    chu_ids = [row[0] for row in db.dbc.execute(
+        'SELECT MIN(chu.chu_id)\n'
+        'FROM   chunks chu\n'
+        'JOIN   turns tur\n'
+        'ON     chu.tur_id == tur.tur_id\n'
+        'JOIN   tasks tsk\n'
+        'ON     tur.tsk_id == tsk.tsk_id\n'
+        'WHERE  chu.has_all_features == 1\n'
+        'GROUP  BY tsk.ses_id\n'
+        'ORDER  BY tsk.ses_id;').fetchall()]
+    start, end = db.dbc.execute(
+        'SELECT start_time, end_time FROM chunks WHERE chu_id == ?;',
+        [chu_ids[1]]).fetchone()
+    features = {
+        'start_point': start, 'end_point': end, 'dur': end - start,
+        'f0_min': 100.0, 'f0_max': 400.0, 'f0_mean': 300.0, 'f0_std': 40.0,
+        'rate_syl': 6.0, 'vcd2tot_frames': 0.9, 'int_min': 40.0,
+        'int_max': 90.0, 'int_mean': 75.0, 'int_std': 9.0, 'jitter': 0.05,
+        'shimmer': 0.2, 'nhr': 0.3
+    }
+    db.set_features(chu_ids[1], features)
+    db.set_features(chu_ids[3], dict(features, jitter=None))
+    db.dbc.execute('DELETE FROM chunks WHERE chu_id == ?;', [chu_ids[4] + 1])
+    db.commit()
+    results = ap.update_local(nrm_type)
+    # chunk pairs as rebuilt from scratch, results as computed from scratch
+    pairs = _get_pairs()
+    db.executescript(cfg.SQL_PATH, cfg.SQL_AT_FNAME)
+    assert pairs == _get_pairs()
+    _check_local(results, ap.load_data(nrm_type))
+
+
+def test_update_local_without_changes(dc_db):
+    results = ap.update_local(cfg.NRM_SPK)
+    chg_seq = _get_chg_seq()
+    consumers = db.dbc.execute('SELECT * FROM chg_consumers;').fetchall()
+    results_again = ap.update_local(cfg.NRM_SPK)
+    # nothing changed, nothing logged, and the same results
+    assert _get_chg_seq() == chg_seq
+    assert db.dbc.execute('SELECT * FROM chg_consumers;').fetchall() \
+        == consumers
+    for mea_id in results:
+        index = results[mea_id].index
+        np.testing.assert_array_equal(
+            _get_cells(results_again[mea_id], index),
+            _get_cells(results[mea_id], index))
+
+
+def test_boot_test_sig_alpha(dc_db):
+    df_bt = ap.load_data(cfg.NRM_SPK)
+    ents = {sig_alpha: np.stack(ap.boot_test(
+        df_bt, cfg.MEA_LCON, n_boot=20, n_jobs=1, sig_alpha=sig_alpha
+    )['ent_boot'].to_numpy()) for sig_alpha in [0.0, cfg.SIG_ALPHA, 1.0]}
+    # same resamples, only the significance level differs
+    assert not ents[0.0].any()
+    assert (ents[0.0] <= ents[cfg.SIG_ALPHA]).all()
+    assert (ents[cfg.SIG_ALPHA] <= ents[1.0]).all()
+    assert ents[cfg.SIG_ALPHA].mean() < ents[1.0].mean()
+
+
+def test_sample_non_adjacent_pairs(dc_db):
+    df_adj = db.get_adjacent_pairs()
+    n_rows = ap.sample_non_adjacent_pairs(seed=1)
+    df_x = db.pd_read_sql_query(
+        "SELECT chu_id1, chu_id2, rid FROM chunk_pairs WHERE p_or_x == 'x';")
+    assert n_rows == len(df_x) > 0
+    # choices: turn-final chunks of the other pairs of the same group
+    grp_cols = ['ses_id', 'spk_id1', 'speaker_role1']
+    for _, df_grp in df_adj.groupby(grp_cols):
+        n = len(df_grp)
+        k = min(n - 1, max(cfg.NON_ADJ_MIN,
+                           int(np.ceil(cfg.NON_ADJ_FRAC * (n - 1)))))
+        for chu_id1, chu_id2 in zip(df_grp['chu_id1'], df_grp['chu_id2']):
+            df = df_x[df_x['chu_id2'] == chu_id2]
+            assert sorted(df['rid']) == list(range(k))
+            assert df['chu_id1'].is_unique
+            assert set(df['chu_id1']) <= set(df_grp['chu_id1']) - {chu_id1}
+    # same seed, same sample (random ranks included)
+    ap.sample_non_adjacent_pairs(seed=1)
+    pd.testing.assert_frame_equal(df_x, db.pd_read_sql_query(
+        "SELECT chu_id1, chu_id2, rid FROM chunk_pairs WHERE p_or_x == 'x';"))
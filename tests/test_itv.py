@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import db
+import itv
+
+# checks the interval index against brute-force pairwise comparisons of all
+# chunks, on random sessions with timestamps on a coarse grid (so chunks often
+# touch, share start or end times, or nest, also within one speaker) and on a
+# small random deception corpus database (see conftest.build_dc_db)
+
+
+
+################################################################################
+#                                    DATA                                      #
+################################################################################
+
+# chunks by hand: B2 nested in A1, B3 touches A1 (and overlaps A4), A5 nested
+# in A4 (same speaker), B6 overlaps both A4 and A5, B7 starts where A4 ends
+CHUNKS = [
+    (1, 'A', 0.0, 4.0),
+    (2, 'B', 1.0, 2.0),
+    (3, 'B', 4.0, 5.0),
+    (4, 'A', 4.5, 9.0),
+    (5, 'A', 5.0, 6.0),
+    (6, 'B', 5.5, 8.0),
+    (7, 'B', 9.0, 9.5),
+]
+
+
+
+################################################################################
+#                                  HELPERS                                     #
+################################################################################
+
+def _get_random_ses(seed, n=40):
+    ''' returns chunks of one random session as expected by ChunkIndex '''
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, 60, n) / 2
+    return pd.DataFrame({
+        'chu_id': rng.permutation(n) + 1,
+        'a_or_b': rng.choice(['A', 'B'], n),
+        'start_time': starts,
+        'end_time': starts + rng.integers(0, 12, n) / 2})
+
+
+def _get_overlaps_bf(df_ses):
+    ''' returns overlapping pairs of different speakers, by brute force '''
+    rows = []
+    for c1 in df_ses.itertuples():
+        for c2 in df_ses.itertuples():
+            if c1.a_or_b == 'A' and c2.a_or_b == 'B' \
+            and c1.start_time < c2.end_time and c2.start_time < c1.end_time:
+                first = c1.start_time <= c2.start_time
+                rows.append((c1.chu_id if first else c2.chu_id,
+                             c2.chu_id if first else c1.chu_id,
+                             min(c1.end_time, c2.end_time)
+                             - max(c1.start_time, c2.start_time)))
+    return sorted(rows)
+
+
+def _get_following_bf(df_ses, delta, overlap_frac):
+    ''' returns following pairs of different speakers, by brute force '''
+    rows = []
+    for c1 in df_ses.itertuples():
+        dur = c1.end_time - c1.start_time
+        for c2 in df_ses.itertuples():
+            if c1.a_or_b != c2.a_or_b \
+            and c1.end_time - overlap_frac * dur <= c2.start_time \
+            and c2.start_time <= c1.end_time + delta:
+                rows.append((c1.chu_id, c2.chu_id,
+                             c2.start_time - c1.end_time))
+    return sorted(rows)
+
+
+def _get_rows(df, cols):
+    ''' returns given columns of dataframe as sorted list of tuples '''
+    return sorted(df[cols].itertuples(index=False, name=None))
+
+
+def _check_index(df_ses, delta, overlap_frac):
+    ''' asserts index answers match brute force for all chunks of session '''
+    idx = itv.ChunkIndex(1, df_ses)
+    assert len(idx) == len(df_ses)
+    ovl = _get_overlaps_bf(df_ses)
+    fol = _get_following_bf(df_ses, delta, overlap_frac)
+    assert _get_rows(idx.get_overlaps(), ['chu_id1', 'chu_id2', 'overlap']) \
+        == pytest.approx(ovl)
+    assert _get_rows(idx.get_following(delta, overlap_frac),
+                     ['chu_id1', 'chu_id2', 'gap']) == pytest.approx(fol)
+    times = df_ses.set_index('chu_id')['start_time']
+    for chu_id in df_ses['chu_id']:
+        res = idx.overlapping(chu_id)
+        assert sorted(res) == sorted(
+            c2 if c1 == chu_id else c1
+            for c1, c2, _ in ovl if chu_id in (c1, c2))
+        assert list(times[res]) == sorted(times[res])
+        res = idx.following(chu_id, delta, overlap_frac)
+        assert sorted(res) == sorted(c2 for c1, c2, _ in fol if c1 == chu_id)
+        assert list(times[res]) == sorted(times[res])
+    # statistics per speaker from the brute-force overlaps
+    df_stats = idx.get_overlap_stats()
+    for a_or_b in ['A', 'B']:
+        df_spk = df_ses[df_ses['a_or_b'] == a_or_b]
+        chu_ids = set(df_spk['chu_id'])
+        overlapped = set(c for c1, c2, _ in ovl for c in (c1, c2)) & chu_ids
+        row = df_stats.loc[(1, a_or_b)]
+        assert row['chunks'] == len(df_spk)
+        assert row['chunks_overlapped'] == len(overlapped)
+        assert row['speech_time'] == pytest.approx(
+            (df_spk['end_time'] - df_spk['start_time']).sum())
+        assert row['overlap_time'] == pytest.approx(
+            sum(o for c1, c2, o in ovl if c1 in chu_ids or c2 in chu_ids))
+
+
+
+################################################################################
+#                                   TESTS                                      #
+################################################################################
+
+def test_hand_made():
+    df_ses = pd.DataFrame(
+        CHUNKS, columns=['chu_id', 'a_or_b', 'start_time', 'end_time'])
+    idx = itv.ChunkIndex(1, df_ses)
+    # touching chunks do not overlap, nested ones do
+    assert list(idx.overlapping(1)) == [2]
+    assert list(idx.overlapping(4)) == [3, 6]
+    assert list(idx.overlapping(5)) == [6]
+    assert list(idx.overlapping(7)) == []
+    # a chunk starting right at the end follows with a gap of 0
+    assert list(idx.following(1, 0.0)) == [3]
+    assert list(idx.following(4, 0.0)) == [7]
+    assert list(idx.following(1, 0.0, 0.5)) == [3]
+    assert list(idx.following(4, 0.0, 0.5)) == [7]
+    assert list(idx.following(4, 0.0, 0.8)) == [6, 7]
+    _check_index(df_ses, 0.5, 0.5)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('delta,overlap_frac', [(0.0, 0.0), (1.0, 0.5),
+                                                (3.0, 1.0)])
+def test_random_ses(seed, delta, overlap_frac):
+    _check_index(_get_random_ses(seed), delta, overlap_frac)
+
+
+def test_one_speaker():
+    df_ses = _get_random_ses(0)
+    df_ses['a_or_b'] = 'A'
+    _check_index(df_ses, 1.0, 0.5)
+
+
+def test_build(dc_db):
+    indexes = itv.build()
+    df_times = db.get_chunk_times(-1, 2**63 - 1)
+    assert sorted(indexes) == sorted(df_times['ses_id'].unique())
+    df_fol = itv.get_following(indexes, 1.0, 0.5)
+    rows = []
+    for ses_id, df_ses in df_times.groupby('ses_id'):
+        rows += [(ses_id,) + row for row in _get_following_bf(df_ses, 1.0, 0.5)]
+    assert _get_rows(df_fol, ['ses_id', 'chu_id1', 'chu_id2', 'gap']) \
+        == pytest.approx(sorted(rows))
+    df_stats = itv.get_overlap_stats(indexes)
+    assert df_stats['chunks'].sum() == len(df_times)
+    # continuous timestamps without overlaps in the random corpus
+    assert len(itv.get_overlaps(indexes)) == 0
+    assert (df_stats['overlap_time_frac'] == 0).all()
@@ -0,0 +1,142 @@
+import multiprocessing
+import pytest
+import sqlite3
+
+import cfg
+import db
+import run
+
+# exercises the stage logic of run._run_stages with stub stages mirroring the
+# deception corpus pipeline (see run._get_stages), on a temporary database
+
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    ''' stub pipeline: stage inputs can be changed, runs are recorded '''
+    monkeypatch.setattr(cfg, 'DB_FNAME_DC', str(tmp_path / 'xcdc.db'))
+    inputs = {}
+    ran = []
+    fail = set()
+
+    def __stage(name, deps, blocked_by):
+        def __func():
+            if name in fail:
+                raise RuntimeError('%s failed' % name)
+            if name == 'init':
+                # stands in for the init scripts (creating the corpus tables)
+                db.dbc.execute('CREATE TABLE IF NOT EXISTS chunks (x)')
+            ran.append(name)
+        return (name, deps, lambda: [inputs.get(name, 0)], __func, blocked_by)
+
+    stages = [
+        __stage('init', [], []),
+        __stage('populate', ['init'], ['populate']),
+        __stage('extract', ['populate'], ['fix_timestamps']),
+        __stage('fix_timestamps', ['extract'], ['fix_timestamps']),
+        __stage('aux_tables', ['fix_timestamps'], [])
+    ]
+    monkeypatch.setattr(run, '_get_stages', lambda *args: stages)
+
+    def __run(force=[], until=None, dry_run=False):
+        ran.clear()
+        run._run_stages(cfg.CORPUS_ID_DC, force, until, dry_run, 1, 
+                        cfg.NRM_SPK)
+        return list(ran)
+    return __run, inputs, fail
+
+
+ALL = ['init', 'populate', 'extract', 'fix_timestamps', 'aux_tables']
+
+
+def test_runs_all_then_nothing(pipeline):
+    run_, _, _ = pipeline
+    assert run_() == ALL
+    assert run_() == []
+
+
+def test_dry_run_runs_nothing(pipeline):
+    run_, _, _ = pipeline
+    assert run_(dry_run=True) == []
+    assert run_() == ALL
+
+
+def test_idempotent_stage_runs_again(pipeline):
+    run_, inputs, _ = pipeline
+    run_()
+    inputs['aux_tables'] = 1
+    assert run_() == ['aux_tables']
+
+
+@pytest.mark.parametrize('stage', ['populate', 'extract', 'fix_timestamps'])
+def test_chain_refuses_without_init(pipeline, stage):
+    run_, inputs, _ = pipeline
+    run_()
+    inputs[stage] = 1
+    with pytest.raises(AssertionError, match='force init'):
+        run_()
+    # nothing ran, the refusal persists until init is forced
+    with pytest.raises(AssertionError, match='force init'):
+        run_()
+    assert run_(force=['init']) == ALL
+    assert run_() == []
+
+
+@pytest.mark.parametrize('stage', ['populate', 'extract', 'fix_timestamps'])
+def test_chain_refuses_forced_stage(pipeline, stage):
+    run_, _, _ = pipeline
+    run_()
+    with pytest.raises(AssertionError, match='force init'):
+        run_(force=[stage])
+
+
+def test_extract_before_fix_timestamps_runs_again(pipeline):
+    run_, inputs, _ = pipeline
+    assert run_(until='extract') == ALL[:3]
+    inputs['extract'] = 1
+    assert run_(until='extract') == ['extract']
+    assert run_() == ['fix_timestamps', 'aux_tables']
+
+
+def test_interrupted_run_resumes(pipeline):
+    run_, _, fail = pipeline
+    fail.add('fix_timestamps')
+    with pytest.raises(RuntimeError):
+        run_()
+    fail.clear()
+    assert run_() == ['fix_timestamps', 'aux_tables']
+
+
+def test_changed_init_not_rebuilt(pipeline, capsys):
+    run_, inputs, _ = pipeline
+    run_()
+    inputs['init'] = 1
+    assert run_() == []
+    assert 'init script changed' in capsys.readouterr().out
+    assert run_(force=['init']) == ALL
+    assert run_() == []
+
+
+def test_existing_tables_without_records_refused(pipeline):
+    run_, _, _ = pipeline
+    # database initialized outside of run.py, e.g., with the notebooks
+    conn = sqlite3.connect(cfg.DB_FNAME_DC)
+    conn.execute('CREATE TABLE chunks (x)')
+    conn.close()
+    with pytest.raises(AssertionError, match='no pipeline records'):
+        run_()
+    assert run_(force=['init']) == ALL
+    assert run_() == []
+
+
+def test_spawned_keeps_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(cfg, 'DB_FNAME_DC', str(tmp_path / 'xcdc.db'))
+    monkeypatch.setattr(cfg, 'FEATURES', cfg.FEATURES[:2])
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        assert pool.apply(run._spawned, (
+            run._get_settings(), cfg.get_db_fname, cfg.CORPUS_ID_DC
+        )) == str(tmp_path / 'xcdc.db')
+        assert pool.apply(run._spawned, (
+            run._get_settings(), run._get_settings))['FEATURES'] \
+            == cfg.FEATURES
@@ -0,0 +1,127 @@
+import sqlite3
+
+import cfg
+import db
+import fio
+import shard
+
+# checks shard.merge_shards with shard files written directly (as
+# shard.extract_shard does, without running the praat scripts) on a small
+# random deception corpus database (see conftest.build_dc_db)
+
+
+
+################################################################################
+#                                  HELPERS                                     #
+################################################################################
+
+def _get_stored(ses_id):
+    ''' returns features in the feature store per chunk of given session '''
+    chu_ids = [chu_id for _, chu_id in db.get_ses_chunks(ses_id, ses_id)]
+    df = db.get_chunk_features(cfg.FEATURES_STORE, chu_ids[0], chu_ids[-1])
+    # missing values as the extraction returns them
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('index')
+
+
+def _write_shard(path, manifest_fname, shard_id, ses_id, all_features,
+                 errors=[]):
+    ''' writes shard file with given results for one session '''
+    _, manifest_id = shard._load_manifest(manifest_fname)
+    fname = shard.get_shard_fname(path, cfg.CORPUS_ID_DC, shard_id)
+    conn = sqlite3.connect(fname)
+    conn.executescript(''.join(fio.readlines(cfg.SQL_PATH, cfg.SQL_SHD_FNAME)))
+    conn.executemany(
+        'INSERT INTO shard_info (key, value) VALUES (?,?);',
+        [('manifest_id', manifest_id), ('corpus_id', cfg.CORPUS_ID_DC),
+         ('shard_id', str(shard_id))])
+    shard._write_ses(conn, ses_id, all_features, errors)
+    conn.close()
+    return fname
+
+
+
+################################################################################
+#                                   TESTS                                      #
+################################################################################
+
+def test_merge_with_conflict(dc_db, tmp_path):
+    db.close()
+    manifest_fname = str(tmp_path / 'manifest.json')
+    manifest = shard.make_manifest(cfg.CORPUS_ID_DC, 2, manifest_fname)
+    ses_id1 = manifest['shards'][0]['ses_id_from']
+    ses_id2 = manifest['shards'][1]['ses_id_from']
+    db.connect(cfg.CORPUS_ID_DC)
+    # shard 0: features as already stored, except for one chunk
+    features1 = _get_stored(ses_id1)
+    chu_id_conflict = min(features1)
+    features1[chu_id_conflict] = dict(
+        features1[chu_id_conflict], f0_mean=123.0)
+    # shard 1: features of chunks not yet in the feature store, and one
+    # quarantined chunk
+    features2 = _get_stored(ses_id2)
+    chu_id_error = max(features2)
+    del features2[chu_id_error]
+    for chu_id in features2:
+        features2[chu_id]['f0_mean'] = 234.0
+    db.dbc.execute('DELETE FROM chunk_features WHERE chu_id BETWEEN ? AND ?;',
+                   [min(features2), max(features2)])
+    db.commit()
+    db.close()
+    fnames = [
+        _write_shard(tmp_path, manifest_fname, 0, ses_id1, features1),
+        _write_shard(tmp_path, manifest_fname, 1, ses_id2, features2,
+                     [(ses_id2, chu_id_error, 2, 'timeout', None)])
+    ]
+    df = shard.merge_shards(manifest_fname, fnames)
+    # the conflict is reported
+    assert df.to_dict('records') == [{
+        'fname': fnames[0], 'ses_id': ses_id1, 'chu_id': chu_id_conflict,
+        'conflict': 'differs from corpus database'}]
+    # the conflicting chunk is untouched, all other results are applied
+    db.connect(cfg.CORPUS_ID_DC)
+    try:
+        df_cf = db.get_chunk_features(['f0_mean'])
+        assert df_cf.loc[chu_id_conflict, 'f0_mean'] != 123.0
+        assert (df_cf.loc[list(features2), 'f0_mean'] == 234.0).all()
+        assert set(row[0] for row in db.dbc.execute(
+            'SELECT pitch_mean\n'
+            'FROM   chunks\n'
+            'WHERE  chu_id BETWEEN ? AND ?\n'
+            'AND    has_all_features == 1;',
+            [min(features2), max(features2)])) == {234.0}
+        assert [row[1] for row in db.get_extraction_errors()] \
+            == [chu_id_error]
+    finally:
+        db.close()
+    # repeated merge: only the same conflict, with overwrite none at all
+    df = shard.merge_shards(manifest_fname, fnames)
+    assert list(df['chu_id']) == [chu_id_conflict]
+    df = shard.merge_shards(manifest_fname, fnames, overwrite=True)
+    assert len(df) == 0
+    db.connect(cfg.CORPUS_ID_DC)
+    assert db.get_chunk_features(['f0_mean']).loc[
+        chu_id_conflict, 'f0_mean'] == 123.0
+
+
+def test_merge_other_manifest(dc_db, tmp_path):
+    db.close()
+    manifest_fname = str(tmp_path / 'manifest.json')
+    manifest = shard.make_manifest(cfg.CORPUS_ID_DC, 2, manifest_fname)
+    ses_id = manifest['shards'][0]['ses_id_from']
+    db.connect(cfg.CORPUS_ID_DC)
+    features = _get_stored(ses_id)
+    db.dbc.execute('DELETE FROM chunk_features WHERE chu_id BETWEEN ? AND ?;',
+                   [min(features), max(features)])
+    db.commit()
+    db.close()
+    fname = _write_shard(tmp_path, manifest_fname, 0, ses_id, features)
+    # a manifest created again differs (creation time), whole file skipped
+    shard.make_manifest(cfg.CORPUS_ID_DC, 2, manifest_fname)
+    df = shard.merge_shards(manifest_fname, [fname])
+    assert df.to_dict('records') == [{
+        'fname': fname, 'ses_id': None, 'chu_id': None,
+        'conflict': 'different manifest'}]
+    db.connect(cfg.CORPUS_ID_DC)
+    assert len(db.get_chunk_features(
+        ['f0_mean'], min(features), max(features))) == 0